@@ -53,6 +53,19 @@ class LiabilityManager:
         return daily_fee
 
 
+    def daily_accrual_components(self, yesterday_nav):
+        """
+        Operating fee accruals by component for yesterday's NAV (a float or a NumPy array of NAVs):
+        {'management', 'custodian', 'administration'}. Capital gains tax is per sell (calculate_tax_liabilities).
+        """
+        s = self.liability_fee_schedule
+        return {
+            "management": yesterday_nav * s.management_fee_rate,
+            "custodian": yesterday_nav * s.custodian_fee_rate,
+            "administration": yesterday_nav * s.administration_services_fee_rate,
+        }
+
+
     def calculate_tax_liabilities(self, stocks_to_sell, prices, tax_rate):
         """
         Calculates the total tax liabilities based on the stock list and market data.
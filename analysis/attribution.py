@@ -0,0 +1,163 @@
+"""
+P&L and cost attribution from the fill ledger (backtest/ledger.py) and daily closes.
+
+Holdings are rebuilt from the ledger as a (dates x symbols) matrix (cumulative
+signed fill volumes), and closes come from a MarketPanel (load_market_panel in
+the data loader) on the same calendar. Gross P&L per stock-day is
+
+    H[t] * C[t] - H[t-1] * C[t-1] - buy notional[t] + sell notional[t]
+
+i.e. mark-to-market at the close plus the fill-price effect on trade days. Fees
+come from the ledger components, the capital gains tax from the sells, and the
+operating fees (management / custodian / administration) from yesterday's NAV
+via LiabilityManager.daily_accrual_components. Then
+    sum over stocks of net P&L - operating fees == NAV change
+for every day of an engine run.
+
+All reductions are bincounts / matrix sums over integer date and symbol codes,
+so multi-year ledgers with hundreds of thousands of fills take well under a second.
+"""
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from account.liability import LiabilityManager
+
+OPERATING_COLUMNS = ["liability_management", "liability_custodian", "liability_administration"]
+
+
+def _ledger_frame(ledger) -> pd.DataFrame:
+    df = ledger.to_frame() if hasattr(ledger, "to_frame") else ledger
+    return df[df["side"].astype(str).isin(["buy", "sell"])]
+
+
+def _grouped(codes: np.ndarray, n: int, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    return {name: np.bincount(codes, weights=values, minlength=n) for name, values in columns.items()}
+
+
+def compute_attribution(
+    ledger,
+    panel,
+    equity_history: Optional[Dict[str, float]] = None,
+    liability_fee_schedule=None,
+    industry_map: Optional[Dict[str, str]] = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    ledger: TradeLedger or its DataFrame (to_frame() / the saved parquet).
+    panel: MarketPanel with a 'close' field covering every ledger date and symbol.
+    equity_history: engine.equity_history; needed for operating fees (yesterday's NAV) and nav_change.
+    liability_fee_schedule: LiabilityFeeSchedule; without it liability columns are 0.
+    industry_map: optional {symbol: industry}; unmapped symbols go to 'UNKNOWN'.
+
+    Returns {'daily', 'stock', 'week'[, 'industry']} DataFrames.
+    """
+    df = _ledger_frame(ledger)
+    dates = pd.Index(panel.dates)
+    n_dates, n_sym = len(dates), len(panel.symbols)
+
+    di = dates.get_indexer(df["date"].astype(str))
+    if (di < 0).any():
+        raise ValueError(f"Ledger date {df['date'].iloc[int(np.argmax(di < 0))]} not in the market panel calendar")
+    si = pd.Index(panel.symbols).get_indexer(df["symbol"].astype(str))
+    if (si < 0).any():
+        raise ValueError(f"Ledger symbol {df['symbol'].iloc[int(np.argmax(si < 0))]} not in the market panel")
+
+    is_buy = (df["side"].astype(str) == "buy").to_numpy()
+    volume = df["volume"].to_numpy(dtype=np.float64)
+    price = df["price"].to_numpy(dtype=np.float64)
+    notional = df["notional"].to_numpy(dtype=np.float64)
+    base_transfer = df["fee_base"].to_numpy(dtype=np.float64) + df["fee_transfer"].to_numpy(dtype=np.float64)
+    tax_rate = liability_fee_schedule.tax_fee_rate if liability_fee_schedule is not None else 0.0
+    gain = np.where(is_buy, 0.0, volume * (price - df["cost_price"].to_numpy(dtype=np.float64)))
+    cell = di * n_sym + si
+
+    def _matrix(weights):
+        return np.bincount(cell, weights=weights, minlength=n_dates * n_sym).reshape(n_dates, n_sym)
+
+    holdings = np.cumsum(_matrix(np.where(is_buy, volume, -volume)), axis=0)
+    close = panel["close"]
+    held = holdings != 0
+    if np.isnan(close[held]).any():
+        i, j = np.argwhere(held & np.isnan(close))[0]
+        raise ValueError(f"No close for held stock {panel.symbols[j]} on {dates[i]}")
+    mv = np.where(held, holdings * np.nan_to_num(close), 0.0)
+    mv_prev = np.vstack([np.zeros((1, n_sym)), mv[:-1]])
+    gross = mv - mv_prev - _matrix(np.where(is_buy, notional, 0.0)) + _matrix(np.where(is_buy, 0.0, notional))
+
+    cells = {
+        "gross_pnl": gross,
+        "fee_buy": _matrix(np.where(is_buy, base_transfer, 0.0)),
+        "fee_sell": _matrix(np.where(is_buy, 0.0, base_transfer)),
+        "fee_stamp": _matrix(df["fee_stamp"].to_numpy(dtype=np.float64)),
+        "liability_tax": _matrix(np.where(gain > 0, gain * tax_rate, 0.0)),
+    }
+    cells["net_pnl"] = (cells["gross_pnl"] - cells["fee_buy"] - cells["fee_sell"] - cells["fee_stamp"]
+                        - cells["liability_tax"])
+
+    # --- daily ---
+    daily = pd.DataFrame({"date": dates.to_numpy()})
+    for name, m in cells.items():
+        daily[name] = m.sum(axis=1)
+    for name in OPERATING_COLUMNS:
+        daily[name] = 0.0
+    if equity_history:
+        nav = pd.Series(equity_history, dtype=np.float64).sort_index()
+        nav_prev = nav.shift(1).reindex(dates).to_numpy()
+        if liability_fee_schedule is not None:
+            comps = LiabilityManager(liability_fee_schedule).daily_accrual_components(np.nan_to_num(nav_prev))
+            for key, name in zip(("management", "custodian", "administration"), OPERATING_COLUMNS):
+                daily[name] = comps[key]
+        daily["nav_change"] = nav.reindex(dates).to_numpy() - nav_prev
+    daily["net_pnl"] = daily["net_pnl"] - daily[OPERATING_COLUMNS].sum(axis=1)
+
+    # --- per stock ---
+    stock = pd.DataFrame({"symbol": panel.symbols})
+    for name, m in cells.items():
+        stock[name] = m.sum(axis=0)
+    stock_counts = _grouped(si, n_sym, {
+        "buy_notional": np.where(is_buy, notional, 0.0),
+        "sell_notional": np.where(is_buy, 0.0, notional),
+        "n_buys": is_buy.astype(np.float64),
+        "n_sells": (~is_buy).astype(np.float64),
+    })
+    for name, values in stock_counts.items():
+        stock[name] = values.astype(np.int64) if name.startswith("n_") else values
+    stock = stock[(stock["n_buys"] + stock["n_sells"]) > 0]
+    stock = stock.sort_values("net_pnl", ascending=False, ignore_index=True)
+
+    # --- per week (ISO year-week of the trading date) ---
+    iso = pd.to_datetime(daily["date"], format="%Y%m%d").dt.isocalendar()
+    week_labels = iso["year"].astype(str) + "-W" + iso["week"].astype(str).str.zfill(2)
+    week_codes, weeks = pd.factorize(week_labels, sort=True)
+    value_cols = [c for c in daily.columns if c != "date"]
+    week = pd.DataFrame({"week": weeks})
+    for name, values in _grouped(week_codes, len(weeks), {c: daily[c].to_numpy() for c in value_cols}).items():
+        week[name] = values
+
+    out = {"daily": daily, "stock": stock, "week": week}
+
+    # --- per industry ---
+    if industry_map is not None:
+        labels = stock["symbol"].map(industry_map).fillna("UNKNOWN")
+        ind_codes, industries = pd.factorize(labels, sort=True)
+        value_cols = [c for c in stock.columns if c != "symbol"]
+        industry = pd.DataFrame({"industry": industries})
+        for name, values in _grouped(ind_codes, len(industries), {c: stock[c].to_numpy(dtype=np.float64) for c in value_cols}).items():
+            industry[name] = values
+        industry["n_buys"] = industry["n_buys"].astype(np.int64)
+        industry["n_sells"] = industry["n_sells"].astype(np.int64)
+        industry["n_stocks"] = np.bincount(ind_codes, minlength=len(industries))
+        out["industry"] = industry.sort_values("net_pnl", ascending=False, ignore_index=True)
+
+    return out
+
+
+def save_attribution(tables: Dict[str, pd.DataFrame], save_dir, prefix: str) -> None:
+    """Write each table to {save_dir}/{prefix}_attribution_{key}.parquet."""
+    save_dir = Path(save_dir)
+    save_dir.mkdir(parents=True, exist_ok=True)
+    for key, table in tables.items():
+        table.to_parquet(save_dir / f"{prefix}_attribution_{key}.parquet", index=False)
+    print(f"Attribution ({', '.join(tables)}) saved to: {save_dir}")
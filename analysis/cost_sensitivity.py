@@ -0,0 +1,260 @@
+"""
+Cost sensitivity: replay a recorded run under alternate fee schedules without rerunning the engine.
+
+Fills (backtest/ledger.py) and the daily market value of holdings do not
+depend on fee rates, only cash does. recost_run replays the engine's cash
+and liability accounting day by day for many (BuyFeeSchedule, SellFeeSchedule,
+LiabilityFeeSchedule) scenarios at once: buy / sell fees are recomputed per
+fill with the same formulas as utils/中证500指增_LGBM/fees.py, operating fees
+accrue on each scenario's own NAV, capital gains tax uses its tax rate, and
+liabilities are paid on sell days as in the engine.
+
+Holding the recorded lot counts fixed is exact only if the engine would have
+allocated the same lots with the scenario's cash. For every buy day and
+scenario a lot-change flag is raised when
+    - the recorded lots cost more than the scenario's cash, or
+    - the scenario's leftover cash would buy another 100-share lot, or
+    - the equal-weight starting volume of any stock differs from the base run.
+The equal-weight budget is split over the day's whole buy pool as in the
+engine: the buys plus the ledger's 'unfilled' rows (pool stocks allocated 0
+lots). Flags are a screen; verify_lot_changes reruns PositionManager
+allocation for the flagged days on the same pool. The first scenario must be
+the schedules of the recorded run (its replay reproduces the engine NAV).
+"""
+import itertools
+from dataclasses import dataclass, replace
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from analysis.performance_matrix import compute_performance_metrics_batch
+
+
+@dataclass(frozen=True)
+class CostScenario:
+    name: str
+    buy_fee_schedule: object        # BuyFeeSchedule
+    sell_fee_schedule: object       # SellFeeSchedule
+    liability_fee_schedule: object  # LiabilityFeeSchedule
+
+
+def scenario_grid(base: CostScenario, **ranges: Sequence[float]) -> List[CostScenario]:
+    """
+    Base scenario first, then the cartesian product of field values, e.g.
+    scenario_grid(base, commission_rate=[0.0002, 0.0003], stamp_tax_rate=[0.0005, 0.001]).
+    commission_rate / csrc_fee_rate / handling_fee_rate / transfer_fee_rate_sh / min_fee apply
+    to both buy and sell schedules; stamp_tax_rate to sells; liability fields to the liability schedule.
+    """
+    scenarios = [base]
+    keys = list(ranges)
+    for values in itertools.product(*(ranges[k] for k in keys)):
+        buy, sell, liab = base.buy_fee_schedule, base.sell_fee_schedule, base.liability_fee_schedule
+        for key, value in zip(keys, values):
+            if hasattr(liab, key):
+                liab = replace(liab, **{key: value})
+                continue
+            if not (hasattr(buy, key) or hasattr(sell, key)):
+                raise ValueError(f"Unknown fee field: {key}")
+            if hasattr(buy, key):
+                buy = replace(buy, **{key: value})
+            if hasattr(sell, key):
+                sell = replace(sell, **{key: value})
+        name = ",".join(f"{k}={v}" for k, v in zip(keys, values))
+        scenarios.append(CostScenario(name, buy, sell, liab))
+    return scenarios
+
+
+def _rates(scenarios: Sequence[CostScenario]) -> Dict[str, np.ndarray]:
+    """Per-scenario rates as (K, 1) columns for broadcasting against fills."""
+    def col(values):
+        return np.asarray(values, dtype=np.float64)[:, None]
+
+    b = [s.buy_fee_schedule for s in scenarios]
+    s_ = [s.sell_fee_schedule for s in scenarios]
+    l = [s.liability_fee_schedule for s in scenarios]
+    return {
+        "buy_base": col([x.commission_rate + x.csrc_fee_rate + x.handling_fee_rate for x in b]),
+        "buy_min": col([x.min_fee for x in b]),
+        "buy_transfer": col([x.transfer_fee_rate_sh for x in b]),
+        "sell_base": col([x.commission_rate + x.csrc_fee_rate + x.handling_fee_rate for x in s_]),
+        "sell_min": col([x.min_fee for x in s_]),
+        "sell_transfer": col([x.transfer_fee_rate_sh for x in s_]),
+        "stamp": col([x.stamp_tax_rate for x in s_]),
+        "operating": np.array([x.management_fee_rate + x.custodian_fee_rate + x.administration_services_fee_rate
+                               for x in l]),
+        "tax": np.array([x.tax_fee_rate for x in l]),
+    }
+
+
+def _buy_cost(amount, is_sh, r, k=slice(None)):
+    """notional + buy fees (calc_buy_total_cost), broadcast over scenarios (rows) and fills (columns)."""
+    fee = np.maximum(amount * r["buy_base"][k], r["buy_min"][k]) + np.where(is_sh, amount * r["buy_transfer"][k], 0.0)
+    return np.where(amount > 0, amount + fee, 0.0)
+
+
+def _sell_fees(amount, is_sh, r, k=slice(None)):
+    fee = (np.maximum(amount * r["sell_base"][k], r["sell_min"][k])
+           + np.where(is_sh, amount * r["sell_transfer"][k], 0.0) + amount * r["stamp"][k])
+    return np.where(amount > 0, fee, 0.0)
+
+
+def _max_lots(price, budget, is_sh, r):
+    """PositionManager._max_volume_for_budget, vectorized: (K, n) max 100-share volume with cost <= budget."""
+    vol = np.floor(budget / price / 100.0) * 100.0
+    for _ in range(4):  # fees are < 1% of notional: at most a few steps down
+        over = (vol > 0) & (_buy_cost(price * vol, is_sh, r) > budget)
+        if not over.any():
+            break
+        vol = np.where(over, vol - 100.0, vol)
+    return vol
+
+
+def recost_run(ledger, daily_records, scenarios: Sequence[CostScenario], block: int = 32) -> Dict[str, pd.DataFrame]:
+    """
+    ledger: TradeLedger or its DataFrame; daily_records: DailyRecorder or per-day DataFrame (get_daily_df).
+    scenarios: base (recorded run) first, e.g. from scenario_grid.
+    Returns {'nav': dates x scenarios, 'summary': scenarios x metrics,
+             'lot_change': buy dates x scenarios (bool), 'buy_budget': cash at each buy per scenario}.
+    """
+    fills = ledger.to_frame() if hasattr(ledger, "to_frame") else ledger
+    fills = fills[fills["side"].astype(str).isin(["buy", "sell", "unfilled"])]  # unfilled: 0 volume, no cash
+    daily = daily_records.to_frame() if hasattr(daily_records, "to_frame") else pd.DataFrame(daily_records)
+    dates = daily["date"].astype(str).to_numpy()
+    day_type = daily["day_type"].astype(str).to_numpy()
+    market_value = daily["market_value"].to_numpy(dtype=np.float64)
+    n_days, K = len(dates), len(scenarios)
+    names = [s.name for s in scenarios]
+    r = _rates(scenarios)
+
+    di = pd.Index(dates).get_indexer(fills["date"].astype(str))
+    if (di < 0).any():
+        raise ValueError("Ledger dates not in the daily records")
+    is_buy = fills["side"].astype(str).isin(["buy", "unfilled"]).to_numpy()
+    is_sh = fills["symbol"].astype(str).str.upper().str.endswith((".SH", ".SSE")).to_numpy()
+    price = fills["price"].to_numpy(dtype=np.float64)
+    volume = fills["volume"].to_numpy(dtype=np.float64)
+    amount = price * volume
+    gain = np.where(is_buy, 0.0, volume * (price - fills["cost_price"].to_numpy(dtype=np.float64)))
+    gains_by_day = np.bincount(di, weights=np.where(gain > 0, gain, 0.0), minlength=n_days)
+
+    # Per-day cash flows per scenario (K x n_days), computed in scenario blocks to bound memory
+    buy_cost = np.zeros((K, n_days))
+    sell_fees = np.zeros((K, n_days))
+    stamp = np.zeros((K, n_days))
+    bi, si = np.flatnonzero(is_buy), np.flatnonzero(~is_buy)
+    sell_notional = np.bincount(di[si], weights=amount[si], minlength=n_days)
+    for k0 in range(0, K, block):
+        k = slice(k0, min(k0 + block, K))
+        bc = _buy_cost(amount[bi], is_sh[bi], r, k)
+        sf = _sell_fees(amount[si], is_sh[si], r, k)
+        st = amount[si] * r["stamp"][k]
+        for row in range(bc.shape[0]):
+            buy_cost[k0 + row] = np.bincount(di[bi], weights=bc[row], minlength=n_days)
+            sell_fees[k0 + row] = np.bincount(di[si], weights=sf[row], minlength=n_days)
+            stamp[k0 + row] = np.bincount(di[si], weights=st[row], minlength=n_days)
+
+    # Replay cash / liabilities day by day, vectorized over scenarios
+    nav_prev = np.full(K, float(daily["cash_start"].iloc[0]))
+    cash = nav_prev.copy()
+    accumulated = np.zeros(K)
+    nav = np.zeros((n_days, K))
+    liabilities_total = np.zeros(K)
+    buy_days = np.flatnonzero(day_type == "buy")
+    lot_change = np.zeros((len(buy_days), K), dtype=bool)
+    budgets = np.zeros((len(buy_days), K))
+    fills_by_day = {d: bi[di[bi] == d] for d in buy_days}
+    recorded_budget = daily["cash_start"].to_numpy(dtype=np.float64)
+
+    for t in range(n_days):
+        if day_type[t] == "buy":
+            row = int(np.searchsorted(buy_days, t))
+            budgets[row] = cash
+            idx = fills_by_day[t]
+            if len(idx):
+                p, sh, v = price[idx][None, :], is_sh[idx][None, :], volume[idx][None, :]
+                leftover = cash - buy_cost[:, t]
+                inc = _buy_cost(p * (v + 100.0), sh, r) - _buy_cost(p * v, sh, r)
+                v0 = _max_lots(p, cash[:, None] / len(idx), sh, r)  # idx: the whole pool, 0-lot stocks included
+                v0_base = _max_lots(p, np.full((1, 1), recorded_budget[t] / len(idx)), sh,
+                                    {key: val[:1] for key, val in r.items()})
+                lot_change[row] = (leftover < 0) | (leftover >= inc.min(axis=1)) | (v0 != v0_base).any(axis=1)
+            cash = cash - buy_cost[:, t]
+        elif day_type[t] == "sell":
+            cash = cash + sell_notional[t] - sell_fees[:, t]
+
+        liabilities = nav_prev * r["operating"]
+        if day_type[t] == "sell":
+            liabilities = liabilities + gains_by_day[t] * r["tax"]
+        accumulated = accumulated + liabilities
+        liabilities_total += liabilities
+        if day_type[t] == "sell":
+            cash = cash - accumulated
+            accumulated = np.zeros(K)
+            nav_today = cash + market_value[t]
+        else:
+            nav_today = cash + market_value[t] - accumulated
+        nav[t] = nav_today
+        nav_prev = nav_today
+
+    nav_df = pd.DataFrame(nav, index=dates, columns=names)
+    buy_notional = np.bincount(di[bi], weights=amount[bi], minlength=n_days).sum()
+    summary = pd.DataFrame({
+        "final_nav": nav[-1],
+        "buy_fees": buy_cost.sum(axis=1) - buy_notional,
+        "sell_fees": sell_fees.sum(axis=1) - stamp.sum(axis=1),
+        "stamp_tax": stamp.sum(axis=1),
+        "liabilities": liabilities_total,
+        "lot_change_days": lot_change.sum(axis=0),
+    }, index=names)
+    summary["nav_diff_vs_base"] = summary["final_nav"] - summary["final_nav"].iloc[0]
+
+    start = pd.Series([daily["cash_start"].iloc[0]] * K, index=names)
+    start_date = (pd.to_datetime(dates[0], format="%Y%m%d") - pd.offsets.BDay(1)).strftime("%Y%m%d")
+    metrics = compute_performance_metrics_batch(pd.concat([start.to_frame(start_date).T, nav_df]))
+    summary = summary.join(metrics[["total_return", "annualized_return", "sharpe_ratio", "max_drawdown_pct"]])
+
+    return {
+        "nav": nav_df,
+        "summary": summary,
+        "lot_change": pd.DataFrame(lot_change, index=dates[buy_days], columns=names),
+        "buy_budget": pd.DataFrame(budgets, index=dates[buy_days], columns=names),
+    }
+
+
+def verify_lot_changes(ledger, scenarios: Sequence[CostScenario], result: Dict[str, pd.DataFrame],
+                       only_flagged: bool = True) -> pd.DataFrame:
+    """
+    Exact check: rerun PositionManager.calculate_full_allocation for (buy day, scenario) pairs
+    (the flagged ones by default) with the replayed cash, and compare lot counts to the ledger.
+    Stock pool = the day's recorded buys plus unfilled (0-lot) pool stocks. Returns a buy dates x scenarios
+    bool DataFrame.
+    """
+    import logging
+    from trading.中证500指增_LGBM.position_manager import PositionManager
+
+    fills = ledger.to_frame() if hasattr(ledger, "to_frame") else ledger
+    buys = fills[fills["side"].astype(str).isin(["buy", "unfilled"])]
+    flags, budgets = result["lot_change"], result["buy_budget"]
+    changed = pd.DataFrame(False, index=flags.index, columns=flags.columns)
+
+    pm_logger = logging.getLogger(PositionManager.__module__)
+    level = pm_logger.level
+    pm_logger.setLevel(logging.WARNING)  # allocation summaries per replayed day are noise here
+    try:
+        for scenario in scenarios:
+            pm = PositionManager(scenario.buy_fee_schedule, scenario.sell_fee_schedule)
+            for date in flags.index:
+                if only_flagged and not flags.loc[date, scenario.name]:
+                    continue
+                day = buys[buys["date"].astype(str) == date]
+                prices = dict(zip(day["symbol"].astype(str), day["price"].astype(float)))
+                market = {sym: {"open": p, "close": p} for sym, p in prices.items()}
+                alloc = pm.calculate_full_allocation(list(prices), float(budgets.loc[date, scenario.name]),
+                                                     market, prices=prices)
+                got = {a["symbol"]: a["volume"] for a in alloc}
+                changed.loc[date, scenario.name] = any(
+                    got.get(sym) != vol for sym, vol in zip(day["symbol"].astype(str), day["volume"]))
+    finally:
+        pm_logger.setLevel(level)
+    return changed
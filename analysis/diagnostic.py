@@ -6,13 +6,32 @@ import pandas as pd
 from pathlib import Path
 
 def get_daily_df(engine):
-    """Return per-day diagnostic as DataFrame."""
-    if not getattr(engine, "_daily_records", None):
+    """Return per-day diagnostic as DataFrame (DailyRecorder or a list of per-day dicts)."""
+    records = getattr(engine, "_daily_records", None)
+    if not records:
         return None
-    return pd.DataFrame(engine._daily_records)
+    if hasattr(records, "to_frame"):
+        return records.to_frame()
+    return pd.DataFrame(records)
 
 
-def print_backtest_diagnostic(engine, save_path=None, daily_csv_path=None):
+def format_instrumentation_summary(instrumentation):
+    """Phase timing table and counters of an enabled backtest.instrumentation.Instrumentation, as lines."""
+    summary = instrumentation.summary()
+    lines = [
+        "",
+        f"--- Instrumentation ({len(instrumentation.dates)} days) ---",
+        f"{'phase':<16}{'total_s':>10}{'share%':>9}{'mean_ms':>10}{'p95_ms':>10}{'max_ms':>10}",
+    ]
+    for row in summary.itertuples(index=False):
+        lines.append(f"{row.phase:<16}{row.total_s:>10.3f}{row.share_pct:>9.1f}"
+                     f"{row.mean_ms:>10.2f}{row.p95_ms:>10.2f}{row.max_ms:>10.2f}")
+    for name, value in sorted(instrumentation.counters.items()):
+        lines.append(f"{name:<20}{value:>15,}")
+    return lines
+
+
+def print_backtest_diagnostic(engine, save_path=None, daily_csv_path=None, daily_parquet_path=None):
     """
     Print diagnostic summary. If save_path is provided, also write to file.
 
@@ -20,6 +39,7 @@ def print_backtest_diagnostic(engine, save_path=None, daily_csv_path=None):
         engine: 中证500指增_LGBM_BacktestEngine after run()
         save_path: optional path to save summary log (e.g. Path or str)
         daily_csv_path: optional path to save per-day DataFrame as CSV
+        daily_parquet_path: optional path to save per-day DataFrame as parquet
     """
     if not engine.equity_history:
         msg = "No equity history."
@@ -80,6 +100,9 @@ def print_backtest_diagnostic(engine, save_path=None, daily_csv_path=None):
             lines.append(f"  {p['symbol']}: {p['volume']} @ {p.get('open_buy_price', '?')}")
         if len(engine.account.positions) > 5:
             lines.append(f"  ... and {len(engine.account.positions) - 5} more")
+    instrumentation = getattr(engine, "instrumentation", None)
+    if instrumentation is not None and instrumentation.enabled:
+        lines.extend(format_instrumentation_summary(instrumentation))
     lines.append("=" * 50)
 
     text = "\n".join(lines)
@@ -94,6 +117,11 @@ def print_backtest_diagnostic(engine, save_path=None, daily_csv_path=None):
         print(daily_df.head(10).to_string())
         print("...")
         print(daily_df.tail(10).to_string())
+        if daily_parquet_path:
+            daily_parquet_path = Path(daily_parquet_path)
+            daily_parquet_path.parent.mkdir(parents=True, exist_ok=True)
+            daily_df.to_parquet(daily_parquet_path, index=False)
+            print(f"\nDaily record saved to {daily_parquet_path}")
         if daily_csv_path:
             daily_csv_path = Path(daily_csv_path)
             daily_csv_path.parent.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,173 @@
+"""
+Online performance metrics, updated once per day in O(1).
+
+OnlinePerformanceMetrics keeps running moments instead of the full history:
+Welford mean/variance of returns, downside sum of squares, running peak,
+drawdown and underwater duration, and paired strategy/benchmark co-moments
+for beta, alpha and tracking error. snapshot() at any point gives the same
+values compute_performance_metrics would give on the history so far.
+
+The benchmark is streamed with the NAV: update(date, nav, benchmark_close=...)
+pairs each day's strategy return with the index return since the previous
+streamed close, so a live run needs no index history up front. A full
+benchmark {date: close} dict passed to __init__ is a convenience for replays
+(returns on the benchmark's own calendar, as in compute_performance_metrics).
+
+Pass an instance to the engine (online_metrics=...) to have it updated
+after every trading day; with benchmark_close=callable(date) (e.g.
+BacktestSession.benchmark_close, the default in BacktestSession.run) the
+engine streams the index close with each NAV.
+"""
+import math
+from datetime import datetime
+from typing import Dict, Optional
+
+# Annualization: assume daily-ish series; 252 trading days per year
+TRADING_DAYS_PER_YEAR = 252
+
+
+class _Moments:
+    """Welford running mean / variance / covariance for one or two series."""
+
+    __slots__ = ("n", "mean_x", "mean_y", "m2_x", "m2_y", "c_xy")
+
+    def __init__(self):
+        self.n = 0
+        self.mean_x = self.mean_y = 0.0
+        self.m2_x = self.m2_y = self.c_xy = 0.0
+
+    def update(self, x: float, y: float = 0.0) -> None:
+        self.n += 1
+        dx = x - self.mean_x
+        dy = y - self.mean_y
+        self.mean_x += dx / self.n
+        self.mean_y += dy / self.n
+        self.m2_x += dx * (x - self.mean_x)
+        self.m2_y += dy * (y - self.mean_y)
+        self.c_xy += dx * (y - self.mean_y)
+
+    def var_x(self) -> float:
+        return self.m2_x / (self.n - 1) if self.n >= 2 else math.nan
+
+    def var_y(self) -> float:
+        return self.m2_y / (self.n - 1) if self.n >= 2 else math.nan
+
+    def cov(self) -> float:
+        return self.c_xy / (self.n - 1) if self.n >= 2 else math.nan
+
+
+class OnlinePerformanceMetrics:
+    def __init__(self, benchmark: Optional[Dict[str, float]] = None, risk_free_rate: float = 0.0):
+        self.risk_free_rate = risk_free_rate
+        # Benchmark returns on the benchmark's own calendar (same as pct_change in the batch metrics)
+        self._bench_ret = {}
+        if benchmark and len(benchmark) >= 2:
+            prev = None
+            for d in sorted(benchmark):
+                if prev is not None and benchmark[prev] != 0:
+                    self._bench_ret[d] = benchmark[d] / benchmark[prev] - 1.0
+                prev = d
+        self._has_benchmark = bool(self._bench_ret)
+        self._last_bench_close = None  # streamed benchmark (update(..., benchmark_close=))
+
+        self.first_date = self.last_date = None
+        self.first_nav = self.last_nav = None
+        self.n_observations = 0
+        self._ret = _Moments()
+        self._paired = _Moments()  # (strategy, benchmark) returns on common dates
+        self._wins = 0
+        self._n_down = 0
+        self._down_sq = 0.0
+        self.peak = None
+        self.drawdown = 0.0
+        self.max_drawdown = 0.0
+        self.max_drawdown_pct = 0.0
+        self._underwater = 0
+        self.max_drawdown_duration = 0
+
+    def update(self, date_str: str, nav: float, benchmark_close: Optional[float] = None) -> None:
+        """
+        Add one observation (dates must arrive in increasing order).
+        benchmark_close: the index close on date_str; when given it takes precedence over the __init__ dict.
+        """
+        nav = float(nav)
+        rb = self._bench_ret.get(date_str)
+        if benchmark_close is not None:
+            close = float(benchmark_close)
+            prev = self._last_bench_close
+            rb = close / prev - 1.0 if prev else None
+            self._last_bench_close = close
+            self._has_benchmark = True
+        if self.n_observations == 0:
+            self.first_date, self.first_nav = date_str, nav
+        else:
+            r = nav / self.last_nav - 1.0
+            self._ret.update(r)
+            if r > 0:
+                self._wins += 1
+            elif r < 0:
+                self._n_down += 1
+                self._down_sq += r * r
+            if rb is not None:
+                self._paired.update(r, rb)
+
+        self.n_observations += 1
+        self.last_date, self.last_nav = date_str, nav
+
+        # Running peak / drawdown / underwater duration
+        if self.peak is None or nav >= self.peak:
+            self.peak = nav
+            self._underwater = 0
+        else:
+            self._underwater += 1
+            self.max_drawdown_duration = max(self.max_drawdown_duration, self._underwater)
+        self.drawdown = nav - self.peak
+        self.max_drawdown = min(self.max_drawdown, self.drawdown)
+        if self.peak != 0:
+            self.max_drawdown_pct = min(self.max_drawdown_pct, self.drawdown / self.peak)
+
+    def snapshot(self) -> Dict[str, object]:
+        """Current metrics (keys as in compute_performance_metrics, plus current drawdown)."""
+        if self.n_observations < 2:
+            return {}
+        sqrt_year = math.sqrt(TRADING_DAYS_PER_YEAR)
+        mean_excess = self._ret.mean_x - self.risk_free_rate / TRADING_DAYS_PER_YEAR
+        vol = math.sqrt(self._ret.var_x()) * sqrt_year if self._ret.n >= 2 else math.nan
+        downside_vol = math.sqrt(self._down_sq / self._n_down) * sqrt_year if self._n_down else math.nan
+
+        total_return = self.last_nav / self.first_nav - 1.0
+        days = (datetime.strptime(self.last_date, "%Y%m%d") - datetime.strptime(self.first_date, "%Y%m%d")).days
+        ann_ret = math.nan
+        if days > 0 and self.first_nav > 0 and total_return >= -1.0:
+            ann_ret = (1.0 + total_return) ** (365.0 / days) - 1.0
+
+        out = {
+            "n_observations": self.n_observations,
+            "total_return": total_return,
+            "annualized_return": ann_ret,
+            "annualized_volatility": vol,
+            "sharpe_ratio": mean_excess * TRADING_DAYS_PER_YEAR / vol if vol > 0 else math.nan,
+            "sortino_ratio": mean_excess * TRADING_DAYS_PER_YEAR / downside_vol if downside_vol > 0 else math.nan,
+            "max_drawdown": self.max_drawdown,
+            "max_drawdown_pct": self.max_drawdown_pct,
+            "max_drawdown_duration_periods": self.max_drawdown_duration,
+            "current_drawdown_pct": self.drawdown / self.peak if self.peak else math.nan,
+            "calmar_ratio": ann_ret / abs(self.max_drawdown_pct) if self.max_drawdown_pct < 0 else math.nan,
+            "win_rate": self._wins / self._ret.n,
+        }
+
+        if self._has_benchmark:
+            p = self._paired
+            var_b = p.var_y()
+            beta = p.cov() / var_b if p.n >= 2 and var_b != 0 else math.nan
+            alpha_ann = te = math.nan
+            if p.n >= 2:
+                alpha_ann = (p.mean_x - beta * p.mean_y) * TRADING_DAYS_PER_YEAR
+                active_var = p.var_x() - 2.0 * beta * p.cov() + beta * beta * var_b
+                te = math.sqrt(max(active_var, 0.0)) * sqrt_year
+            out["alpha_annualized"] = alpha_ann
+            out["beta"] = beta
+            out["tracking_error_annualized"] = te
+            out["information_ratio"] = alpha_ann / te if te > 0 else math.nan
+
+        return out
@@ -3,6 +3,10 @@ Backtest performance metrics (pro-style).
 Computes annualized return, Sharpe, max drawdown, Calmar, Sortino, etc.,
 optionally vs benchmark (alpha, beta, tracking error, information ratio).
 Saves to .txt by category; optionally prints.
+
+All metrics are computed by compute_performance_metrics_batch on a
+(dates x runs) NAV matrix in one vectorized NumPy pass; the single-curve
+compute_performance_metrics delegates to it with one column.
 """
 import pandas as pd
 import numpy as np
@@ -13,117 +17,129 @@ from typing import Dict, List, Optional, Tuple
 TRADING_DAYS_PER_YEAR = 252
 
 
-def _to_returns_series(equity_history: Dict[str, float]) -> pd.Series:
-    """Convert equity_history (date_str -> NAV) to sorted series, then compute period returns."""
-    s = pd.Series(equity_history).sort_index()
+def _sorted_series(history: Dict[str, float]) -> pd.Series:
+    """date_str -> value dict to a float series on a sorted DatetimeIndex."""
+    s = pd.Series(history, dtype=np.float64).sort_index()
     s.index = pd.to_datetime(s.index, format="%Y%m%d")
-    return s.pct_change().dropna()
+    return s
 
 
-def _annualized_return(s: pd.Series) -> float:
-    """CAGR from first to last value."""
-    if len(s) < 2 or s.iloc[0] <= 0:
-        return np.nan
-    n_years = (s.index[-1] - s.index[0]).days / 365.0
+def _annualized_return(first: np.ndarray, last: np.ndarray, start: pd.Timestamp, end: pd.Timestamp) -> np.ndarray:
+    """CAGR from first to last value (per run)."""
+    n_years = (end - start).days / 365.0
+    out = np.full(np.shape(first), np.nan)
     if n_years <= 0:
-        return np.nan
-    total_return = s.iloc[-1] / s.iloc[0] - 1.0
-    return (1.0 + total_return) ** (1.0 / n_years) - 1.0
-
-
-def _annualized_volatility(returns: pd.Series) -> float:
-    if returns.empty or len(returns) < 2:
-        return np.nan
-    return returns.std() * np.sqrt(TRADING_DAYS_PER_YEAR)
-
-
-def _sharpe_ratio(returns: pd.Series, risk_free_rate: float = 0.0) -> float:
-    """Annualized Sharpe: (mean_excess_return) / (annualized_vol)."""
-    if returns.empty:
-        return np.nan
-    excess = returns - (risk_free_rate / TRADING_DAYS_PER_YEAR)
-    vol = _annualized_volatility(returns)
-    if vol <= 0:
-        return np.nan
-    return excess.mean() * TRADING_DAYS_PER_YEAR / vol
-
-
-def _sortino_ratio(returns: pd.Series, risk_free_rate: float = 0.0) -> float:
-    """Downside deviation (only negative returns)."""
-    if returns.empty:
-        return np.nan
-    excess = returns - (risk_free_rate / TRADING_DAYS_PER_YEAR)
-    downside = returns[returns < 0]
-    if downside.empty:
-        return np.nan
-    downside_vol = np.sqrt((downside ** 2).mean()) * np.sqrt(TRADING_DAYS_PER_YEAR)
-    if downside_vol <= 0:
-        return np.nan
-    return excess.mean() * TRADING_DAYS_PER_YEAR / downside_vol
-
-
-def _max_drawdown(s: pd.Series) -> tuple:
-    """Return (max_dd, max_dd_pct). Max DD in absolute and in % of peak."""
-    if len(s) < 2:
-        return np.nan, np.nan
-    cummax = s.cummax()
-    dd = s - cummax
-    dd_pct = (s - cummax) / cummax.replace(0, np.nan)
-    return dd.min(), dd_pct.min()
-
-
-def _max_drawdown_duration(s: pd.Series) -> int:
-    """Longest number of periods (e.g. days) underwater from a peak."""
-    if len(s) < 2:
-        return 0
-    cummax = s.cummax()
-    underwater = s < cummax
-    # count consecutive True
-    grp = (~underwater).cumsum()
-    dur = underwater.groupby(grp).sum()
-    return int(dur.max()) if len(dur) else 0
-
-
-def _calmar_ratio(equity_series: pd.Series, ann_return: float) -> float:
-    """Annualized return / abs(max drawdown %)."""
-    _, dd_pct = _max_drawdown(equity_series)
-    if dd_pct is np.nan or dd_pct >= 0:
-        return np.nan
-    return ann_return / abs(dd_pct)
-
-
-def _win_rate(returns: pd.Series) -> float:
-    """Fraction of periods with positive return."""
-    if returns.empty:
-        return np.nan
-    return (returns > 0).mean()
-
-
-def _alpha_beta_tracking(ret_strategy: pd.Series, ret_bench: pd.Series) -> tuple:
-    """Align by index, then alpha (annualized), beta, tracking error (annualized)."""
-    common = ret_strategy.index.intersection(ret_bench.index)
-    if len(common) < 2:
-        return np.nan, np.nan, np.nan
-    r_s = ret_strategy.loc[common].dropna()
-    r_b = ret_bench.loc[common].reindex(r_s.index).ffill().bfill()
-    valid = r_b.notna()
-    r_s, r_b = r_s[valid], r_b[valid]
-    if len(r_s) < 2:
-        return np.nan, np.nan, np.nan
-    cov = np.cov(r_s, r_b)
-    beta = cov[0, 1] / cov[1, 1] if cov[1, 1] != 0 else np.nan
-    alpha_series = r_s - beta * r_b
-    alpha_ann = alpha_series.mean() * TRADING_DAYS_PER_YEAR
-    te = alpha_series.std() * np.sqrt(TRADING_DAYS_PER_YEAR)
-    return alpha_ann, beta, te
-
-
-def _information_ratio(ret_strategy: pd.Series, ret_bench: pd.Series) -> float:
-    """Annualized active return / tracking error."""
-    alpha_ann, _, te = _alpha_beta_tracking(ret_strategy, ret_bench)
-    if te is np.nan or te <= 0:
-        return np.nan
-    return alpha_ann / te
+        return out
+    ok = first > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        total = last / first - 1.0
+        out[ok] = (1.0 + total[ok]) ** (1.0 / n_years) - 1.0
+    return out
+
+
+def _std(x: np.ndarray, axis: int = 0) -> np.ndarray:
+    """Sample standard deviation (ddof=1), NaN for fewer than 2 rows."""
+    if x.shape[axis] < 2:
+        return np.full(x.shape[1 - axis], np.nan)
+    return x.std(axis=axis, ddof=1)
+
+
+def _max_drawdown_duration(underwater: np.ndarray) -> np.ndarray:
+    """Longest number of consecutive underwater periods per column."""
+    t = np.arange(underwater.shape[0])[:, None]
+    last_peak = np.maximum.accumulate(np.where(underwater, -1, t), axis=0)
+    run = np.where(underwater, t - last_peak, 0)
+    return run.max(axis=0) if len(run) else np.zeros(underwater.shape[1], dtype=np.int64)
+
+
+def compute_performance_metrics_batch(
+    nav,
+    benchmark: Optional[Dict[str, float]] = None,
+    risk_free_rate: float = 0.0,
+) -> pd.DataFrame:
+    """
+    Compute every metric in _PERFORMANCE_CATEGORIES for many equity curves at once.
+
+    nav: DataFrame indexed by date_str 'YYYYMMDD' (dates x runs), fully populated
+         (align runs on a common calendar first).
+    Returns a DataFrame (runs x metrics); benchmark columns only if benchmark has >= 2 points.
+    """
+    nav = nav.sort_index()
+    dt = pd.to_datetime(nav.index, format="%Y%m%d")
+    X = nav.to_numpy(dtype=np.float64)
+    n_obs, n_runs = X.shape
+    if n_obs < 2:
+        return pd.DataFrame(index=nav.columns)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        R = X[1:] / X[:-1] - 1.0                      # period returns (T-1 x runs)
+        rf = risk_free_rate / TRADING_DAYS_PER_YEAR
+        mean_excess = R.mean(axis=0) - rf
+
+        # Returns / risk
+        ann_ret = _annualized_return(X[0], X[-1], dt[0], dt[-1])
+        vol = _std(R) * np.sqrt(TRADING_DAYS_PER_YEAR)
+        sharpe = np.where(vol > 0, mean_excess * TRADING_DAYS_PER_YEAR / vol, np.nan)
+
+        neg = R < 0
+        n_neg = neg.sum(axis=0)
+        downside_vol = np.sqrt(np.where(neg, R * R, 0.0).sum(axis=0) / n_neg) * np.sqrt(TRADING_DAYS_PER_YEAR)
+        sortino = np.where((n_neg > 0) & (downside_vol > 0), mean_excess * TRADING_DAYS_PER_YEAR / downside_vol, np.nan)
+
+        # Drawdown (one running peak shared by all drawdown metrics)
+        peak = np.maximum.accumulate(X, axis=0)
+        dd = X - peak
+        dd_pct = dd / np.where(peak == 0, np.nan, peak)
+        dd_abs_min = dd.min(axis=0)
+        all_nan = np.isnan(dd_pct).all(axis=0)
+        dd_pct_min = np.where(all_nan, np.nan, np.nanmin(np.where(all_nan, 0.0, dd_pct), axis=0))
+        duration = _max_drawdown_duration(X < peak)
+        calmar = np.where(dd_pct_min < 0, ann_ret / np.abs(dd_pct_min), np.nan)
+
+    out = pd.DataFrame(index=nav.columns)
+    out["start_date"] = dt[0].strftime("%Y-%m-%d")
+    out["end_date"] = dt[-1].strftime("%Y-%m-%d")
+    out["n_observations"] = n_obs
+    out["total_return"] = X[-1] / X[0] - 1.0
+    out["annualized_return"] = ann_ret
+    out["annualized_volatility"] = vol
+    out["sharpe_ratio"] = sharpe
+    out["sortino_ratio"] = sortino
+    out["max_drawdown"] = dd_abs_min
+    out["max_drawdown_pct"] = dd_pct_min
+    out["max_drawdown_duration_periods"] = duration.astype(np.int64)
+    out["calmar_ratio"] = calmar
+    out["win_rate"] = (R > 0).mean(axis=0)
+
+    if benchmark and len(benchmark) >= 2:
+        b = _sorted_series(benchmark)
+        ret_bench = b.pct_change().dropna()
+        # Align on dates where both strategy and benchmark have a return
+        ret_dates = dt[1:]
+        common = ret_dates.intersection(ret_bench.index)
+        alpha_ann, beta, te = (np.full(n_runs, np.nan) for _ in range(3))
+        if len(common) >= 2:
+            rs = R[ret_dates.get_indexer(common)]
+            rb = ret_bench.loc[common].to_numpy(dtype=np.float64)[:, None]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                dev_s = rs - rs.mean(axis=0)
+                dev_b = rb - rb.mean(axis=0)
+                cov_sb = (dev_s * dev_b).sum(axis=0) / (len(common) - 1)
+                var_b = (dev_b * dev_b).sum(axis=0) / (len(common) - 1)
+                beta = np.where(var_b != 0, cov_sb / var_b, np.nan)
+                active = rs - beta * rb
+                alpha_ann = active.mean(axis=0) * TRADING_DAYS_PER_YEAR
+                te = _std(active) * np.sqrt(TRADING_DAYS_PER_YEAR)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            info_ratio = np.where(te > 0, alpha_ann / te, np.nan)
+        out["benchmark_annualized_return"] = _annualized_return(
+            np.array([b.iloc[0]]), np.array([b.iloc[-1]]), b.index[0], b.index[-1])[0]
+        out["alpha_annualized"] = alpha_ann
+        out["beta"] = beta
+        out["tracking_error_annualized"] = te
+        out["information_ratio"] = info_ratio
+
+    return out
 
 
 def compute_performance_metrics(
@@ -138,42 +154,11 @@ def compute_performance_metrics(
     if not equity_history or len(equity_history) < 2:
         return {}
 
-    s = pd.Series(equity_history).sort_index()
-    s.index = pd.to_datetime(s.index, format="%Y%m%d")
-    returns = _to_returns_series(equity_history)
-
-    ann_ret = _annualized_return(s)
-    vol = _annualized_volatility(returns)
-    total_ret = s.iloc[-1] / s.iloc[0] - 1.0
-    dd_abs, dd_pct = _max_drawdown(s)
-
-    out = {
-        "start_date": s.index[0].strftime("%Y-%m-%d"),
-        "end_date": s.index[-1].strftime("%Y-%m-%d"),
-        "n_observations": len(s),
-        "total_return": total_ret,
-        "annualized_return": ann_ret,
-        "annualized_volatility": vol,
-        "sharpe_ratio": _sharpe_ratio(returns, risk_free_rate),
-        "sortino_ratio": _sortino_ratio(returns, risk_free_rate),
-        "max_drawdown": dd_abs,
-        "max_drawdown_pct": dd_pct,
-        "max_drawdown_duration_periods": _max_drawdown_duration(s),
-        "calmar_ratio": _calmar_ratio(s, ann_ret),
-        "win_rate": _win_rate(returns),
-    }
-
-    if benchmark and len(benchmark) >= 2:
-        b = pd.Series(benchmark).sort_index()
-        b.index = pd.to_datetime(b.index, format="%Y%m%d")
-        ret_bench = b.pct_change().dropna()
-        alpha_ann, beta, te = _alpha_beta_tracking(returns, ret_bench)
-        out["benchmark_annualized_return"] = _annualized_return(b)
-        out["alpha_annualized"] = alpha_ann
-        out["beta"] = beta
-        out["tracking_error_annualized"] = te
-        out["information_ratio"] = _information_ratio(returns, ret_bench)
-
+    nav = pd.DataFrame({"nav": pd.Series(equity_history, dtype=np.float64)})
+    row = compute_performance_metrics_batch(nav, benchmark=benchmark, risk_free_rate=risk_free_rate).iloc[0]
+    out = row.to_dict()
+    out["n_observations"] = int(out["n_observations"])
+    out["max_drawdown_duration_periods"] = int(out["max_drawdown_duration_periods"])
     return out
 
 
@@ -1,19 +1,69 @@
+"""
+Equity curve plot (strategy vs benchmark, cumulative alpha on the right axis).
+
+matplotlib is imported (Agg backend, CJK fonts) on the first plot call, not
+at import time, so runs that skip the chart don't pay for it. Long series are
+downsampled with LTTB (largest-triangle-three-buckets), which keeps first/last
+points and the visual peaks and troughs; axis limits still use the full series.
+"""
 import platform
-import matplotlib
-import matplotlib.pyplot as plt
 import pandas as pd
-import matplotlib.dates as mdates
 import numpy as np
 
-# 中文与负号显示（按系统选用可用字体）
-_sys = platform.system()
-if _sys == "Windows":
-    matplotlib.rcParams["font.sans-serif"] = ["Microsoft YaHei", "SimHei", "SimSun"]
-elif _sys == "Darwin":
-    matplotlib.rcParams["font.sans-serif"] = ["PingFang SC", "Heiti SC", "STHeiti"]
-else:
-    matplotlib.rcParams["font.sans-serif"] = ["WenQuanYi Micro Hei", "Noto Sans CJK SC", "Droid Sans Fallback"]
-matplotlib.rcParams["axes.unicode_minus"] = False
+_MPL = None
+
+
+def _get_matplotlib():
+    """Import matplotlib with the Agg backend and CJK font setup once; return (plt, mdates)."""
+    global _MPL
+    if _MPL is None:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        import matplotlib.dates as mdates
+
+        # 中文与负号显示（按系统选用可用字体）
+        _sys = platform.system()
+        if _sys == "Windows":
+            matplotlib.rcParams["font.sans-serif"] = ["Microsoft YaHei", "SimHei", "SimSun"]
+        elif _sys == "Darwin":
+            matplotlib.rcParams["font.sans-serif"] = ["PingFang SC", "Heiti SC", "STHeiti"]
+        else:
+            matplotlib.rcParams["font.sans-serif"] = ["WenQuanYi Micro Hei", "Noto Sans CJK SC", "Droid Sans Fallback"]
+        matplotlib.rcParams["axes.unicode_minus"] = False
+        _MPL = (plt, mdates)
+    return _MPL
+
+
+def lttb_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-triangle-three-buckets: indices of n_out points that best keep the shape of y
+    (x taken as the position). Always keeps the first and last point.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)  # n_out - 2 inner buckets
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # average of the next bucket (or the last point)
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        idx[i + 1] = a
+    return idx
+
+
+def _downsample(s: pd.Series, max_points) -> pd.Series:
+    if max_points is None or len(s) <= max_points:
+        return s
+    return s.iloc[lttb_indices(s.to_numpy(), max_points)]
 
 
 def plot_equity_curve(
@@ -21,8 +71,15 @@ def plot_equity_curve(
     benchmark: dict = None,
     title: str = "Quantitative Backtest Analysis",
     save_path=None,
+    dpi: int = 300,
+    max_points: int = None,
 ):
+    """
+    dpi: resolution of the saved PNG.
+    max_points: if set, each line is LTTB-downsampled to at most this many points.
+    """
     if not equity_history: return
+    plt, mdates = _get_matplotlib()
 
     # --- 1. 数据准备 (Data Prep) ---
     s = pd.Series(equity_history).sort_index()
@@ -32,8 +89,9 @@ def plot_equity_curve(
     fig, ax1 = plt.subplots(figsize=(15, 8))
     
     # 策略线 (红色 + 浅红色阴影)
-    ax1.plot(s_norm.index, s_norm.values, label="Strategy", color="#e31a1c", linewidth=2.5, zorder=4)
-    ax1.fill_between(s_norm.index, 1.0, s_norm.values, color="#e31a1c", alpha=0.08, zorder=3)
+    s_plot = _downsample(s_norm, max_points)
+    ax1.plot(s_plot.index, s_plot.values, label="Strategy", color="#e31a1c", linewidth=2.5, zorder=4)
+    ax1.fill_between(s_plot.index, 1.0, s_plot.values, color="#e31a1c", alpha=0.08, zorder=3)
     
     if benchmark:
         b = pd.Series(benchmark).sort_index()
@@ -45,11 +103,13 @@ def plot_equity_curve(
             alpha = (s_norm.loc[common] - b_norm)
             
             # 基准线 (蓝色实线)
-            ax1.plot(b_norm.index, b_norm.values, label="Benchmark", color="#1f78b4", linewidth=1.5, zorder=2)
+            b_plot = _downsample(b_norm, max_points)
+            ax1.plot(b_plot.index, b_plot.values, label="Benchmark", color="#1f78b4", linewidth=1.5, zorder=2)
             
             # --- 2. 右轴 Alpha 逻辑 (Secondary Axis) ---
             ax2 = ax1.twinx()
-            ax2.plot(alpha.index, alpha.values, color="#d4af37", linewidth=1.8, label="Alpha (Excess)", zorder=5)
+            a_plot = _downsample(alpha, max_points)
+            ax2.plot(a_plot.index, a_plot.values, color="#d4af37", linewidth=1.8, label="Alpha (Excess)", zorder=5)
             
             # --- 3. 核心：Y轴非对称对齐算法 (Alignment Logic) ---
             # 目标：让左轴的 1.0 和右轴的 0 始终在同一水平线上，且下方留白最优化
@@ -120,8 +180,9 @@ def plot_equity_curve(
     plt.tight_layout()
     
     if save_path:
-        plt.savefig(save_path, dpi=300, bbox_inches='tight')
+        plt.savefig(save_path, dpi=dpi, bbox_inches='tight')
         print(f"Plot saved to: {save_path}")
+    plt.close(fig)
 
     # plt.show()
 
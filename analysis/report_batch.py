@@ -0,0 +1,151 @@
+"""
+Batch reporting for a sweep: per-run reports in parallel plus one comparison page.
+
+For every BacktestResult (backtest/result.py) a worker process writes the same
+files main.py writes for a single run:
+    {name}_diagnostic_summary.txt, {name}_diagnostic_details.parquet / .csv,
+    {name}_performance_summary.txt, {name}_equity_curve.png
+The benchmark series is sent once per worker (pool initializer), not once per run.
+The comparison table comes from compute_performance_metrics_batch over all
+runs at once and is written as comparison.csv and index.html (metrics table,
+links to each run's files and the equity curve thumbnails).
+"""
+import contextlib
+import html
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from analysis.diagnostic import print_backtest_diagnostic
+from analysis.performance_matrix import compute_performance_metrics_batch, save_performance_summary
+
+# Output suffixes, as in paths.yaml output.<strategy>
+DEFAULT_SUFFIXES = {
+    "diagnostic_log": "diagnostic_summary.txt",
+    "diagnostic_daily_parquet": "diagnostic_details.parquet",
+    "diagnostic_daily_csv": "diagnostic_details.csv",
+    "performance_summary": "performance_summary.txt",
+    "plot_equity": "equity_curve.png",
+}
+
+_BENCHMARK: Optional[Dict[str, float]] = None
+
+
+def _init_worker(benchmark):
+    global _BENCHMARK
+    _BENCHMARK = benchmark
+
+
+def _report_one(result, out_dir: str, suffixes: Dict[str, str], plot: bool, dpi: int,
+                max_points: Optional[int], risk_free_rate: float, quiet: bool) -> Dict[str, str]:
+    """Write all report files for one run; returns {output key: file name}."""
+    out_dir = Path(out_dir)
+    files = {k: f"{result.name}_{v}" for k, v in suffixes.items()}
+    if not plot:
+        files.pop("plot_equity", None)
+
+    sink = io.StringIO() if quiet else None
+    with contextlib.redirect_stdout(sink) if quiet else contextlib.nullcontext():
+        print_backtest_diagnostic(
+            result, save_path=out_dir / files["diagnostic_log"],
+            daily_csv_path=out_dir / files["diagnostic_daily_csv"] if "diagnostic_daily_csv" in files else None,
+            daily_parquet_path=out_dir / files["diagnostic_daily_parquet"] if "diagnostic_daily_parquet" in files else None)
+        save_performance_summary(result.equity_history, out_dir / files["performance_summary"],
+                                 benchmark=_BENCHMARK, risk_free_rate=risk_free_rate)
+        if plot:
+            from analysis.plot import plot_equity_curve
+
+            plot_equity_curve(result.equity_history, benchmark=_BENCHMARK, title=f"{result.name}_净值曲线",
+                              save_path=out_dir / files["plot_equity"], dpi=dpi, max_points=max_points)
+    return files
+
+
+def compare_runs(results: Sequence, benchmark: Optional[Dict[str, float]] = None,
+                 risk_free_rate: float = 0.0) -> pd.DataFrame:
+    """Metrics table (runs x metrics); runs sharing a calendar are computed in one batch."""
+    by_calendar: Dict[tuple, List] = {}
+    for r in results:
+        if len(r.equity_history) >= 2:
+            by_calendar.setdefault(tuple(sorted(r.equity_history)), []).append(r)
+    frames = []
+    for dates, group in by_calendar.items():
+        nav = pd.DataFrame({r.name: [r.equity_history[d] for d in dates] for r in group}, index=list(dates))
+        frames.append(compute_performance_metrics_batch(nav, benchmark=benchmark, risk_free_rate=risk_free_rate))
+    if not frames:
+        return pd.DataFrame()
+    names = [r.name for r in results if len(r.equity_history) >= 2]
+    return pd.concat(frames).loc[names]
+
+
+def _write_index(table: pd.DataFrame, files: Dict[str, Dict[str, str]], save_path: Path) -> None:
+    cols = list(table.columns)
+    head = "".join(f"<th>{html.escape(c)}</th>" for c in ["run"] + cols + ["reports"])
+    rows = []
+    for name, row in table.iterrows():
+        cells = "".join(f"<td>{v:.4f}</td>" if isinstance(v, float) else f"<td>{v}</td>" for v in row)
+        links = " ".join(f'<a href="{html.escape(f)}">{html.escape(k)}</a>' for k, f in files.get(name, {}).items())
+        rows.append(f"<tr><td>{html.escape(str(name))}</td>{cells}<td>{links}</td></tr>")
+    plots = "".join(
+        f'<figure><a href="{html.escape(f["plot_equity"])}"><img src="{html.escape(f["plot_equity"])}" width="480"></a>'
+        f"<figcaption>{html.escape(name)}</figcaption></figure>"
+        for name, f in files.items() if "plot_equity" in f
+    )
+    page = (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Backtest comparison</title>"
+        "<style>table{border-collapse:collapse;font-size:12px}td,th{border:1px solid #ccc;padding:3px 6px;"
+        "text-align:right}figure{display:inline-block;margin:6px}</style></head><body>"
+        f"<h1>Backtest comparison ({len(table)} runs)</h1><table><tr>{head}</tr>{''.join(rows)}</table>"
+        f"<div>{plots}</div></body></html>"
+    )
+    save_path.write_text(page, encoding="utf-8")
+
+
+def run_report_batch(
+    results: Sequence,
+    out_dir,
+    benchmark: Optional[Dict[str, float]] = None,
+    max_workers: Optional[int] = None,
+    plot: bool = True,
+    dpi: int = 150,
+    max_points: Optional[int] = 2000,
+    risk_free_rate: float = 0.0,
+    suffixes: Optional[Dict[str, str]] = None,
+    quiet: bool = True,
+) -> pd.DataFrame:
+    """
+    Write per-run reports for all results across a process pool, then comparison.csv and index.html.
+
+    results: BacktestResult list (names must be unique; they prefix the file names).
+    max_workers: pool size (default os.cpu_count()); 1 runs everything in this process.
+    quiet: suppress the per-run console output of the report functions.
+    Returns the comparison table (runs x metrics).
+    """
+    names = [r.name for r in results]
+    if len(set(names)) != len(names):
+        raise ValueError("BacktestResult names must be unique within a batch")
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    suffixes = suffixes or DEFAULT_SUFFIXES
+    args = (str(out_dir), suffixes, plot, dpi, max_points, risk_free_rate, quiet)
+    max_workers = min(max_workers or os.cpu_count() or 1, max(len(results), 1))
+
+    files = {}
+    if max_workers == 1:
+        _init_worker(benchmark)
+        for r in results:
+            files[r.name] = _report_one(r, *args)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(benchmark,)) as pool:
+            futures = {r.name: pool.submit(_report_one, r, *args) for r in results}
+            for name, fut in futures.items():
+                files[name] = fut.result()
+
+    table = compare_runs(results, benchmark=benchmark, risk_free_rate=risk_free_rate)
+    table.to_csv(out_dir / "comparison.csv", index_label="run", encoding="utf-8-sig")
+    _write_index(table, files, out_dir / "index.html")
+    print(f"✅ Reports for {len(results)} runs saved to: {out_dir} (index.html, comparison.csv)")
+    return table
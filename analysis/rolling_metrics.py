@@ -0,0 +1,132 @@
+"""
+Rolling-window analytics for review meetings.
+
+For several window lengths at once and many runs (NAV matrix dates x runs):
+rolling volatility, Sharpe, beta / alpha vs benchmark (000905.SH) and
+drawdown from the rolling peak. Sums come from cumulative sums (O(n) per
+window, independent of window length) and the rolling peak from a block
+prefix/suffix maximum (van Herk / Gil-Werman), all vectorized over runs.
+Results are saved as a long parquet table for plotting.
+"""
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from analysis.performance_matrix import TRADING_DAYS_PER_YEAR
+
+DEFAULT_WINDOWS = (20, 60, 120, 252)
+
+
+def _window_sum(x: np.ndarray, w: int) -> np.ndarray:
+    """Sum over the trailing w rows via cumulative sums; first w-1 rows are NaN."""
+    c = np.cumsum(x, axis=0)
+    out = np.full(x.shape, np.nan)
+    if w > x.shape[0]:
+        return out
+    out[w - 1] = c[w - 1]
+    out[w:] = c[w:] - c[:-w]
+    return out
+
+
+def _rolling_max(x: np.ndarray, w: int) -> np.ndarray:
+    """Trailing max over w rows (van Herk / Gil-Werman); first w-1 rows are NaN."""
+    n, k = x.shape
+    out = np.full(x.shape, np.nan)
+    if w > n:
+        return out
+    n_blocks = -(-n // w)
+    padded = np.full((n_blocks * w, k), -np.inf)
+    padded[:n] = x
+    blocks = padded.reshape(n_blocks, w, k)
+    prefix = np.maximum.accumulate(blocks, axis=1).reshape(-1, k)
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(-1, k)
+    i = np.arange(w - 1, n)
+    out[w - 1:] = np.maximum(suffix[i - w + 1], prefix[i])
+    return out
+
+
+def compute_rolling_metrics(
+    nav: pd.DataFrame,
+    windows: Sequence[int] = DEFAULT_WINDOWS,
+    benchmark: Optional[Dict[str, float]] = None,
+    risk_free_rate: float = 0.0,
+) -> pd.DataFrame:
+    """
+    nav: DataFrame indexed by date_str 'YYYYMMDD' (dates x runs), fully populated.
+    benchmark: optional date_str -> close; forward-filled onto the NAV calendar.
+    Returns a long DataFrame: date, run, window, rolling_volatility, rolling_sharpe,
+    rolling_drawdown [, rolling_beta, rolling_alpha]. Return windows end on each date.
+    """
+    nav = nav.sort_index()
+    X = nav.to_numpy(dtype=np.float64)
+    R = X[1:] / X[:-1] - 1.0
+    dates = nav.index[1:]
+    n, k = R.shape
+
+    rb = None
+    if benchmark:
+        b = pd.Series(benchmark, dtype=np.float64).sort_index()
+        b = b.reindex(b.index.union(nav.index)).ffill().reindex(nav.index)
+        rb = (b / b.shift(1) - 1.0).to_numpy()[1:]
+
+    # Center before cumulative sums to limit cancellation in the variance terms
+    rs_c = R - R.mean(axis=0)
+    rf = risk_free_rate / TRADING_DAYS_PER_YEAR
+    if rb is not None:
+        rb_c = (rb - np.nanmean(rb))[:, None]
+        rb_valid = np.isfinite(rb_c)
+        rb_c = np.where(rb_valid, rb_c, 0.0)
+
+    frames = []
+    for w in windows:
+        if w < 2:
+            raise ValueError(f"Rolling window must be >= 2, got {w}")
+        s1 = _window_sum(rs_c, w)
+        s2 = _window_sum(rs_c * rs_c, w)
+        mean_r = s1 / w + R.mean(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var_r = np.maximum(s2 - s1 * s1 / w, 0.0) / (w - 1)
+            vol = np.sqrt(var_r * TRADING_DAYS_PER_YEAR)
+            sharpe = np.where(vol > 0, (mean_r - rf) * TRADING_DAYS_PER_YEAR / vol, np.nan)
+            peak = _rolling_max(X, w + 1)[1:]  # NAV window covering the same w returns
+            drawdown = X[1:] / peak - 1.0
+
+        cols = {
+            "rolling_volatility": vol,
+            "rolling_sharpe": sharpe,
+            "rolling_drawdown": drawdown,
+        }
+        if rb is not None:
+            full = _window_sum(rb_valid.astype(np.float64), w) == w
+            b1 = _window_sum(rb_c, w)
+            b2 = _window_sum(rb_c * rb_c, w)
+            sb = _window_sum(rs_c * rb_c, w)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                var_b = (b2 - b1 * b1 / w) / (w - 1)
+                cov = (sb - s1 * b1 / w) / (w - 1)
+                beta = np.where(full & (var_b > 0), cov / var_b, np.nan)
+                mean_b = b1 / w + np.nanmean(rb)
+                alpha = (mean_r - beta * mean_b) * TRADING_DAYS_PER_YEAR
+            cols["rolling_beta"] = beta
+            cols["rolling_alpha"] = alpha
+
+        frame = pd.DataFrame({
+            "date": np.repeat(np.asarray(dates), k),
+            "run": pd.Categorical.from_codes(np.tile(np.arange(k), n), categories=list(nav.columns)),
+            "window": w,
+        })
+        for name, arr in cols.items():
+            frame[name] = arr.reshape(-1)
+        frames.append(frame.iloc[(w - 1) * k:])
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def save_rolling_metrics(rolling: pd.DataFrame, save_path) -> None:
+    """Write the long rolling table to parquet (columnar, for plotting)."""
+    save_path = Path(save_path)
+    save_path.parent.mkdir(parents=True, exist_ok=True)
+    rolling.to_parquet(save_path, index=False)
+    print(f"Rolling metrics saved to: {save_path}")
@@ -0,0 +1,252 @@
+"""
+Run registry: one SQLite file indexing every finished backtest.
+
+    runs     one row per run: name, strategy, created_at, period, final NAV,
+             result cache key and the run's config (JSON)
+    metrics  (run_id, metric, value) from compute_performance_metrics, indexed
+             by (metric, value) so "top runs by sharpe_ratio" is an index scan
+    navs     the equity history as two blobs: int32 YYYYMMDD dates and float64 NAVs
+             (12 bytes per day, decoded with np.frombuffer)
+
+Cross-run questions become single calls instead of parsing the per-run
+text / CSV files: list_runs() (runs x metrics, filtered and ordered in SQL)
+and nav_matrix() (aligned dates x runs NAV matrix, the input of
+compute_performance_metrics_batch / compute_rolling_metrics).
+"""
+import json
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from analysis.performance_matrix import compute_performance_metrics
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    name        TEXT NOT NULL,
+    strategy    TEXT,
+    created_at  TEXT NOT NULL,
+    start_date  TEXT,
+    end_date    TEXT,
+    n_days      INTEGER,
+    final_nav   REAL,
+    cache_key   TEXT,
+    config      TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_name ON runs(name, created_at);
+CREATE INDEX IF NOT EXISTS idx_runs_strategy ON runs(strategy, created_at);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id  INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    metric  TEXT NOT NULL,
+    value   REAL,
+    PRIMARY KEY (run_id, metric)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_metrics_metric ON metrics(metric, value);
+CREATE TABLE IF NOT EXISTS navs (
+    run_id  INTEGER PRIMARY KEY REFERENCES runs(run_id) ON DELETE CASCADE,
+    dates   BLOB NOT NULL,
+    nav     BLOB NOT NULL
+);
+"""
+RUN_COLUMNS = ["run_id", "name", "strategy", "created_at", "start_date", "end_date", "n_days", "final_nav", "cache_key"]
+
+
+def _encode_nav(equity_history: Dict[str, float]):
+    dates = sorted(equity_history)
+    return (np.asarray(dates, dtype=np.int32).tobytes(),
+            np.asarray([equity_history[d] for d in dates], dtype=np.float64).tobytes())
+
+
+def _decode_nav(dates_blob: bytes, nav_blob: bytes) -> pd.Series:
+    dates = np.frombuffer(dates_blob, dtype=np.int32).astype(str)
+    return pd.Series(np.frombuffer(nav_blob, dtype=np.float64), index=pd.Index(dates, name="date"))
+
+
+class RunRegistry:
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as con:
+            con.execute("PRAGMA journal_mode=WAL")  # readers (notebooks) do not block a registering run
+            con.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        con = sqlite3.connect(self.db_path)
+        con.execute("PRAGMA foreign_keys=ON")
+        return con
+
+    def register(
+        self,
+        result,
+        name: Optional[str] = None,
+        strategy: Optional[str] = None,
+        config: Optional[dict] = None,
+        benchmark: Optional[Dict[str, float]] = None,
+        risk_free_rate: float = 0.0,
+        metrics: Optional[Dict[str, object]] = None,
+        cache_key: Optional[str] = None,
+    ) -> int:
+        """
+        Store one run; returns its run_id.
+
+        result: BacktestResult / engine (equity_history attribute) or an equity_history dict (YYYYMMDD keys).
+        name: defaults to result.name. metrics: defaults to compute_performance_metrics(equity, benchmark).
+        config: JSON-serialisable settings of the run (paths input / execution / fees, ...).
+        """
+        equity = result if isinstance(result, dict) else result.equity_history
+        name = name or getattr(result, "name", None)
+        if not name:
+            raise ValueError("A run needs a name")
+        if metrics is None:
+            metrics = compute_performance_metrics(equity, benchmark=benchmark, risk_free_rate=risk_free_rate)
+        dates = sorted(equity)
+        numeric = [(k, None if v is None or np.isnan(v) else float(v))
+                   for k, v in metrics.items() if isinstance(v, (int, float, np.number))]
+        dates_blob, nav_blob = _encode_nav(equity)
+        with closing(self._connect()) as con, con:
+            cur = con.execute(
+                "INSERT INTO runs (name, strategy, created_at, start_date, end_date, n_days, final_nav, cache_key, config)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, strategy, datetime.now().isoformat(timespec="seconds"), dates[0] if dates else None,
+                 dates[-1] if dates else None, len(dates), float(equity[dates[-1]]) if dates else None, cache_key,
+                 json.dumps(config, ensure_ascii=False, default=str) if config is not None else None),
+            )
+            run_id = cur.lastrowid
+            con.executemany("INSERT INTO metrics (run_id, metric, value) VALUES (?, ?, ?)",
+                            [(run_id, k, v) for k, v in numeric])
+            con.execute("INSERT INTO navs (run_id, dates, nav) VALUES (?, ?, ?)", (run_id, dates_blob, nav_blob))
+        return run_id
+
+    def delete(self, run_ids: Iterable[int]) -> None:
+        with closing(self._connect()) as con, con:
+            con.executemany("DELETE FROM runs WHERE run_id = ?", [(int(r),) for r in run_ids])
+
+    def list_runs(
+        self,
+        name: Optional[str] = None,
+        strategy: Optional[str] = None,
+        since: Optional[str] = None,
+        order_by: str = "created_at",
+        ascending: bool = False,
+        limit: Optional[int] = None,
+        metrics: Optional[Iterable[str]] = None,
+        run_ids: Optional[Iterable[int]] = None,
+    ) -> pd.DataFrame:
+        """
+        Runs (rows, indexed by run_id) with their metrics as columns.
+
+        name: SQL LIKE pattern ('lgbm_%'); since: created_at lower bound (ISO date); run_ids: only these runs.
+        order_by: a runs column or a metric name (e.g. 'sharpe_ratio'); runs without it come last.
+        metrics: metric columns to include (default all).
+        """
+        where, args = [], []
+        if name is not None:
+            where.append("r.name LIKE ?")
+            args.append(name)
+        if strategy is not None:
+            where.append("r.strategy = ?")
+            args.append(strategy)
+        if since is not None:
+            where.append("r.created_at >= ?")
+            args.append(since)
+        if run_ids is not None:
+            run_ids = [int(r) for r in run_ids]
+            where.append(f"r.run_id IN ({','.join('?' * len(run_ids))})")
+            args.extend(run_ids)
+        direction = "ASC" if ascending else "DESC"
+        if order_by in RUN_COLUMNS:
+            join, order = "", f"r.{order_by} {direction}"
+        else:
+            join, order = "LEFT JOIN metrics o ON o.run_id = r.run_id AND o.metric = ?", f"o.value IS NULL, o.value {direction}"
+            args.insert(0, order_by)
+        sql = (f"SELECT {', '.join('r.' + c for c in RUN_COLUMNS)} FROM runs r {join}"
+               f"{' WHERE ' + ' AND '.join(where) if where else ''} ORDER BY {order}, r.run_id DESC")
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        with closing(self._connect()) as con:
+            runs = pd.read_sql_query(sql, con, params=args).set_index("run_id")
+            if runs.empty:
+                return runs
+            ids = ",".join(str(int(r)) for r in runs.index)
+            metric_filter = ""
+            if metrics is not None:
+                metrics = list(metrics)
+                metric_filter = f" AND metric IN ({','.join('?' * len(metrics))})"
+            long = pd.read_sql_query(f"SELECT run_id, metric, value FROM metrics WHERE run_id IN ({ids}){metric_filter}",
+                                     con, params=metrics or [])
+        wide = long.pivot(index="run_id", columns="metric", values="value")
+        if metrics is not None:
+            wide = wide.reindex(columns=metrics)
+        return runs.join(wide)
+
+    def config(self, run_id: int) -> Optional[dict]:
+        with closing(self._connect()) as con:
+            row = con.execute("SELECT config FROM runs WHERE run_id = ?", (int(run_id),)).fetchone()
+        if row is None:
+            raise KeyError(f"Unknown run_id {run_id}")
+        return json.loads(row[0]) if row[0] else None
+
+    def _resolve(self, con, runs) -> Dict[int, str]:
+        """run ids / names -> {run_id: column label}; a name means its latest run."""
+        out = {}
+        for r in runs:
+            if isinstance(r, (int, np.integer)):
+                row = con.execute("SELECT run_id, name FROM runs WHERE run_id = ?", (int(r),)).fetchone()
+            else:
+                row = con.execute("SELECT run_id, name FROM runs WHERE name = ? ORDER BY created_at DESC, run_id DESC"
+                                  " LIMIT 1", (r,)).fetchone()
+            if row is None:
+                raise KeyError(f"Unknown run {r!r}")
+            out[row[0]] = row[1]
+        return out
+
+    def nav(self, run: Union[int, str]) -> pd.Series:
+        """Equity history of one run (run_id, or name for its latest run) on a YYYYMMDD index."""
+        return self.nav_matrix([run]).iloc[:, 0].dropna()
+
+    def nav_matrix(
+        self,
+        runs: Iterable[Union[int, str]],
+        how: str = "inner",
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        normalize: bool = False,
+        label: str = "name",
+    ) -> pd.DataFrame:
+        """
+        Aligned NAV matrix (YYYYMMDD dates x runs) for run ids and/or names, in one query.
+
+        how: 'inner' keeps the dates all runs share, 'outer' the union (NaN where a run has no value).
+        start / end: inclusive YYYYMMDD bounds. normalize: divide each run by its first value.
+        label: column labels, 'name' (duplicate names get '#run_id') or 'run_id'.
+        """
+        if how not in ("inner", "outer"):
+            raise ValueError(f"how must be 'inner' or 'outer', got {how!r}")
+        with closing(self._connect()) as con:
+            labels = self._resolve(con, list(runs))
+            if not labels:
+                return pd.DataFrame()
+            rows = con.execute(f"SELECT run_id, dates, nav FROM navs WHERE run_id IN ({','.join('?' * len(labels))})",
+                               list(labels)).fetchall()
+        blobs = {run_id: (d, v) for run_id, d, v in rows}
+        series = {}
+        for run_id, name in labels.items():
+            s = _decode_nav(*blobs[run_id])
+            if label == "run_id":
+                key = run_id
+            else:
+                key = name if name not in series else f"{name}#{run_id}"
+            series[key] = s
+        df = pd.concat(series, axis=1, join=how).sort_index()
+        if start is not None:
+            df = df[df.index >= str(start)]
+        if end is not None:
+            df = df[df.index <= str(end)]
+        if normalize and len(df):
+            df = df / df.apply(lambda c: c.dropna().iloc[0] if c.notna().any() else np.nan)
+        return df
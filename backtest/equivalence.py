@@ -0,0 +1,260 @@
+"""
+Differential equivalence harness: a candidate engine path against the reference.
+
+The reference is the production path: 中证500指增_LGBM_BacktestEngine with the
+stock PositionManager reading parquet bars day by day. A candidate is any
+runner producing a BacktestResult from the same portfolio: the resident panel
+(backtest/session.py), the partitioned layout, or an engine / allocator
+subclass via engine_runner(engine_cls=..., position_manager_cls=...). Both run
+on the same inputs and every output the reports read is compared:
+
+    equity_history   same dates, NAV within atol + rtol * |reference|
+    diag             _diag counters / totals (numbers with tolerance, stuck lists exact)
+    daily            daily records, column by column
+    ledger           fills (date, symbol, side, price, volume, fees)
+    positions        final positions by symbol
+
+The report lists per section how many values were compared, how many differ
+beyond tolerance (with the first few), the largest absolute difference even
+when within tolerance, and the speedup of the candidate.
+
+    python -m backtest.equivalence --synthetic 300 --years 1      # generated market
+    python -m backtest.equivalence                                 # recorded: configured portfolio + market data
+    python -m backtest.equivalence --candidate partitioned
+"""
+import argparse
+import math
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backtest.engine import 中证500指增_LGBM_BacktestEngine
+from backtest.result import BacktestResult
+
+Runner = Callable[[pd.DataFrame], BacktestResult]
+MAX_EXAMPLES = 5
+
+
+@dataclass
+class SectionDiff:
+    compared: int = 0
+    mismatched: int = 0
+    max_abs_diff: float = 0.0
+    examples: List[str] = field(default_factory=list)
+
+    def add(self, where: str, ref, cand, atol: float, rtol: float) -> None:
+        """Compare one value pair: numbers with tolerance (NaN equals NaN), anything else exactly."""
+        self.compared += 1
+        if _is_number(ref) and _is_number(cand):
+            ref, cand = float(ref), float(cand)
+            if math.isnan(ref) or math.isnan(cand):
+                ok = math.isnan(ref) and math.isnan(cand)
+            else:
+                diff = abs(ref - cand)
+                self.max_abs_diff = max(self.max_abs_diff, diff)
+                ok = diff <= atol + rtol * abs(ref)
+        else:
+            ok = ref == cand
+        if not ok:
+            self.mismatch(f"{where}: reference {ref!r} != candidate {cand!r}")
+
+    def mismatch(self, message: str) -> None:
+        self.mismatched += 1
+        if len(self.examples) < MAX_EXAMPLES:
+            self.examples.append(message)
+
+
+@dataclass
+class EquivalenceReport:
+    sections: Dict[str, SectionDiff]
+    reference_s: float
+    candidate_s: float
+    atol: float
+    rtol: float
+
+    @property
+    def passed(self) -> bool:
+        return all(s.mismatched == 0 for s in self.sections.values())
+
+    @property
+    def speedup(self) -> float:
+        return self.reference_s / self.candidate_s if self.candidate_s > 0 else float("inf")
+
+    def summary(self) -> str:
+        lines = [f"{'EQUIVALENT' if self.passed else 'DIFFERENT'} (atol={self.atol:g}, rtol={self.rtol:g})"]
+        for name, s in self.sections.items():
+            lines.append(f"  {name:<15} {s.compared:>8} compared  {s.mismatched:>6} mismatched  "
+                         f"max |diff| {s.max_abs_diff:.3g}")
+            lines.extend(f"      {e}" for e in s.examples)
+        lines.append(f"  reference {self.reference_s:.3f} s, candidate {self.candidate_s:.3f} s, "
+                     f"speedup x{self.speedup:.2f}")
+        return "\n".join(lines)
+
+
+def _is_number(v) -> bool:
+    return isinstance(v, (int, float, np.integer, np.floating)) and not isinstance(v, (bool, np.bool_))
+
+
+def _compare_mappings(section: SectionDiff, ref: dict, cand: dict, atol: float, rtol: float, where: str = "") -> None:
+    for key in sorted(set(ref) | set(cand), key=str):
+        if key not in cand or key not in ref:
+            section.mismatch(f"{where}{key}: only in {'reference' if key in ref else 'candidate'}")
+            continue
+        r, c = ref[key], cand[key]
+        if isinstance(r, (list, tuple)) and isinstance(c, (list, tuple)):
+            r, c = [tuple(x) if isinstance(x, list) else x for x in r], [tuple(x) if isinstance(x, list) else x for x in c]
+        section.add(f"{where}{key}", r, c, atol, rtol)
+
+
+def _compare_frames(section: SectionDiff, ref: pd.DataFrame, cand: pd.DataFrame, atol: float, rtol: float) -> None:
+    if len(ref) != len(cand):
+        section.mismatch(f"row count: reference {len(ref)} != candidate {len(cand)}")
+    for col in [c for c in ref.columns if c not in cand.columns]:
+        section.mismatch(f"column {col!r} only in reference")
+    n = min(len(ref), len(cand))
+    for col in [c for c in ref.columns if c in cand.columns]:
+        r, c = ref[col].to_numpy()[:n], cand[col].to_numpy()[:n]
+        if np.issubdtype(r.dtype, np.number) and np.issubdtype(c.dtype, np.number) and r.dtype != bool:
+            r, c = r.astype(float), c.astype(float)
+            both_nan = np.isnan(r) & np.isnan(c)
+            diff = np.where(both_nan, 0.0, np.abs(r - c))
+            bad = ~both_nan & ~(diff <= atol + rtol * np.abs(r))
+            section.compared += n
+            finite = diff[np.isfinite(diff)]
+            if len(finite):
+                section.max_abs_diff = max(section.max_abs_diff, float(finite.max()))
+            for i in np.flatnonzero(bad):
+                section.mismatch(f"row {i} {col}: reference {r[i]!r} != candidate {c[i]!r}")
+        else:
+            for i in range(n):
+                section.add(f"row {i} {col}", r[i], c[i], atol, rtol)
+
+
+def _frame(records) -> pd.DataFrame:
+    if records is None:
+        return pd.DataFrame()
+    return records.to_frame() if hasattr(records, "to_frame") else pd.DataFrame(list(records))
+
+
+def compare_results(reference: BacktestResult, candidate: BacktestResult, atol: float = 1e-6, rtol: float = 1e-12,
+                    reference_s: float = 0.0, candidate_s: float = 0.0) -> EquivalenceReport:
+    """Section-by-section comparison of two results (see module docstring)."""
+    sections = {name: SectionDiff() for name in ("equity_history", "diag", "daily", "ledger", "positions")}
+    _compare_mappings(sections["equity_history"], reference.equity_history, candidate.equity_history, atol, rtol)
+    _compare_mappings(sections["diag"], reference._diag, candidate._diag, atol, rtol)
+    _compare_frames(sections["daily"], _frame(reference._daily_records), _frame(candidate._daily_records), atol, rtol)
+    _compare_frames(sections["ledger"], _frame(reference.ledger), _frame(candidate.ledger), atol, rtol)
+
+    positions = sections["positions"]
+    ref_pos = {p["symbol"]: p for p in reference.account.positions}
+    cand_pos = {p["symbol"]: p for p in candidate.account.positions}
+    for symbol in sorted(set(ref_pos) | set(cand_pos)):
+        if symbol not in ref_pos or symbol not in cand_pos:
+            positions.mismatch(f"{symbol}: only in {'reference' if symbol in ref_pos else 'candidate'}")
+        else:
+            _compare_mappings(positions, ref_pos[symbol], cand_pos[symbol], atol, rtol, where=f"{symbol}.")
+    for name in ("cash", "market_value", "NAV"):
+        positions.add(f"account.{name}", getattr(reference.account, name), getattr(candidate.account, name),
+                      atol, rtol)
+    return EquivalenceReport(sections, reference_s, candidate_s, atol, rtol)
+
+
+def engine_runner(market_path: str, buy_fee_schedule, sell_fee_schedule, liability_fee_schedule,
+                  initial_cash: float = 10000000, engine_cls=中证500指增_LGBM_BacktestEngine,
+                  position_manager_cls=None, name: str = "run", **engine_kwargs) -> Runner:
+    """
+    Runner building engine_cls on the portfolio; position_manager_cls (same constructor as
+    PositionManager) replaces the engine's allocator. The defaults are the reference path.
+    """
+    def run(portfolio: pd.DataFrame) -> BacktestResult:
+        engine = engine_cls(df_expanded=portfolio, market_path=market_path, initial_cash=initial_cash,
+                            buy_fee_schedule=buy_fee_schedule, sell_fee_schedule=sell_fee_schedule,
+                            liability_fee_schedule=liability_fee_schedule, **engine_kwargs)
+        if position_manager_cls is not None:
+            engine.position_manager = position_manager_cls(buy_fee_schedule, sell_fee_schedule)
+        engine.run()
+        return BacktestResult.from_engine(engine, name)
+    return run
+
+
+def session_runner(session, initial_cash: float = 10000000, warm: bool = True, **engine_kwargs) -> Runner:
+    """Runner on a BacktestSession's resident panel; warm loads the panel before the timed run."""
+    def run(portfolio: pd.DataFrame) -> BacktestResult:
+        return session.run(portfolio, name="run", initial_cash=initial_cash, **engine_kwargs)
+    run.warm_up = (lambda portfolio: session.run(portfolio, initial_cash=initial_cash)) if warm else None
+    return run
+
+
+def _timed(runner: Runner, portfolio: pd.DataFrame, repeat: int) -> Tuple[BacktestResult, float]:
+    warm_up = getattr(runner, "warm_up", None)
+    if warm_up is not None:
+        warm_up(portfolio)
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = perf_counter()
+        result = runner(portfolio)
+        best = min(best, perf_counter() - t0)
+    return result, best
+
+
+def check_equivalence(portfolio: pd.DataFrame, reference: Runner, candidate: Runner, atol: float = 1e-6,
+                      rtol: float = 1e-12, repeat: int = 1) -> EquivalenceReport:
+    """Run reference and candidate on the portfolio (best of repeat timings each) and compare their results."""
+    ref, ref_s = _timed(reference, portfolio, repeat)
+    cand, cand_s = _timed(candidate, portfolio, repeat)
+    return compare_results(ref, cand, atol=atol, rtol=rtol, reference_s=ref_s, candidate_s=cand_s)
+
+
+def main(argv=None):
+    from backtest.session import BacktestSession
+
+    parser = argparse.ArgumentParser(description="Compare an optimised engine path with the reference engine")
+    parser.add_argument("--synthetic", type=int, metavar="N_STOCKS", help="use a generated market of N stocks")
+    parser.add_argument("--years", type=float, default=1.0, help="history of the generated market")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--portfolio", help="recorded portfolio file (default: the configured daily_*_停牌.xlsx)")
+    parser.add_argument("--candidate", choices=("panel", "partitioned"), default="panel")
+    parser.add_argument("--atol", type=float, default=1e-6)
+    parser.add_argument("--rtol", type=float, default=1e-12)
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        import tempfile
+        from utils.synthetic.market_generator import TRADING_DAYS_PER_YEAR, SyntheticMarketSpec, generate_market
+
+        tmp = tempfile.TemporaryDirectory()
+        spec = SyntheticMarketSpec(n_stocks=args.synthetic, n_days=int(round(args.years * TRADING_DAYS_PER_YEAR)),
+                                   seed=args.seed, portfolio_size=max(10, args.synthetic // 10))
+        market = generate_market(tmp.name, spec, partitioned_dir=Path(tmp.name) / "partitioned"
+                                 if args.candidate == "partitioned" else None)
+        session = BacktestSession(market.paths_config(), root=market.root)
+        portfolio = market.portfolio()
+        partitioned_dir = str(Path(tmp.name) / "partitioned")
+    else:
+        session = BacktestSession()
+        portfolio = session.load_portfolio(args.portfolio)
+        partitioned_dir = str(session.root / session.paths["level1"]["daily"]["stock"]["partitioned_dir"])
+    if session.market_layout != "per_stock":
+        parser.error("the reference reads the per_stock layout: set level1.daily.stock.layout to per_stock")
+
+    fees = (session.buy_fee_schedule, session.sell_fee_schedule, session.liability_fee_schedule)
+    prices = dict(buy_price_model=session.buy_price_model, sell_price_model=session.sell_price_model)
+    reference = engine_runner(session.market_path, *fees, **prices)
+    if args.candidate == "panel":
+        candidate = session_runner(session)
+    else:
+        candidate = engine_runner(partitioned_dir, *fees, market_layout="partitioned", **prices)
+
+    report = check_equivalence(portfolio, reference, candidate, atol=args.atol, rtol=args.rtol, repeat=args.repeat)
+    print(report.summary())
+    sys.exit(0 if report.passed else 1)
+
+
+if __name__ == "__main__":
+    main()
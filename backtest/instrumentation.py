@@ -0,0 +1,120 @@
+"""
+Backtest instrumentation: wall time per phase per day and run counters.
+
+The engine wraps each phase of a day in `with instr.phase(name):` and adds
+counters with instr.count(name, n). Instrumentation records the phase times
+of every day (also written to the per-day record as t_{phase} columns) and
+accumulates counters (files / bytes / rows read by the market data loader,
+dataset cache hits, allocation rounds, ...). summary() gives one row per
+phase for analysis/diagnostic.py.
+
+NullInstrumentation is the default: the same interface with no-op methods
+and a shared no-op context, so a disabled run only pays for the calls.
+"""
+from time import perf_counter
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Engine phases, in the order they run within a day
+PHASES = ("market_data", "exclusions", "allocation", "sell_decisions", "mark_to_market", "liabilities")
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class NullInstrumentation:
+    """Disabled instrumentation: every call is a no-op."""
+    enabled = False
+    counters = None
+
+    def start_day(self, date_str: str) -> None:
+        pass
+
+    def phase(self, name: str):
+        return _NULL_PHASE
+
+    def count(self, name: str, n: int = 1) -> None:
+        pass
+
+    def end_day(self) -> Dict[str, float]:
+        return {}
+
+
+class _Phase:
+    __slots__ = ("owner", "name", "t0")
+
+    def __init__(self, owner, name):
+        self.owner = owner
+        self.name = name
+        self.t0 = 0.0
+
+    def __enter__(self):
+        self.t0 = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.owner._today[self.name] += perf_counter() - self.t0
+        return False
+
+
+class Instrumentation:
+    enabled = True
+
+    def __init__(self, phases=PHASES):
+        self.phases = tuple(phases)
+        self._timers = {p: _Phase(self, p) for p in self.phases}
+        self._today = dict.fromkeys(self.phases, 0.0)
+        self.dates: List[str] = []
+        self.timings: Dict[str, List[float]] = {p: [] for p in self.phases}  # seconds per day
+        self.counters: Dict[str, int] = {}
+
+    @staticmethod
+    def record_fields(phases=PHASES) -> Dict[str, str]:
+        """Extra per-day record fields (DailyRecorder) holding the phase times."""
+        return {f"t_{p}": "float64" for p in phases}
+
+    def start_day(self, date_str: str) -> None:
+        self.dates.append(date_str)
+        for p in self.phases:
+            self._today[p] = 0.0
+
+    def phase(self, name: str) -> _Phase:
+        return self._timers[name]
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def end_day(self) -> Dict[str, float]:
+        """Close the day; returns {t_phase: seconds} for the per-day record."""
+        for p in self.phases:
+            self.timings[p].append(self._today[p])
+        return {f"t_{p}": self._today[p] for p in self.phases}
+
+    def summary(self) -> pd.DataFrame:
+        """One row per phase: total seconds, share of instrumented time, per-day mean / p95 / max (ms)."""
+        rows = []
+        for p in self.phases:
+            t = np.asarray(self.timings[p], dtype=np.float64)
+            rows.append({
+                "phase": p,
+                "total_s": t.sum(),
+                "mean_ms": t.mean() * 1e3 if len(t) else np.nan,
+                "p95_ms": np.percentile(t, 95) * 1e3 if len(t) else np.nan,
+                "max_ms": t.max() * 1e3 if len(t) else np.nan,
+            })
+        df = pd.DataFrame(rows)
+        total = df["total_s"].sum()
+        df.insert(2, "share_pct", df["total_s"] / total * 100 if total > 0 else np.nan)
+        return df
@@ -0,0 +1,130 @@
+"""
+Fill ledger: one row per buy / sell fill (and per stuck position on sell days,
+per 0-lot pool stock on buy days).
+
+Rows go into preallocated typed columns (the DailyRecorder buffer), with
+symbols stored as int32 ids into TradeLedger.symbols. Fees are split into
+components (utils/中证500指增_LGBM/fees.py breakdown functions):
+    fee_base      commission + csrc + handling (min_fee applied)
+    fee_transfer  SH transfer fee
+    fee_stamp     stamp tax (sells)
+Sells carry cost_price (the position's buy price) so per-stock P&L, turnover
+and cost analysis can be computed from the saved parquet without rerunning
+the engine. Stuck rows (side 'stuck') record the held volume, the close and
+the stuck cause; unfilled rows (side 'unfilled') record the offered price of a
+buy-pool stock that was allocated 0 lots, so the day's full pool (and its
+equal-weight budget) can be rebuilt. Neither has a cash effect.
+"""
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from backtest.recorder import DailyRecorder
+from utils.中证500指增_LGBM.fees import (
+    calc_buy_fee_breakdown,
+    calc_sell_fee_breakdown,
+    exchange_from_symbol,
+)
+
+SIDES = ("buy", "sell", "stuck", "unfilled")
+STUCK_CAUSES = ("", "LIMIT_DOWN", "SUSPENSION")
+
+LEDGER_FIELDS: Dict[str, str] = {
+    "date": "U8",
+    "symbol_id": "int32",
+    "side": "int8",          # index into SIDES
+    "price": "float64",
+    "volume": "int64",
+    "notional": "float64",
+    "fee_base": "float64",
+    "fee_transfer": "float64",
+    "fee_stamp": "float64",
+    "fee_total": "float64",
+    "cost_price": "float64",  # sells / stuck: position buy price; NaN for buys
+    "stuck_cause": "int8",    # index into STUCK_CAUSES
+}
+
+
+class TradeLedger:
+    def __init__(self, capacity: int = 1024):
+        self._buf = DailyRecorder(capacity, fields=LEDGER_FIELDS)
+        self.symbols: List[str] = []
+        self._symbol_ids: Dict[str, int] = {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "TradeLedger":
+        """Rebuild a ledger from to_frame() output (the saved parquet, an Arrow table from backtest/service.py)."""
+        ledger = cls()
+        codes, symbols = pd.factorize(df["symbol"].astype(str))  # ids in first-fill order, as when recorded
+        ledger.symbols = [str(s) for s in symbols]
+        ledger._symbol_ids = {s: i for i, s in enumerate(ledger.symbols)}
+        frame = df.drop(columns="symbol").assign(
+            symbol_id=codes,
+            side=pd.Categorical(df["side"].astype(str), categories=SIDES).codes,
+            stuck_cause=pd.Categorical(df["stuck_cause"].astype(str), categories=STUCK_CAUSES).codes,
+        )
+        ledger._buf = DailyRecorder.from_frame(frame, fields=LEDGER_FIELDS)
+        return ledger
+
+    def __len__(self) -> int:
+        return len(self._buf)
+
+    def symbol_id(self, symbol: str) -> int:
+        sid = self._symbol_ids.get(symbol)
+        if sid is None:
+            sid = self._symbol_ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return sid
+
+    def record_buy(self, date_str: str, symbol: str, price: float, volume: int, schedule) -> None:
+        notional = float(price) * int(volume)
+        base, transfer = calc_buy_fee_breakdown(notional, exchange_from_symbol(symbol), schedule)
+        self._buf.append({
+            "date": date_str, "symbol_id": self.symbol_id(symbol), "side": 0,
+            "price": price, "volume": volume, "notional": notional,
+            "fee_base": base, "fee_transfer": transfer, "fee_stamp": 0.0, "fee_total": base + transfer,
+        })
+
+    def record_sell(self, date_str: str, symbol: str, price: float, volume: int, cost_price: float, schedule) -> None:
+        notional = float(price) * int(volume)
+        base, transfer, stamp = calc_sell_fee_breakdown(notional, exchange_from_symbol(symbol), schedule)
+        self._buf.append({
+            "date": date_str, "symbol_id": self.symbol_id(symbol), "side": 1,
+            "price": price, "volume": volume, "notional": notional,
+            "fee_base": base, "fee_transfer": transfer, "fee_stamp": stamp, "fee_total": base + transfer + stamp,
+            "cost_price": cost_price,
+        })
+
+    def record_stuck(self, date_str: str, symbol: str, price: float, volume: int, cost_price: float, cause: str) -> None:
+        self._buf.append({
+            "date": date_str, "symbol_id": self.symbol_id(symbol), "side": 2,
+            "price": price, "volume": volume, "notional": float(price) * int(volume),
+            "fee_base": 0.0, "fee_transfer": 0.0, "fee_stamp": 0.0, "fee_total": 0.0,
+            "cost_price": cost_price, "stuck_cause": STUCK_CAUSES.index(cause),
+        })
+
+    def record_unfilled(self, date_str: str, symbol: str, price: float) -> None:
+        self._buf.append({
+            "date": date_str, "symbol_id": self.symbol_id(symbol), "side": 3,
+            "price": price, "volume": 0, "notional": 0.0,
+            "fee_base": 0.0, "fee_transfer": 0.0, "fee_stamp": 0.0, "fee_total": 0.0,
+        })
+
+    def column(self, name: str) -> np.ndarray:
+        return self._buf.column(name)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Ledger with symbol, side and stuck_cause decoded to categoricals."""
+        df = self._buf.to_frame()
+        df.insert(1, "symbol", pd.Categorical.from_codes(df.pop("symbol_id"), categories=self.symbols or [""]))
+        df["side"] = pd.Categorical.from_codes(df["side"], categories=list(SIDES))
+        df["stuck_cause"] = pd.Categorical.from_codes(df["stuck_cause"], categories=list(STUCK_CAUSES))
+        return df
+
+    def to_parquet(self, path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.to_frame().to_parquet(path, index=False)
+        print(f"Trade ledger saved to: {path}")
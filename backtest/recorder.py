@@ -0,0 +1,131 @@
+"""
+Columnar per-day recorder for the backtest engine.
+
+DailyRecorder keeps one preallocated NumPy column per field, sized to the
+number of trading days, instead of one dict per day. Optional extra fields
+(e.g. per-day exclusion counts, phase timings) are added with their dtype at
+construction. to_frame() gives the same per-day DataFrame as the old list of
+dicts; to_parquet() is the default persistence and to_csv() an export.
+
+Iterating / indexing still yields one dict per day, so code that treated
+_daily_records as a list keeps working.
+"""
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+# Engine per-day fields, in column order
+DAILY_FIELDS: Dict[str, str] = {
+    "date": "U8",
+    "day_type": "U4",
+    "cash_start": "float64",
+    "buy_cost": "float64",
+    "sell_proceeds": "float64",
+    "liabilities_today": "float64",
+    "accumulated_liabilities": "float64",
+    "liabilities_paid": "float64",
+    "cash_end": "float64",
+    "market_value": "float64",
+    "nav": "float64",
+    "positions": "int32",
+}
+
+# Optional extra fields the engine can fill (record_exclusions=True)
+EXCLUSION_FIELDS: Dict[str, str] = {
+    "excluded_suspended": "int32",
+    "excluded_upper_limit": "int32",
+    "stuck_limit_down": "int32",
+    "stuck_suspension": "int32",
+}
+
+
+def _missing(dtype: np.dtype):
+    if dtype.kind == "f":
+        return np.nan
+    if dtype.kind == "U":
+        return ""
+    return 0
+
+
+class DailyRecorder:
+    def __init__(self, n_days: int, extra_fields: Optional[Dict[str, str]] = None,
+                 fields: Optional[Dict[str, str]] = None):
+        """
+        n_days: expected number of rows (capacity grows if exceeded).
+        extra_fields: {name: dtype} appended after the standard fields.
+        """
+        schema = dict(fields or DAILY_FIELDS)
+        for name, dtype in (extra_fields or {}).items():
+            if name in schema:
+                raise ValueError(f"Extra field {name} duplicates a standard field")
+            schema[name] = dtype
+        self.dtypes = {name: np.dtype(dt) for name, dt in schema.items()}
+        self.extra_fields = list((extra_fields or {}).keys())
+        self._capacity = max(int(n_days), 1)
+        self._cols = {name: np.full(self._capacity, _missing(dt), dtype=dt) for name, dt in self.dtypes.items()}
+        self._n = 0
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, fields: Optional[Dict[str, str]] = None) -> "DailyRecorder":
+        """Rebuild from to_frame() output; columns beyond fields (default DAILY_FIELDS) become extra fields."""
+        base = fields or DAILY_FIELDS
+        extra = {c: df[c].dtype.str if df[c].dtype.kind in "biuf" else "U" for c in df.columns if c not in base}
+        rec = cls(len(df), extra_fields=extra, fields=base)
+        for name, col in rec._cols.items():
+            if name in df.columns:
+                col[:len(df)] = df[name].to_numpy()
+        rec._n = len(df)
+        return rec
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _grow(self) -> None:
+        new_capacity = self._capacity * 2
+        for name, col in self._cols.items():
+            grown = np.full(new_capacity, _missing(col.dtype), dtype=col.dtype)
+            grown[:self._capacity] = col
+            self._cols[name] = grown
+        self._capacity = new_capacity
+
+    def append(self, values: Dict[str, object]) -> None:
+        """Add one day. Fields not given keep their missing value (NaN / 0 / '')."""
+        if self._n == self._capacity:
+            self._grow()
+        i = self._n
+        cols = self._cols
+        for name, value in values.items():
+            if name not in cols:
+                raise KeyError(f"Unknown daily record field: {name}")
+            cols[name][i] = value
+        self._n += 1
+
+    def column(self, name: str) -> np.ndarray:
+        """View of one column over the recorded days."""
+        return self._cols[name][:self._n]
+
+    def __getitem__(self, i: int) -> Dict[str, object]:
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        return {name: col[i].item() for name, col in self._cols.items()}
+
+    def __iter__(self) -> Iterator[Dict[str, object]]:
+        for i in range(self._n):
+            yield self[i]
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({name: self.column(name) for name in self._cols})
+
+    def to_parquet(self, path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.to_frame().to_parquet(path, index=False)
+
+    def to_csv(self, path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.to_frame().to_csv(path, index=False, encoding="utf-8-sig")
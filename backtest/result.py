@@ -0,0 +1,51 @@
+"""
+Picklable snapshot of a finished backtest.
+
+BacktestResult carries what the report functions read from an engine
+(equity_history, _diag, _daily_records, account.cash / market_value / positions)
+without the engine's data paths, price models or minute stores, so it can be
+sent to worker processes (analysis/report_batch.py) or stored. It can be passed
+anywhere an engine is accepted by print_backtest_diagnostic.
+"""
+import copy
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+
+@dataclass
+class AccountSnapshot:
+    cash: float
+    market_value: float
+    NAV: float
+    positions: List[dict] = field(default_factory=list)
+
+
+@dataclass
+class BacktestResult:
+    name: str
+    equity_history: Dict[str, float]
+    _diag: dict
+    _daily_records: object  # backtest.recorder.DailyRecorder (or a list of per-day dicts)
+    account: AccountSnapshot
+    instrumentation: Optional[object] = None  # backtest.instrumentation.Instrumentation if enabled
+    ledger: Optional[object] = None  # backtest.ledger.TradeLedger
+
+    @staticmethod
+    def from_engine(engine, name: str) -> "BacktestResult":
+        """Copy the reportable state of an engine after run()."""
+        acc = engine.account
+        instr = getattr(engine, "instrumentation", None)
+        return BacktestResult(
+            name=name,
+            equity_history=dict(engine.equity_history),
+            _diag=copy.deepcopy(engine._diag),
+            _daily_records=copy.deepcopy(engine._daily_records),
+            account=AccountSnapshot(
+                cash=acc.cash,
+                market_value=acc.market_value,
+                NAV=acc.NAV,
+                positions=copy.deepcopy(acc.positions),
+            ),
+            instrumentation=instr if getattr(instr, "enabled", False) else None,
+            ledger=copy.deepcopy(getattr(engine, "ledger", None)),
+        )
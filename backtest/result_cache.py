@@ -0,0 +1,137 @@
+"""
+Content-addressed cache of finished backtests (BacktestResult, backtest/result.py).
+
+The key hashes everything a run's result depends on:
+    portfolio     the expanded daily portfolio DataFrame (pandas row hashes)
+    market        market_data_version() of the daily bar files (size / mtime manifest)
+    fees          buy / sell / liability fee schedules
+    initial_cash
+    code          source of the engine packages (backtest/, trading/, account/, utils/...)
+    params        anything else passed to the engine (execution prices, minute store / feature
+                  versions when fills use minute data, layout, ...)
+Report code (analysis/) is not part of the key, so changing a plot or a
+summary reuses the stored run.
+
+Entries are pickled to {cache_dir}/{key}.pkl. A hit touches the file's mtime
+and eviction removes the least recently used entries until the directory fits
+max_bytes.
+"""
+import dataclasses
+import hashlib
+import json
+import os
+import pickle
+from functools import lru_cache
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Optional, Tuple
+
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+# Sources whose changes can change a backtest's result
+ENGINE_SOURCES = ("backtest", "trading", "account", "utils/中证500指增_LGBM", "utils/minute")
+
+
+@lru_cache(maxsize=None)
+def code_version(root: Path = PROJECT_ROOT, sources: Tuple[str, ...] = ENGINE_SOURCES) -> str:
+    """Hash of the engine source files (*.py under sources), computed once per process."""
+    h = hashlib.blake2b(digest_size=16)
+    for src in sources:
+        for path in sorted((Path(root) / src).rglob("*.py")):
+            h.update(path.relative_to(root).as_posix().encode("utf-8"))
+            h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def portfolio_hash(df: pd.DataFrame) -> str:
+    """Hash of a DataFrame's columns, dtypes and values (row order included)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([[str(c), str(t)] for c, t in df.dtypes.items()], ensure_ascii=False).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def result_key(portfolio: pd.DataFrame, market_version: str, buy_fee_schedule, sell_fee_schedule,
+               liability_fee_schedule, initial_cash: float, code: Optional[str] = None, **params) -> str:
+    """Cache key of one engine run; params must be JSON-serialisable (str() is used otherwise)."""
+    parts = {
+        "portfolio": portfolio_hash(portfolio),
+        "market": market_version,
+        "fees": [dataclasses.asdict(s) for s in (buy_fee_schedule, sell_fee_schedule, liability_fee_schedule)],
+        "initial_cash": float(initial_cash),
+        "code": code if code is not None else code_version(),
+        "params": params,
+    }
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=20).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, cache_dir, max_bytes: int = 2 * 1024 ** 3):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pkl"
+
+    def get(self, key: str):
+        """Stored BacktestResult or None; a hit marks the entry as recently used."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        os.utime(path)
+        self.hits += 1
+        return result
+
+    def put(self, key: str, result) -> Path:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self.evict(keep=key)
+        return path
+
+    def size_bytes(self) -> int:
+        return sum(p.stat().st_size for p in self.cache_dir.glob("*.pkl")) if self.cache_dir.exists() else 0
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Delete least recently used entries until the cache fits max_bytes; returns the number removed."""
+        if not self.cache_dir.exists():
+            return 0
+        entries = sorted(((p.stat().st_mtime_ns, p.stat().st_size, p) for p in self.cache_dir.glob("*.pkl")),
+                         key=lambda e: e[0])
+        total = sum(e[1] for e in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path.stem == keep:
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def run(self, key: str, run_fn: Callable[[], object]):
+        """
+        Cached result for key, or run_fn() (-> BacktestResult) stored under key.
+        Prints whether the engine ran; returns (result, hit).
+        """
+        t0 = perf_counter()
+        result = self.get(key)
+        if result is not None:
+            print(f"✅ Result cache hit {key[:12]}: loaded in {(perf_counter() - t0) * 1e3:.1f} ms, engine not run")
+            return result, True
+        result = run_fn()
+        self.put(key, result)
+        print(f"Result cache miss {key[:12]}: engine ran in {perf_counter() - t0:.2f} s, result stored in {self.cache_dir}")
+        return result, False
@@ -0,0 +1,333 @@
+"""
+Local backtest service: one process keeps the market data hot for everyone on the box.
+
+The server owns a BacktestSession (backtest/session.py): paths.yaml, fee
+schedules, price models, the index calendar and the resident MarketPanel are
+loaded once and shared by all requests. Submitted portfolios go into a queue
+served by worker threads; threads (not processes) so every worker reads the
+same panel instead of holding its own copy. Results are kept in memory and
+returned as Arrow IPC streams. It listens on localhost only and needs no
+network access.
+
+The engine is pure Python, so under the GIL simulations run one at a time
+whatever the worker count: a queue of N runs takes about N times one run.
+More workers only overlap what releases the GIL (a run's panel load or
+extension, parquet / Arrow I/O) with another run's simulation; the default is
+one worker. Simulating in parallel takes several service processes (each with
+its own panel, on its own port).
+
+    python -m backtest.service --port 8765 --workers 1
+
+HTTP API (JSON unless noted; Arrow = application/vnd.apache.arrow.stream):
+    GET  /health                      panel shape, queue length, workers
+    POST /runs?name=&initial_cash=    body: portfolio (df_expanded) as Arrow, empty = configured portfolio
+                                      -> 202 {"job_id", "status"}
+    GET  /runs/{id}?wait=SECONDS      status (queued | running | done | failed), diag, account, error
+    GET  /runs/{id}/{table}           Arrow: equity (date, nav) | daily | ledger | positions
+
+BacktestClient wraps the API with the standard library only:
+
+    client = BacktestClient("http://127.0.0.1:8765")
+    result = client.run(df, name="alt", initial_cash=5e6)   # BacktestResult
+"""
+import argparse
+import itertools
+import json
+import queue
+import threading
+import traceback
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from backtest.ledger import TradeLedger
+from backtest.recorder import DailyRecorder
+from backtest.result import AccountSnapshot, BacktestResult
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+TABLES = ("equity", "daily", "ledger", "positions")
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+def to_arrow(df: pd.DataFrame) -> bytes:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def from_arrow(data: bytes) -> pd.DataFrame:
+    return pa.ipc.open_stream(data).read_all().to_pandas()
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def result_table(result: BacktestResult, table: str) -> pd.DataFrame:
+    """One of TABLES of a finished run as a DataFrame."""
+    if table == "equity":
+        dates = sorted(result.equity_history)
+        return pd.DataFrame({"date": dates, "nav": [float(result.equity_history[d]) for d in dates]})
+    if table == "daily":
+        records = result._daily_records
+        return records.to_frame() if hasattr(records, "to_frame") else pd.DataFrame(list(records))
+    if table == "ledger":
+        return result.ledger.to_frame() if result.ledger is not None else pd.DataFrame()
+    if table == "positions":
+        return pd.DataFrame(result.account.positions)
+    raise ValueError(f"Unknown table {table!r}, expected one of {TABLES}")
+
+
+class Job:
+    def __init__(self, job_id: int, portfolio: Optional[pd.DataFrame], name: str, initial_cash: float):
+        self.id = job_id
+        self.portfolio = portfolio
+        self.name = name
+        self.initial_cash = initial_cash
+        self.status = QUEUED
+        self.error = None
+        self.result = None
+        self.seconds = None
+        self.done = threading.Event()
+
+    def to_dict(self) -> dict:
+        out = {"job_id": self.id, "name": self.name, "status": self.status, "error": self.error,
+               "seconds": self.seconds}
+        if self.result is not None:
+            acc = self.result.account
+            out["diag"] = self.result._diag
+            out["account"] = {"cash": acc.cash, "market_value": acc.market_value, "NAV": acc.NAV}
+        return out
+
+
+class BacktestService:
+    def __init__(self, session, workers: int = 1, max_jobs: int = 256):
+        """session: a BacktestSession; max_jobs: finished jobs kept in memory (oldest dropped first)."""
+        self.session = session
+        self.workers = int(workers)
+        self.max_jobs = int(max_jobs)
+        self.queue: "queue.Queue[Optional[Job]]" = queue.Queue()
+        self.jobs: "OrderedDict[int, Job]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self) -> "BacktestService":
+        for i in range(self.workers):
+            t = threading.Thread(target=self._work, name=f"backtest-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self) -> None:
+        for _ in self._threads:
+            self.queue.put(None)
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def submit(self, portfolio: Optional[pd.DataFrame] = None, name: str = "service",
+               initial_cash: float = 10000000) -> Job:
+        with self._lock:
+            job = Job(next(self._ids), portfolio, name, initial_cash)
+            self.jobs[job.id] = job
+            finished = [j for j in self.jobs.values() if j.done.is_set()]
+            for old in finished[:max(0, len(self.jobs) - self.max_jobs)]:
+                del self.jobs[old.id]
+        self.queue.put(job)
+        return job
+
+    def job(self, job_id: int) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _work(self) -> None:
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            job.status = RUNNING
+            t0 = perf_counter()
+            try:
+                job.result = self.session.run(job.portfolio, name=job.name, initial_cash=job.initial_cash)
+                job.status = DONE
+            except Exception as e:
+                job.error = f"{type(e).__name__}: {e}"
+                job.status = FAILED
+                traceback.print_exc()
+            job.portfolio = None
+            job.seconds = perf_counter() - t0
+            job.done.set()
+
+    def health(self) -> dict:
+        panel = self.session.panel
+        return {
+            "workers": self.workers,
+            "queued": self.queue.qsize(),
+            "jobs": len(self.jobs),
+            "panel": None if panel is None else {"symbols": len(panel.symbols), "dates": len(panel.dates)},
+            "calendar": len(self.session.calendar),
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "BacktestService/1.0"
+
+    @property
+    def service(self) -> BacktestService:
+        return self.server.service
+
+    def log_message(self, format, *args):  # requests are not logged; job failures print their traceback
+        pass
+
+    def _send(self, code: int, body: bytes, content_type: str) -> None:
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, code: int, obj) -> None:
+        self._send(code, json.dumps(obj, ensure_ascii=False, default=_json_default).encode("utf-8"),
+                   "application/json; charset=utf-8")
+
+    def _route(self):
+        url = urllib.parse.urlsplit(self.path)
+        return [p for p in url.path.split("/") if p], dict(urllib.parse.parse_qsl(url.query))
+
+    def do_GET(self):
+        parts, query = self._route()
+        if parts == ["health"]:
+            return self._json(200, self.service.health())
+        if len(parts) in (2, 3) and parts[0] == "runs" and parts[1].isdigit():
+            job = self.service.job(int(parts[1]))
+            if job is None:
+                return self._json(404, {"error": f"Unknown job {parts[1]}"})
+            if len(parts) == 2:
+                if "wait" in query:
+                    job.done.wait(float(query["wait"]))
+                return self._json(200, job.to_dict())
+            if job.status != DONE:
+                return self._json(409, {"error": f"Job {job.id} is {job.status}"})
+            if parts[2] not in TABLES:
+                return self._json(404, {"error": f"Unknown table {parts[2]!r}, expected one of {TABLES}"})
+            return self._send(200, to_arrow(result_table(job.result, parts[2])), ARROW_STREAM)
+        return self._json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        parts, query = self._route()
+        if parts != ["runs"]:
+            return self._json(404, {"error": f"Unknown path {self.path}"})
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        try:
+            portfolio = from_arrow(body) if body else None
+            initial_cash = float(query.get("initial_cash", 10000000))
+        except (pa.ArrowInvalid, ValueError) as e:
+            return self._json(400, {"error": f"Bad request: {e}"})
+        job = self.service.submit(portfolio, name=query.get("name", "service"), initial_cash=initial_cash)
+        return self._json(202, {"job_id": job.id, "status": job.status})
+
+
+def serve(service: BacktestService, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    """HTTP server bound to host:port (port 0 picks a free one) for a started service; call serve_forever()."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+class BacktestClient:
+    def __init__(self, url: str = "http://127.0.0.1:8765", timeout: float = 600):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self._opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))  # never route via a proxy
+
+    def _request(self, path: str, data: Optional[bytes] = None, content_type: Optional[str] = None):
+        req = urllib.request.Request(self.url + path, data=data, method="POST" if data is not None else "GET")
+        if content_type:
+            req.add_header("Content-Type", content_type)
+        try:
+            with self._opener.open(req, timeout=self.timeout) as resp:
+                return resp.read(), resp.headers.get_content_type()
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"{e.code} {json.loads(e.read()).get('error')}") from None
+
+    def _get_json(self, path: str) -> dict:
+        return json.loads(self._request(path)[0])
+
+    def health(self) -> dict:
+        return self._get_json("/health")
+
+    def submit(self, portfolio: Optional[pd.DataFrame] = None, name: str = "service",
+               initial_cash: float = 10000000) -> int:
+        query = urllib.parse.urlencode({"name": name, "initial_cash": initial_cash})
+        body = to_arrow(portfolio) if portfolio is not None else b""
+        return json.loads(self._request(f"/runs?{query}", body, ARROW_STREAM)[0])["job_id"]
+
+    def status(self, job_id: int, wait: Optional[float] = None) -> dict:
+        return self._get_json(f"/runs/{job_id}" + (f"?wait={wait}" if wait is not None else ""))
+
+    def table(self, job_id: int, table: str) -> pd.DataFrame:
+        return from_arrow(self._request(f"/runs/{job_id}/{table}")[0])
+
+    def result(self, job_id: int, poll: float = 5.0) -> BacktestResult:
+        """Wait for a job and fetch it as a BacktestResult (daily records, ledger and positions included)."""
+        status = self.status(job_id, wait=poll)
+        while status["status"] in (QUEUED, RUNNING):
+            status = self.status(job_id, wait=poll)
+        if status["status"] == FAILED:
+            raise RuntimeError(f"Job {job_id} failed: {status['error']}")
+        equity = self.table(job_id, "equity")
+        positions = self.table(job_id, "positions")
+        return BacktestResult(
+            name=status["name"],
+            equity_history=dict(zip(equity["date"], equity["nav"])),
+            _diag=status["diag"],
+            _daily_records=DailyRecorder.from_frame(self.table(job_id, "daily")),
+            account=AccountSnapshot(positions=positions.to_dict("records"), **status["account"]),
+            ledger=TradeLedger.from_frame(self.table(job_id, "ledger")),
+        )
+
+    def run(self, portfolio: Optional[pd.DataFrame] = None, name: str = "service",
+            initial_cash: float = 10000000) -> BacktestResult:
+        return self.result(self.submit(portfolio, name=name, initial_cash=initial_cash))
+
+
+def main(argv=None):
+    from backtest.session import BacktestSession
+    from utils.config import load_paths
+
+    cfg = load_paths().get("service", {}) or {}
+    parser = argparse.ArgumentParser(description="Local backtest service")
+    parser.add_argument("--host", default=cfg.get("host", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=cfg.get("port", 8765))
+    parser.add_argument("--workers", type=int, default=cfg.get("workers", 1),
+                        help="worker threads; runs are serial under the GIL, more workers only overlap data loading")
+    args = parser.parse_args(argv)
+
+    service = BacktestService(BacktestSession(), workers=args.workers, max_jobs=cfg.get("max_jobs", 256)).start()
+    server = serve(service, args.host, args.port)
+    print(f"✅ Backtest service on http://{args.host}:{server.server_address[1]} ({args.workers} workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
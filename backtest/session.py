@@ -0,0 +1,192 @@
+"""
+Warm backtest session for notebooks and sweeps: load once, run many times.
+
+BacktestSession keeps everything main.py reads per run resident in memory:
+config/paths.yaml, fee schedules, execution price models (and their minute /
+feature stores), the trading calendar and close series of the benchmark index,
+portfolio files (by path and mtime) and a MarketPanel of daily bars. The panel
+is loaded for the symbols and calendar range a run needs and grows when a later
+portfolio brings new stocks (only those are read) or a wider date range. Each
+run() checks market_data_version of the panel's files (one stat per file) and
+reloads the panel when bars were rewritten on disk (QMT_st_fill.py, a
+re-collection). The engine reads bars from the panel (market_data_provider) instead of parquet
+files, so a repeated experiment costs the simulation only.
+
+    session = BacktestSession()
+    base = session.run()                                  # the configured portfolio
+    alt = session.run(df2, name="alt", initial_cash=5e6)  # another DataFrame, same resident data
+"""
+import threading
+from datetime import date
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, Optional
+
+import pandas as pd
+
+from account.liability import LiabilityFeeSchedule
+from backtest.engine import 中证500指增_LGBM_BacktestEngine
+from backtest.result import BacktestResult
+from trading.中证500指增_LGBM.execution_price import make_execution_price_model
+from utils.config import PROJECT_ROOT, load_json, load_paths
+from utils.中证500指增_LGBM.fees import BuyFeeSchedule, SellFeeSchedule
+from utils.中证500指增_LGBM.中证500指增_LGBM_data_loader import load_market_panel, market_data_version
+
+STRATEGY = "中证500指增_LGBM"
+BENCHMARK_CODE = "000905.SH"
+
+
+class BacktestSession:
+    def __init__(self, paths: Optional[dict] = None, strategy: str = STRATEGY, root=PROJECT_ROOT):
+        """paths: parsed paths.yaml (default: config/paths.yaml); relative paths resolve against root."""
+        self.root = Path(root)
+        self.paths = paths if paths is not None else load_paths()
+        self.strategy = strategy
+        stock = self.paths["level1"]["daily"]["stock"]
+        self.market_layout = stock.get("layout", "per_stock")
+        self.market_path = str(self._abs(stock["partitioned_dir"] if self.market_layout == "partitioned"
+                                         else stock["base_dir"]))
+        # as main.py: all fields for per_stock, the configured projection for partitioned
+        columns = stock.get("columns") if self.market_layout == "partitioned" else None
+        self.market_columns = list(columns) if columns else None
+        self.index_path = self._abs(self.paths["level1"]["daily"]["index"]["base_dir"])
+
+        cfg = self.paths["config"]
+        fees = load_json(self._abs(cfg["stock_trade_fees"]))
+        self.buy_fee_schedule = BuyFeeSchedule.from_config(fees)
+        self.sell_fee_schedule = SellFeeSchedule.from_config(fees)
+        self.liability_fee_schedule = LiabilityFeeSchedule.from_config(load_json(self._abs(cfg["liability_fee"])))
+        self.buy_price_model, self.sell_price_model = self._price_models()
+
+        self._index_close = self._load_index()
+        self.calendar = list(self._index_close.index)  # trading days ('YYYYMMDD') of the benchmark index
+        self.panel = None
+        self._panel_version = None  # market_data_version of the panel's files when it was loaded
+        self._portfolios: Dict[Path, tuple] = {}
+        self._lock = threading.Lock()  # run() may be called from worker threads (backtest/service.py)
+
+    def _abs(self, path) -> Path:
+        path = Path(path)
+        return path if path.is_absolute() else self.root / path
+
+    def _price_models(self):
+        from utils.minute.minute_store import MinuteStore
+
+        execution = self.paths.get("execution", {}).get(self.strategy, {})
+        kinds = (execution.get("buy_price", "open"), execution.get("sell_price", "close"))
+        minute_store, features_dir = None, None
+        if set(kinds) - {"open", "close"}:
+            if execution.get("source", "features") == "features":
+                features_dir = str(self._abs(self.paths["level1"]["daily"]["features"]["base_dir"]))
+            minute_store = MinuteStore(str(self._abs(self.paths["level1"]["minute"]["stock"]["ipc_dir"])))
+        first_n = execution.get("first_n_minutes", 30)
+        return tuple(make_execution_price_model(k, minute_store, first_n, features_dir) for k in kinds)
+
+    def _load_index(self) -> pd.Series:
+        path = self.index_path / f"{BENCHMARK_CODE}.parquet"
+        if not path.exists():
+            return pd.Series(dtype=float)
+        df = pd.read_parquet(path, columns=["close"])
+        close = pd.Series(df["close"].to_numpy(dtype=float), index=pd.to_datetime(df.index).strftime("%Y%m%d"))
+        return close[~close.index.duplicated(keep="last")].sort_index()
+
+    def benchmark(self, dates) -> Dict[str, float]:
+        """Benchmark closes for dates ('YYYYMMDD'), last available close on or before each date (get_benchmark_series)."""
+        dates = sorted(dates)
+        close = self._index_close
+        if close.empty:
+            return {}
+        aligned = close.reindex(close.index.union(dates)).ffill().reindex(dates).dropna()
+        return aligned.to_dict()
+
+    def benchmark_close(self, date_str: str) -> Optional[float]:
+        """Benchmark close on date_str ('YYYYMMDD') or the last one before it; None before the index starts."""
+        close = self._index_close
+        i = close.index.searchsorted(date_str, side="right")
+        return float(close.iloc[i - 1]) if i else None
+
+    def load_portfolio(self, path=None) -> pd.DataFrame:
+        """Portfolio Excel (default: the configured daily_{name}_停牌.xlsx), cached by path and mtime."""
+        if path is None:
+            p = self.paths["input"][self.strategy]
+            path = Path(p["base_dir"]) / str(p["year"]) / f"daily_{p['name']}_停牌.xlsx"
+        path = self._abs(path)
+        mtime = path.stat().st_mtime_ns
+        hit = self._portfolios.get(path)
+        if hit is None or hit[0] != mtime:
+            hit = self._portfolios[path] = (mtime, pd.read_excel(path))
+        return hit[1]
+
+    def _ensure_panel(self, symbols, dates) -> None:
+        """Make the resident panel cover symbols x dates: read only new stocks, reload on new dates or changed files."""
+        symbols = list(dict.fromkeys(symbols))
+        stale = self.panel is not None and market_data_version(
+            self.market_path, self.market_layout, self.panel.symbols) != self._panel_version
+        if stale:
+            print("⚠️ Market data changed on disk: reloading the market panel")
+        elif self.panel is not None and set(dates) <= self.panel.date_index.keys():
+            missing = [s for s in symbols if s not in self.panel.symbol_index]
+            if missing:
+                t0 = perf_counter()
+                version = market_data_version(self.market_path, self.market_layout, self.panel.symbols + missing)
+                self.panel.extend(load_market_panel(missing, self.panel.dates, self.market_path,
+                                                    layout=self.market_layout, columns=self.market_columns))
+                self._panel_version = version
+                print(f"Market panel: +{len(missing)} stocks in {perf_counter() - t0:.2f} s")
+            return
+        if self.panel is not None:
+            dates = set(dates) | set(self.panel.dates)
+            symbols = list(dict.fromkeys(self.panel.symbols + symbols))
+        lo, hi = min(dates), max(dates)
+        span = sorted(set(dates) | {d for d in self.calendar if lo <= d <= hi})  # the whole calendar range
+        t0 = perf_counter()
+        version = market_data_version(self.market_path, self.market_layout, symbols)  # before reading: never newer
+        self.panel = load_market_panel(symbols, span, self.market_path, layout=self.market_layout,
+                                       columns=self.market_columns)
+        self._panel_version = version
+        print(f"✅ Market panel: {len(symbols)} stocks x {len(span)} days loaded in {perf_counter() - t0:.2f} s")
+
+    def run(
+        self,
+        portfolio=None,
+        name: str = "session",
+        initial_cash: float = 10000000,
+        buy_fee_schedule: Optional[BuyFeeSchedule] = None,
+        sell_fee_schedule: Optional[SellFeeSchedule] = None,
+        liability_fee_schedule: Optional[LiabilityFeeSchedule] = None,
+        **engine_kwargs,
+    ) -> BacktestResult:
+        """
+        Run one backtest on the resident data; returns its BacktestResult.
+
+        portfolio: df_expanded DataFrame, a portfolio Excel path, or None for the configured one.
+        Fee schedules default to the session's; engine_kwargs go to the engine
+        (buy_price_model / sell_price_model override the configured models, record_exclusions, instrumentation,
+        online_metrics, ...). online_metrics gets the benchmark close with each NAV (benchmark_close).
+        """
+        with self._lock:
+            if portfolio is None or isinstance(portfolio, (str, Path)):
+                portfolio = self.load_portfolio(portfolio)
+            days = pd.to_datetime(portfolio["daily_date"])
+            days = days[days.dt.date <= date.today()]  # the engine only runs until today
+            self._ensure_panel(portfolio["Name"].dropna().astype(str), set(days.dt.strftime("%Y%m%d")))
+            # extend() only appends stocks and a reload builds a new panel, so runs in flight stay valid
+            panel = self.panel
+
+        engine_kwargs.setdefault("buy_price_model", self.buy_price_model)
+        engine_kwargs.setdefault("sell_price_model", self.sell_price_model)
+        engine_kwargs.setdefault("benchmark_close", self.benchmark_close)
+        engine = 中证500指增_LGBM_BacktestEngine(
+            df_expanded=portfolio,
+            market_path=self.market_path,
+            initial_cash=initial_cash,
+            buy_fee_schedule=buy_fee_schedule or self.buy_fee_schedule,
+            sell_fee_schedule=sell_fee_schedule or self.sell_fee_schedule,
+            liability_fee_schedule=liability_fee_schedule or self.liability_fee_schedule,
+            market_layout=self.market_layout,
+            market_columns=self.market_columns,
+            market_data_provider=panel.market_data,
+            **engine_kwargs,
+        )
+        engine.run()
+        return BacktestResult.from_engine(engine, name)
@@ -0,0 +1,296 @@
+"""
+Benchmark suite for the loader, allocation, engine and analytics hot paths.
+
+Each scenario times one hot path on a synthetic market (utils/synthetic/market_generator.py)
+for every (universe size, history length) in the grid; the portfolio holds
+portfolio_frac of the universe, so per-day engine cost shows how the hot
+paths scale with the number of stocks traded.
+
+    get_market_data            one day's bars for the day's portfolio (per_stock parquet files)
+    get_benchmark_series       the index close for every day of the history
+    calculate_full_allocation  one buy day's allocation of the full budget over the portfolio
+    calculate_total_liabilities  one sell day's fee accrual + capital gains tax over the positions
+    engine_run                 a full 中证500指增_LGBM_BacktestEngine.run (parquet reads per day)
+    engine_run_panel           the same run on a resident MarketPanel (backtest/session.py)
+    compute_performance_metrics  metrics of the run's equity history
+
+Results are written to {results_dir}/{commit}.json (commit of HEAD, "-dirty" when
+the tree has changes) with the machine description, and --compare prints the
+ratio to the stored results of another commit:
+
+    python -m benchmarks.bench                                 # default grid
+    python -m benchmarks.bench --stocks 500 2000 --years 1 5 --only engine_run_panel
+    python -m benchmarks.bench --compare HEAD~1                # after a change, against the parent commit
+
+Markets are generated once per (size, history, seed) under --data-dir and reused.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Dict, List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import pandas as pd
+
+from account.liability import LiabilityFeeSchedule, LiabilityManager
+from analysis.performance_matrix import compute_performance_metrics
+from backtest.engine import 中证500指增_LGBM_BacktestEngine
+from backtest.session import BacktestSession
+from trading.中证500指增_LGBM.position_manager import PositionManager
+from utils.config import load_json
+from utils.synthetic.market_generator import (
+    GENERATOR_VERSION,
+    INDEX_CODE,
+    TRADING_DAYS_PER_YEAR,
+    SyntheticMarket,
+    SyntheticMarketSpec,
+    generate_market,
+)
+from utils.中证500指增_LGBM.fees import BuyFeeSchedule, SellFeeSchedule
+from utils.中证500指增_LGBM.中证500指增_LGBM_data_loader import get_benchmark_series, get_market_data
+
+RESULTS_DIR = PROJECT_ROOT / "benchmarks" / "results"
+DATA_DIR = PROJECT_ROOT / "data" / "cache" / "benchmarks"
+INITIAL_CASH = 10000000
+
+
+class Context:
+    """One synthetic market and what the scenarios share: fee schedules, portfolio, a buy / sell day."""
+
+    def __init__(self, market: SyntheticMarket, n_stocks: int):
+        fees = load_json(PROJECT_ROOT / "config" / "stock_trade_fees.json")
+        self.market = market
+        self.n_stocks = n_stocks
+        self.n_days = len(market.dates)
+        self.buy_fee_schedule = BuyFeeSchedule.from_config(fees)
+        self.sell_fee_schedule = SellFeeSchedule.from_config(fees)
+        self.liability_fee_schedule = LiabilityFeeSchedule.from_config(
+            load_json(PROJECT_ROOT / "config" / "liability_fee.json"))
+        self.portfolio = market.portfolio()
+        days = self.portfolio[self.portfolio["first_trading_day"] == 1]["daily_date"]
+        self.buy_day = days.iloc[len(days) // 2]
+        self.stocks = self.portfolio.loc[self.portfolio["daily_date"] == self.buy_day, "Name"].tolist()
+        self.buy_date_str = self.buy_day.strftime("%Y%m%d")
+        self.market_data = get_market_data(self.stocks, self.buy_date_str, str(market.stock_dir))
+        self._equity = None
+
+    def engine(self, **kwargs):
+        return 中证500指增_LGBM_BacktestEngine(
+            df_expanded=self.portfolio, market_path=str(self.market.stock_dir), initial_cash=INITIAL_CASH,
+            buy_fee_schedule=self.buy_fee_schedule, sell_fee_schedule=self.sell_fee_schedule,
+            liability_fee_schedule=self.liability_fee_schedule, **kwargs)
+
+    def equity_history(self) -> Dict[str, float]:
+        if self._equity is None:
+            engine = self.engine()
+            engine.run()
+            self._equity = dict(engine.equity_history)
+        return self._equity
+
+
+def _bench_market_data(ctx: Context) -> Callable[[], object]:
+    return lambda: get_market_data(ctx.stocks, ctx.buy_date_str, str(ctx.market.stock_dir))
+
+
+def _bench_benchmark_series(ctx: Context) -> Callable[[], object]:
+    dates = list(ctx.market.dates.strftime("%Y%m%d"))
+    return lambda: get_benchmark_series(dates, INDEX_CODE, str(ctx.market.index_dir))
+
+
+def _bench_allocation(ctx: Context) -> Callable[[], object]:
+    pm = PositionManager(ctx.buy_fee_schedule, ctx.sell_fee_schedule)
+    stocks = [s for s in ctx.stocks if s in ctx.market_data]
+    return lambda: pm.calculate_full_allocation(stocks, INITIAL_CASH, ctx.market_data)
+
+
+def _bench_liabilities(ctx: Context) -> Callable[[], object]:
+    stocks = [s for s in ctx.stocks if s in ctx.market_data]
+    positions = PositionManager(ctx.buy_fee_schedule, ctx.sell_fee_schedule).calculate_full_allocation(
+        stocks, INITIAL_CASH, ctx.market_data)
+    sell_prices = {s: m["close"] * 1.01 for s, m in ctx.market_data.items()}
+    lm = LiabilityManager(ctx.liability_fee_schedule)
+    return lambda: lm.calculate_total_liabilities(INITIAL_CASH, positions, 1, sell_prices)
+
+
+def _bench_engine(ctx: Context) -> Callable[[], object]:
+    def run():
+        engine = ctx.engine()
+        engine.run()
+        return engine
+    return run
+
+
+def _bench_engine_panel(ctx: Context) -> Callable[[], object]:
+    session = BacktestSession(ctx.market.paths_config(), root=ctx.market.root)
+    session.run(ctx.portfolio)  # load the panel outside the timing
+    return lambda: session.run(ctx.portfolio)
+
+
+def _bench_metrics(ctx: Context) -> Callable[[], object]:
+    equity = ctx.equity_history()
+    return lambda: compute_performance_metrics(equity)
+
+
+# name -> (setup(ctx) -> timed callable, per_day: report time / trading day)
+SCENARIOS = {
+    "get_market_data": (_bench_market_data, False),
+    "get_benchmark_series": (_bench_benchmark_series, False),
+    "calculate_full_allocation": (_bench_allocation, False),
+    "calculate_total_liabilities": (_bench_liabilities, False),
+    "engine_run": (_bench_engine, True),
+    "engine_run_panel": (_bench_engine_panel, True),
+    "compute_performance_metrics": (_bench_metrics, False),
+}
+
+
+def time_call(fn: Callable[[], object], repeat: int = 5, min_time: float = 0.2) -> Dict[str, float]:
+    """Best / median seconds per call over repeat rounds; each round loops fn until it takes min_time."""
+    t0 = perf_counter()
+    fn()  # warm-up, also sizes the loop
+    once = perf_counter() - t0
+    number = max(1, int(min_time / once)) if once > 0 else 1000
+    rounds = []
+    for _ in range(repeat):
+        t0 = perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((perf_counter() - t0) / number)
+    return {"best_s": min(rounds), "median_s": statistics.median(rounds), "number": number, "repeat": repeat}
+
+
+def get_market(n_stocks: int, n_days: int, seed: int, portfolio_frac: float, data_dir: Path) -> SyntheticMarket:
+    """Generated market for the grid point, reused from data_dir when its spec and generator version match."""
+    spec = SyntheticMarketSpec(n_stocks=n_stocks, n_days=n_days, seed=seed,
+                               portfolio_size=max(10, int(n_stocks * portfolio_frac)))
+    root = Path(data_dir) / f"{n_stocks}x{n_days}_seed{seed}_p{spec.portfolio_size}"
+    marker, stamp = root / "spec.json", {**asdict(spec), "generator": GENERATOR_VERSION}
+    if marker.exists() and json.loads(marker.read_text(encoding="utf-8")) == stamp:
+        return SyntheticMarket(root, root / "stock", root / "index", root / "stock_list.parquet",
+                               root / "portfolio.parquet", pd.DatetimeIndex(sorted(
+                                   pd.to_datetime(pd.read_parquet(root / "index" / f"{INDEX_CODE}.parquet").index))))
+    market = generate_market(root, spec, verbose=False)
+    marker.write_text(json.dumps(stamp), encoding="utf-8")
+    return market
+
+
+def git_commit(root: Path = PROJECT_ROOT, ref: str = "HEAD") -> str:
+    """Short commit id of ref (with '-dirty' for HEAD when the tree has changes), 'unknown' outside git."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short=12", ref], cwd=root, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        if ref == "HEAD":
+            dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                                   capture_output=True, text=True, check=True).stdout.strip()
+            commit += "-dirty" if dirty else ""
+        return commit
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_suite(stocks: List[int], years: List[float], scenarios: Optional[List[str]] = None, seed: int = 0,
+              portfolio_frac: float = 0.1, repeat: int = 5, min_time: float = 0.2, data_dir=DATA_DIR) -> List[dict]:
+    """Time each scenario at every (stocks, years) grid point; returns one result row per (scenario, grid point)."""
+    names = scenarios or list(SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        raise ValueError(f"Unknown scenarios {sorted(unknown)}, expected some of {list(SCENARIOS)}")
+    rows = []
+    for n_stocks in stocks:
+        for y in years:
+            n_days = int(round(y * TRADING_DAYS_PER_YEAR))
+            ctx = Context(get_market(n_stocks, n_days, seed, portfolio_frac, Path(data_dir)), n_stocks)
+            for name in names:
+                setup, per_day = SCENARIOS[name]
+                timing = time_call(setup(ctx), repeat=repeat, min_time=min_time)
+                row = {"scenario": name, "n_stocks": n_stocks, "n_days": ctx.n_days,
+                       "portfolio_size": len(ctx.stocks), **timing}
+                if per_day:
+                    row["per_day_ms"] = timing["best_s"] / ctx.n_days * 1e3
+                rows.append(row)
+                print(_format_row(row))
+    return rows
+
+
+def _format_row(row: dict, ratio: Optional[float] = None) -> str:
+    per_day = f"{row['per_day_ms']:9.3f} ms/day" if "per_day_ms" in row else " " * 16
+    out = (f"{row['scenario']:<28} {row['n_stocks']:>6} stocks {row['n_days']:>6} days  "
+           f"{row['best_s'] * 1e3:11.3f} ms  {per_day}")
+    if ratio is not None:
+        out += f"  x{ratio:.2f} vs base"
+    return out
+
+
+def save_results(rows: List[dict], results_dir=RESULTS_DIR, commit: Optional[str] = None) -> Path:
+    commit = commit or git_commit()
+    results_dir = Path(results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    path = results_dir / f"{commit}.json"
+    payload = {
+        "commit": commit,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "processor": platform.processor(), "cpu_count": os.cpu_count(), "pandas": pd.__version__},
+        "results": rows,
+    }
+    path.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def load_results(ref: str, results_dir=RESULTS_DIR) -> List[dict]:
+    """Stored result rows of a commit (git ref, short id or result file stem)."""
+    results_dir = Path(results_dir)
+    for stem in (ref, git_commit(ref=ref)):
+        path = results_dir / f"{stem}.json"
+        if path.exists():
+            return json.loads(path.read_text(encoding="utf-8"))["results"]
+    raise FileNotFoundError(f"No stored benchmark results for {ref!r} in {results_dir}")
+
+
+def compare(rows: List[dict], base: List[dict]) -> List[str]:
+    """Lines with each row's best time over the base row of the same (scenario, n_stocks, n_days); >1 is slower."""
+    key = lambda r: (r["scenario"], r["n_stocks"], r["n_days"])
+    base_by_key = {key(r): r for r in base}
+    lines = []
+    for row in rows:
+        b = base_by_key.get(key(row))
+        lines.append(_format_row(row, row["best_s"] / b["best_s"] if b else None))
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the backtest hot paths on synthetic markets")
+    parser.add_argument("--stocks", type=int, nargs="+", default=[100, 500], help="universe sizes")
+    parser.add_argument("--years", type=float, nargs="+", default=[1, 2], help="history lengths")
+    parser.add_argument("--only", nargs="+", choices=list(SCENARIOS), help="scenarios to run (default all)")
+    parser.add_argument("--portfolio-frac", type=float, default=0.1, help="portfolio size / universe size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing round")
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    parser.add_argument("--results-dir", default=str(RESULTS_DIR))
+    parser.add_argument("--compare", metavar="REF", help="commit whose stored results to compare against")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args(argv)
+
+    rows = run_suite(args.stocks, args.years, args.only, seed=args.seed, portfolio_frac=args.portfolio_frac,
+                     repeat=args.repeat, min_time=args.min_time, data_dir=args.data_dir)
+    if not args.no_save:
+        print(f"✅ Results saved to {save_results(rows, args.results_dir)}")
+    if args.compare:
+        print(f"\nCompared with {args.compare}:")
+        print("\n".join(compare(rows, load_results(args.compare, args.results_dir))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Build the hive-partitioned daily bar dataset from the per-stock parquet files.
+
+Input:  level1.daily.stock.base_dir/{code}.parquet (daily_data_collection.py)
+Output: level1.daily.stock.partitioned_dir/year=YYYY[/bucket=N]/*.parquet
+
+Set level1.daily.stock.layout to "partitioned" in config/paths.yaml to make
+main.py read this dataset (year partition pruning + ts_code/trade_date pushdown).
+"""
+import sys
+from pathlib import Path
+
+# Optional symbol bucket partition level (0 = year only)
+N_BUCKETS = 0
+
+
+def main():
+    project_root = Path(__file__).resolve().parents[2]
+    if str(project_root) not in sys.path:
+        sys.path.insert(0, str(project_root))
+    from utils.config import load_paths
+    from utils.中证500指增_LGBM.中证500指增_LGBM_data_loader import build_partitioned_daily
+
+    paths = load_paths()
+    stock = paths["level1"]["daily"]["stock"]
+    base_dir = project_root / stock["base_dir"]
+    out_dir = project_root / stock["partitioned_dir"]
+    if not base_dir.exists():
+        print(f"Path does not exist: {base_dir}")
+        return
+
+    build_partitioned_daily(str(base_dir), str(out_dir), n_buckets=N_BUCKETS)
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
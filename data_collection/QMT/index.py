@@ -1,32 +1,42 @@
-from xtquant import xtdata
 import pandas as pd
-import os
-
-# 保存到指数文件夹
-index_base_path = r'E:\妖魔鬼怪\backtest\data\level1\daily\index'
+import sys
+from pathlib import Path
 
 # 使用尽可能早的日期
 index_code = '000905.SH'
 
-# 沪深300是2005年4月8日发布的
-# 但可以尝试更早的日期，QMT会返回它能给的最早数据
-xtdata.download_history_data(
-    stock_code=index_code,
-    period='1d',
-    start_time='19900101',  # 尝试非常早的日期
-    end_time='20991231'     # 尝试非常晚的日期
-)
-
-res = xtdata.get_market_data_ex(
-    field_list=['open', 'high', 'low', 'close', 'volume', 'amount'],
-    stock_list=[index_code],
-    period='1d',
-    start_time='19900101',  # 同样范围
-    end_time='20991231',
-    count=-1
-)
-
-if index_code in res:
+
+def main():
+    project_root = Path(__file__).resolve().parents[2]
+    if str(project_root) not in sys.path:
+        sys.path.insert(0, str(project_root))
+    from utils.config import load_paths
+    from xtquant import xtdata  # QMT client library, only needed when the step runs
+
+    # 保存到指数文件夹
+    index_base_path = project_root / load_paths()["level1"]["daily"]["index"]["base_dir"]
+
+    # 沪深300是2005年4月8日发布的
+    # 但可以尝试更早的日期，QMT会返回它能给的最早数据
+    xtdata.download_history_data(
+        stock_code=index_code,
+        period='1d',
+        start_time='19900101',  # 尝试非常早的日期
+        end_time='20991231'     # 尝试非常晚的日期
+    )
+
+    res = xtdata.get_market_data_ex(
+        field_list=['open', 'high', 'low', 'close', 'volume', 'amount'],
+        stock_list=[index_code],
+        period='1d',
+        start_time='19900101',  # 同样范围
+        end_time='20991231',
+        count=-1
+    )
+
+    if index_code not in res:
+        print(f"⚠️ No data for {index_code}")
+        return
     df = res[index_code]
     print(f"实际获取到 {len(df)} 个交易日")
     print(f"最早日期: {df.index[0]}")
@@ -34,7 +44,11 @@ if index_code in res:
     # 这就是QMT能提供的"全部历史"
     print(df)
 
-# 保存指数数据（和股票一样的保存逻辑）
-save_path = os.path.join(index_base_path, f"{index_code}.parquet")
-df.to_parquet(save_path)
-print(f"✅ 指数 {index_code} 已保存到 {save_path}")
\ No newline at end of file
+    # 保存指数数据（和股票一样的保存逻辑）
+    save_path = index_base_path / f"{index_code}.parquet"
+    df.to_parquet(save_path)
+    print(f"✅ 指数 {index_code} 已保存到 {save_path}")
+
+
+if __name__ == "__main__":
+    main()
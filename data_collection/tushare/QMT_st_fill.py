@@ -4,23 +4,28 @@ Scan parquet files, find those with any 0, refetch from Tushare API and overwrit
 """
 
 import pandas as pd
+import sys
 from pathlib import Path
-import tushare as ts
 import time
 
-STOCK_PATH = r"E:\妖魔鬼怪\backtest\data\level1\daily\stock"
 token = ""
-pro = ts.pro_api(token)
 
 
 def main():
-    path = Path(STOCK_PATH)
+    project_root = Path(__file__).resolve().parents[2]
+    if str(project_root) not in sys.path:
+        sys.path.insert(0, str(project_root))
+    from utils.config import load_paths
+    import tushare as ts
+
+    path = project_root / load_paths()["level1"]["daily"]["stock"]["base_dir"]
     if not path.exists():
         print(f"Path does not exist: {path}")
         return
 
     parquet_files = list(path.glob("*.parquet"))
     print(f"Scanning {len(parquet_files)} parquet files...")
+    pro = ts.pro_api(token)
 
     for f in parquet_files:
         df = pd.read_parquet(f)
@@ -0,0 +1,288 @@
+"""
+Compact monthly minute parquet files into per-year (per-board) datasets.
+
+minut_data_collection.py writes one file per stock per month:
+    {base_dir}/{stock}/{year}/{stock}_{YYYYMM}.parquet
+so a year of 500 stocks is ~6,000 small files. This job merges them into
+    {compact_dir}/{year}/{board}.parquet
+with:
+  - one row group per trading day (or per month), rows sorted by (ts_code, trade_time)
+    inside the row group, and a `trade_date` column for predicate pushdown;
+    a single-day read across the universe touches one row group per board file
+  - ts_code dictionary-encoded
+  - open/high/low/close stored as float32 where that is lossless at the 0.01 tick;
+    a board file's column with any value off the tick grid (or not recoverable
+    from float32) is kept as float64 instead, and the fallback is logged
+
+Months are processed one at a time, so memory is bounded by one month of data.
+A year is skipped when its compacted files are newer than every input file.
+main() then rebuilds the memory-mapped Arrow IPC store
+(utils/minute/minute_store.py) for every year whose IPC files do not match
+the current compacted files (rewritten this run, or a new / wiped ipc_dir or
+a failed earlier build), and refreshes the daily execution feature table
+(utils/minute/daily_features.py).
+"""
+import sys
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+PRICE_COLUMNS = ["open", "high", "low", "close"]
+COLUMNS = ["ts_code", "trade_time"] + PRICE_COLUMNS + ["vol", "amount"]
+TICK_SIZE = 0.01
+
+
+def board_from_symbol(ts_code: str) -> str:
+    """Board of an A-share code: SH_MAIN, STAR, SZ_MAIN, GEM, BJ or OTHER."""
+    code, _, suffix = ts_code.partition(".")
+    suffix = suffix.upper()
+    if suffix == "SH":
+        return "STAR" if code.startswith("688") else "SH_MAIN"
+    if suffix == "SZ":
+        return "GEM" if code.startswith(("300", "301")) else "SZ_MAIN"
+    if suffix == "BJ":
+        return "BJ"
+    return "OTHER"
+
+
+def _compact_schema(float32_prices: bool, float64_columns=()) -> pa.Schema:
+    def price_type(c):
+        return pa.float32() if float32_prices and c not in float64_columns else pa.float64()
+
+    return pa.schema(
+        [
+            ("ts_code", pa.dictionary(pa.int32(), pa.string())),
+            ("trade_date", pa.date32()),
+            ("trade_time", pa.timestamp("s")),
+        ]
+        + [(c, price_type(c)) for c in PRICE_COLUMNS]
+        + [("vol", pa.float64()), ("amount", pa.float64())]
+    )
+
+
+def _read_month_file(path: Path) -> pa.Table:
+    """Read one raw monthly file and normalize types (trade_time may be a string)."""
+    tbl = pq.read_table(path, columns=COLUMNS)
+    trade_time = tbl.column("trade_time")
+    if pa.types.is_string(trade_time.type) or pa.types.is_large_string(trade_time.type):
+        trade_time = pc.strptime(trade_time, format="%Y-%m-%d %H:%M:%S", unit="s")
+    else:
+        trade_time = trade_time.cast(pa.timestamp("s"))
+    arrays = [tbl.column("ts_code").cast(pa.string()), trade_time]
+    arrays += [tbl.column(c).cast(pa.float64()) for c in PRICE_COLUMNS + ["vol", "amount"]]
+    return pa.table(arrays, names=COLUMNS)
+
+
+def _lossy_float32_columns(tbl: pa.Table) -> dict:
+    """{price column: number of values float32 storage would change at tick precision} (lossless columns omitted)."""
+    lossy = {}
+    for c in PRICE_COLUMNS:
+        p64 = tbl.column(c).to_numpy(zero_copy_only=False)
+        p32 = p64.astype(np.float32).astype(np.float64)
+        ticks = np.round(p64 / TICK_SIZE)
+        on_grid = np.abs(p64 - ticks * TICK_SIZE) < 1e-6
+        same = np.round(p32 / TICK_SIZE) == ticks
+        ok = (on_grid & same) | np.isnan(p64)
+        if not ok.all():
+            lossy[c] = int((~ok).sum())
+    return lossy
+
+
+def _rewrite_tmp(tmp_path: Path, schema: pa.Schema, compression: str) -> pq.ParquetWriter:
+    """Copy an open board file's row groups (writer already closed) under a widened schema; returns the new writer."""
+    old_path = tmp_path.with_suffix(".old")
+    tmp_path.replace(old_path)
+    writer = pq.ParquetWriter(tmp_path, schema, compression=compression, use_dictionary=["ts_code", "trade_date"])
+    pf = pq.ParquetFile(old_path)
+    for i in range(pf.num_row_groups):
+        rg = pf.read_row_group(i).cast(schema)
+        writer.write_table(rg, row_group_size=max(rg.num_rows, 1))
+    pf.close()
+    old_path.unlink()
+    return writer
+
+
+def _to_compact(tbl: pa.Table, schema: pa.Schema) -> pa.Table:
+    """Add trade_date, sort by (trade_date, ts_code, trade_time) and cast to the compact schema."""
+    trade_date = tbl.column("trade_time").cast(pa.date32())
+    tbl = tbl.append_column("trade_date", trade_date)
+    tbl = tbl.sort_by([("trade_date", "ascending"), ("ts_code", "ascending"), ("trade_time", "ascending")])
+    tbl = tbl.set_column(0, "ts_code", pc.dictionary_encode(tbl.column("ts_code")))
+    return tbl.select(schema.names).cast(schema)
+
+
+def _row_group_slices(tbl: pa.Table, row_group_by: str):
+    """Yield table slices, one per trading day (or the whole month)."""
+    if row_group_by == "month":
+        yield tbl
+        return
+    if row_group_by != "day":
+        raise ValueError(f"row_group_by must be 'day' or 'month', got {row_group_by}")
+    days = tbl.column("trade_date").cast(pa.int32()).to_numpy()
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(days)) + 1, [len(days)]))
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        yield tbl.slice(int(start), int(end - start))
+
+
+def _year_inputs(base_dir: Path, year: int) -> dict:
+    """{month 'YYYYMM': [file paths]} for every stock with data in year."""
+    months = {}
+    for stock_dir in sorted(p for p in base_dir.iterdir() if p.is_dir()):
+        year_dir = stock_dir / str(year)
+        if not year_dir.is_dir():
+            continue
+        for f in sorted(year_dir.glob(f"{stock_dir.name}_*.parquet")):
+            month = f.stem.rsplit("_", 1)[-1]
+            months.setdefault(month, []).append(f)
+    return months
+
+
+def compact_minute_year(
+    base_dir,
+    compact_dir,
+    year: int,
+    by_board: bool = True,
+    row_group_by: str = "day",
+    float32_prices: bool = True,
+    compression: str = "zstd",
+) -> dict:
+    """
+    Merge all monthly files of one year into {compact_dir}/{year}/{board}.parquet
+    (or {compact_dir}/{year}/ALL.parquet when by_board=False).
+    Returns {board: rows written}.
+    """
+    base_dir = Path(base_dir)
+    out_dir = Path(compact_dir) / str(year)
+    months = _year_inputs(base_dir, year)
+    if not months:
+        return {}
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    writers = {}
+    wide = {}  # board -> price columns kept as float64
+    rows = {}
+    try:
+        for month in sorted(months):
+            tbl = pa.concat_tables([_read_month_file(f) for f in months[month]])
+
+            codes = tbl.column("ts_code")
+            if by_board:
+                boards = {}
+                for code in pc.unique(codes).to_pylist():
+                    boards.setdefault(board_from_symbol(code), []).append(code)
+                parts = {b: tbl.filter(pc.is_in(codes, value_set=pa.array(c))) for b, c in boards.items()}
+            else:
+                parts = {"ALL": tbl}
+
+            for board, part in parts.items():
+                tmp_path = out_dir / f"{board}.parquet.tmp"
+                cols = wide.setdefault(board, set())
+                lossy = {c: n for c, n in _lossy_float32_columns(part).items() if c not in cols} if float32_prices else {}
+                if lossy:
+                    for c, n in lossy.items():
+                        print(f"  ⚠️ {year}/{board}.parquet: {c} has {n} values not lossless in float32 "
+                              f"at tick {TICK_SIZE} ({year}-{month[4:]}), stored as float64")
+                    cols.update(lossy)
+                    if board in writers:  # earlier months already written as float32: widen them
+                        writers[board].close()
+                        writers[board] = _rewrite_tmp(tmp_path, _compact_schema(True, cols), compression)
+                schema = _compact_schema(float32_prices, cols)
+                part = _to_compact(part, schema)
+                if board not in writers:
+                    writers[board] = pq.ParquetWriter(
+                        tmp_path, schema, compression=compression, use_dictionary=["ts_code", "trade_date"]
+                    )
+                    rows[board] = 0
+                for rg in _row_group_slices(part, row_group_by):
+                    writers[board].write_table(rg, row_group_size=max(rg.num_rows, 1))
+                rows[board] += part.num_rows
+            print(f"  {year}-{month[4:]}: {tbl.num_rows} rows from {len(months[month])} files")
+    except Exception:
+        for w in writers.values():
+            w.close()
+        for board in writers:
+            (out_dir / f"{board}.parquet.tmp").unlink(missing_ok=True)
+            (out_dir / f"{board}.parquet.old").unlink(missing_ok=True)
+        raise
+
+    for board, w in writers.items():
+        w.close()
+        (out_dir / f"{board}.parquet.tmp").replace(out_dir / f"{board}.parquet")
+    return rows
+
+
+def is_year_up_to_date(base_dir, compact_dir, year: int) -> bool:
+    """True if compacted files exist and are newer than every raw monthly file of the year."""
+    out_files = list((Path(compact_dir) / str(year)).glob("*.parquet"))
+    if not out_files:
+        return False
+    oldest_out = min(f.stat().st_mtime for f in out_files)
+    for files in _year_inputs(Path(base_dir), year).values():
+        if any(f.stat().st_mtime > oldest_out for f in files):
+            return False
+    return True
+
+
+def read_compacted_day(compact_dir, trade_date, columns=None, symbols=None) -> pa.Table:
+    """
+    Read one trading day across all boards. trade_date: 'YYYYMMDD'.
+    The trade_date filter is pushed down to row-group statistics.
+    """
+    day = date(int(trade_date[:4]), int(trade_date[4:6]), int(trade_date[6:]))
+    year_dir = Path(compact_dir) / trade_date[:4]
+    filters = [("trade_date", "=", day)]
+    if symbols is not None:
+        filters.append(("ts_code", "in", list(symbols)))
+    tables = [pq.read_table(f, columns=columns, filters=filters) for f in sorted(year_dir.glob("*.parquet"))]
+    if not tables:
+        return pa.table({})
+    return pa.concat_tables(tables, promote_options="permissive")  # float64 fallback columns in some boards
+
+
+def main():
+    project_root = Path(__file__).resolve().parents[2]
+    if str(project_root) not in sys.path:
+        sys.path.insert(0, str(project_root))
+    from utils.config import load_paths
+    from utils.minute.minute_store import build_minute_ipc, ipc_year_up_to_date
+    from utils.minute.daily_features import build_daily_features
+
+    paths = load_paths()
+    minute = paths["level1"]["minute"]["stock"]
+    base_dir = project_root / minute["base_dir"]
+    compact_dir = project_root / minute["compact_dir"]
+    ipc_dir = project_root / minute["ipc_dir"]
+    if not base_dir.exists():
+        print(f"Path does not exist: {base_dir}")
+        return
+
+    years = sorted({int(p.name) for d in base_dir.iterdir() if d.is_dir() for p in d.iterdir() if p.is_dir() and p.name.isdigit()})
+    for year in years:
+        if is_year_up_to_date(base_dir, compact_dir, year):
+            print(f"[SKIP] {year}: compacted files are up to date")
+        else:
+            print(f"[RUN] compacting {year}")
+            rows = compact_minute_year(base_dir, compact_dir, year)
+            for board, n in sorted(rows.items()):
+                print(f"  ✅ {year}/{board}.parquet: {n} rows")
+
+        # checked on its own: a new / wiped ipc_dir or a failed IPC build leaves current compacted files
+        if ipc_year_up_to_date(compact_dir, ipc_dir, year):
+            print(f"[SKIP] {year}: minute IPC store is up to date")
+            continue
+        months = build_minute_ipc(compact_dir, ipc_dir, year)
+        print(f"  ✅ {year}: {len(months)} months written to {ipc_dir / str(year)}")
+
+    # daily execution features (incremental: months whose compacted source changed)
+    features_dir = project_root / paths["level1"]["daily"]["features"]["base_dir"]
+    build_daily_features(compact_dir, features_dir)
+
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
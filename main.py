@@ -1,84 +1,244 @@
-from pathlib import Path
-import pandas as pd
-import yaml
+"""
+中证500指增_LGBM backtest: engine run, diagnostics, reports and run registration.
+
+    python main.py                                # run the backtest configured in config/paths.yaml
+    python main.py --list-runs                    # registered runs (run_registry), newest first
+    python main.py --list-runs "全A%" --order-by sharpe_ratio --limit 10
+    python main.py --show 12                      # metrics and config of one run (run_id or name)
+
+Only the standard library is imported at module level: the engine, pandas and
+the analysis modules load inside main() and the registry queries import only
+analysis/run_registry.py, so the quick queries start without the backtest stack.
+"""
+import argparse
 import json
+import logging
+import sys
+from datetime import date
+from pathlib import Path
+
+from utils.config import load_json, load_paths
+
+
+def main():
+    import pandas as pd
+
+    from backtest.engine import 中证500指增_LGBM_BacktestEngine
+    from utils.中证500指增_LGBM.fees import BuyFeeSchedule, SellFeeSchedule
+    from utils.中证500指增_LGBM.中证500指增_LGBM_data_loader import (
+        get_benchmark_series,
+        load_market_panel,
+        market_data_version,
+    )
+    from utils.minute.minute_store import MinuteStore
+    from trading.中证500指增_LGBM.execution_price import make_execution_price_model
+    from account.liability import LiabilityFeeSchedule
+    from backtest.instrumentation import Instrumentation
+    from backtest.result import BacktestResult
+    from backtest.result_cache import ResultCache, result_key
+    from analysis.diagnostic import print_backtest_diagnostic
+    from analysis.performance_matrix import save_performance_summary
+    from analysis.rolling_metrics import compute_rolling_metrics, save_rolling_metrics
+    from analysis.attribution import compute_attribution, save_attribution
+
+    # load paths
+    paths = load_paths()
+
+    # console output of the engine / loader (allocation, price fallback): INFO shows it, WARNING silences it
+    logging.basicConfig(level=paths.get('logging', {}).get('level', 'INFO'), format="%(message)s", stream=sys.stdout)
+
+    # paths
+    market_cfg = paths['level1']['daily']['stock']
+    market_layout = market_cfg.get('layout', 'per_stock')
+    if market_layout == 'partitioned':
+        market_base_path = market_cfg['partitioned_dir']
+        market_columns = market_cfg.get('columns')
+    else:
+        market_base_path = market_cfg['base_dir']
+        market_columns = None
+    index_base_path = paths['level1']['daily']['index']['base_dir']
+    stock_trade_fees_path = paths['config']['stock_trade_fees']
+    liability_fee_path = paths['config']['liability_fee']
+    strategy = "中证500指增_LGBM"
+    p = paths['input'][strategy]
+    out = paths['output'][strategy]
+    name = p["name"]
+    _base = Path(p["base_dir"]) / str(p["year"])
+    excel_list_path = _base / f"daily_{name}_停牌.xlsx"
+    plot_save_path = _base / f"{name}_{out['plot_equity']}" if out.get('plot_equity') else None
+    plot_cfg = out.get('plot', {}) or {}
+    diagnostic_log_path = _base / f"{name}_{out['diagnostic_log']}"
+    diagnostic_daily_path = _base / f"{name}_{out['diagnostic_daily_csv']}" if out.get('diagnostic_daily_csv') else None
+    diagnostic_daily_parquet_path = _base / f"{name}_{out['diagnostic_daily_parquet']}"
+    performance_summary_path = _base / f"{name}_{out['performance_summary']}"
+    rolling_metrics_path = _base / f"{name}_{out['rolling_metrics']}"
+    trade_ledger_path = _base / f"{name}_{out['trade_ledger']}"
+
+    # import daily data
+    df = pd.read_excel(excel_list_path)
+    print(df)
+
+    # load trading config
+    stock_trade_fees = load_json(stock_trade_fees_path)
+
+    # load buy and sell fee schedules
+    buy_fee_schedule = BuyFeeSchedule.from_config(stock_trade_fees)
+    sell_fee_schedule = SellFeeSchedule.from_config(stock_trade_fees)
+
+    # load liability fee
+    liability_fees = load_json(liability_fee_path)
+
+    # load liability fee schedule
+    liability_fee_schedule = LiabilityFeeSchedule.from_config(liability_fees)
+
+    # execution price models (open/close, or minute VWAP/TWAP)
+    execution = paths.get('execution', {}).get(strategy, {})
+    buy_price_kind = execution.get('buy_price', 'open')
+    sell_price_kind = execution.get('sell_price', 'close')
+    minute_store = None
+    features_dir = None
+    if {buy_price_kind, sell_price_kind} - {'open', 'close'}:
+        if execution.get('source', 'features') == 'features':
+            features_dir = paths['level1']['daily']['features']['base_dir']
+        minute_store = MinuteStore(paths['level1']['minute']['stock']['ipc_dir'])
+    first_n_minutes = execution.get('first_n_minutes', 30)
+    buy_price_model = make_execution_price_model(buy_price_kind, minute_store, first_n_minutes, features_dir)
+    sell_price_model = make_execution_price_model(sell_price_kind, minute_store, first_n_minutes, features_dir)
+
+    # run engine; memoised in the result cache (backtest/result_cache.py): same portfolio, market data,
+    # fees, cash, execution settings and engine code -> the stored result, engine not run
+    initial_cash = 10000000
+
+    def run_engine():
+        engine = 中证500指增_LGBM_BacktestEngine(
+            df_expanded=df,
+            market_path=market_base_path,
+            initial_cash=initial_cash,
+            buy_fee_schedule=buy_fee_schedule,
+            sell_fee_schedule=sell_fee_schedule,
+            liability_fee_schedule=liability_fee_schedule,
+            buy_price_model=buy_price_model,
+            sell_price_model=sell_price_model,
+            market_layout=market_layout,
+            market_columns=market_columns,
+            instrumentation=Instrumentation() if out.get('instrumentation') else None,
+        )
+        engine.run()
+        return BacktestResult.from_engine(engine, name)
+
+    cache_cfg = paths.get('result_cache', {}) or {}
+    if cache_cfg.get('enabled') and not out.get('instrumentation'):  # profiling runs always run the engine
+        cache = ResultCache(cache_cfg['dir'], int(cache_cfg.get('max_size_mb', 2048)) * 1024 ** 2)
+        # the engine drops dates after today: an unfinished portfolio keys on today's date
+        as_of = min(pd.to_datetime(df['daily_date']).max().date(), date.today()).isoformat()
+        # minute models price fills from the IPC store / feature files: a rebuild of either changes the key
+        price_data = {
+            'minute_store': minute_store.version() if minute_store is not None else None,
+            'features': market_data_version(features_dir) if features_dir is not None else None,
+        }
+        key = result_key(
+            df, market_data_version(market_base_path, market_layout, df['Name'].dropna().astype(str).unique()),
+            buy_fee_schedule, sell_fee_schedule, liability_fee_schedule, initial_cash,
+            execution={**execution, 'buy_price': buy_price_kind, 'sell_price': sell_price_kind},
+            price_data=price_data, market_layout=market_layout, market_columns=market_columns, as_of=as_of)
+        result, _ = cache.run(key, run_engine)
+    else:
+        key = None
+        result = run_engine()
+    result.ledger.to_parquet(trade_ledger_path)
+
+    # P&L / cost attribution (per stock, week) from the ledger and daily closes
+    if out.get('attribution'):
+        _ledger_df = result.ledger.to_frame()
+        _panel = load_market_panel(
+            _ledger_df['symbol'].astype(str).unique().tolist(), sorted(result.equity_history)[1:],
+            market_base_path, layout=market_layout, columns=['close'])
+        save_attribution(
+            compute_attribution(_ledger_df, _panel, result.equity_history, liability_fee_schedule),
+            _base, f"{name}_{out['attribution']}")
+
+    # diagnostic
+    print_backtest_diagnostic(result, save_path=diagnostic_log_path, daily_csv_path=diagnostic_daily_path,
+                              daily_parquet_path=diagnostic_daily_parquet_path)
+
+    # benchmark and plot equity curve
+    benchmark = get_benchmark_series(list(result.equity_history.keys()), "000905.SH", index_base_path)
+    if plot_save_path is not None:
+        from analysis.plot import plot_equity_curve  # matplotlib only loaded when plotting
+
+        plot_equity_curve(
+            equity_history=result.equity_history,
+            benchmark=benchmark,
+            title=f"{name}_净值曲线",
+            save_path=plot_save_path,
+            dpi=plot_cfg.get('dpi', 300),
+            max_points=plot_cfg.get('max_points'),
+        )
+
+    # performance analysis
+    save_performance_summary(
+        equity_history=result.equity_history,
+        save_path=performance_summary_path,
+        benchmark=benchmark,
+    )
+
+    # rolling analytics (volatility, Sharpe, beta/alpha vs 000905.SH, drawdown)
+    nav = pd.DataFrame({name: pd.Series(result.equity_history)})
+    save_rolling_metrics(compute_rolling_metrics(nav, benchmark=benchmark), rolling_metrics_path)
+
+    # run registry: metadata, config, metrics and NAV of this run in one SQLite file (analysis/run_registry.py)
+    if paths.get('run_registry'):
+        from dataclasses import asdict
+        from analysis.run_registry import RunRegistry
+
+        run_id = RunRegistry(paths['run_registry']).register(
+            result, name=name, strategy=strategy, benchmark=benchmark, cache_key=key,
+            config={'input': p, 'execution': execution, 'initial_cash': initial_cash,
+                    'buy_fee_schedule': asdict(buy_fee_schedule), 'sell_fee_schedule': asdict(sell_fee_schedule),
+                    'liability_fee_schedule': asdict(liability_fee_schedule)})
+        print(f"Run registered: {paths['run_registry']} (run_id {run_id})")
+
+
+def show_runs(args) -> None:
+    """--list-runs / --show: query the run registry without loading the backtest stack."""
+    import pandas as pd
+    from analysis.run_registry import RunRegistry
+
+    db_path = load_paths().get('run_registry')
+    if not db_path or not Path(db_path).exists():
+        print(f"No run registry at {db_path!r} (paths.yaml run_registry)")
+        return
+    registry = RunRegistry(db_path)
+    with pd.option_context('display.width', 200, 'display.max_columns', 30, 'display.max_rows', 500):
+        if args.show is None:
+            runs = registry.list_runs(name=args.list_runs, order_by=args.order_by, limit=args.limit)
+            print(runs.drop(columns=['cache_key']) if len(runs) else "No registered runs")
+            return
+        if args.show.isdigit():
+            runs = registry.list_runs(run_ids=[int(args.show)])
+        else:
+            runs = registry.list_runs(name=args.show, limit=1)
+        if runs.empty:
+            print(f"Unknown run {args.show!r}")
+            return
+        run_id = runs.index[0]
+        print(runs.iloc[0].to_string())
+        print(json.dumps(registry.config(run_id), ensure_ascii=False, indent=2))
+
 
-from backtest.engine import 中证500指增_LGBM_BacktestEngine
-from utils.中证500指增_LGBM.fees import BuyFeeSchedule, SellFeeSchedule
-from utils.中证500指增_LGBM.中证500指增_LGBM_data_loader import get_benchmark_series
-from account.liability import LiabilityFeeSchedule
-from analysis.plot import plot_equity_curve
-from analysis.diagnostic import print_backtest_diagnostic
-from analysis.performance_matrix import save_performance_summary
-
-# load paths
-with open('config/paths.yaml', 'r', encoding="utf-8") as f:
-    paths = yaml.safe_load(f)
-
-# paths
-market_base_path = paths['level1']['daily']['stock']['base_dir']
-index_base_path = paths['level1']['daily']['index']['base_dir']
-stock_trade_fees_path = paths['config']['stock_trade_fees']
-liability_fee_path = paths['config']['liability_fee']
-strategy = "中证500指增_LGBM"
-p = paths['input'][strategy]
-out = paths['output'][strategy]
-name = p["name"]
-_base = Path(p["base_dir"]) / str(p["year"])
-excel_list_path = _base / f"daily_{name}_停牌.xlsx"
-plot_save_path = _base / f"{name}_{out['plot_equity']}"
-diagnostic_log_path = _base / f"{name}_{out['diagnostic_log']}"
-diagnostic_daily_path = _base / f"{name}_{out['diagnostic_daily_csv']}"
-performance_summary_path = _base / f"{name}_{out['performance_summary']}"
-
-# import daily data
-df = pd.read_excel(excel_list_path)
-print(df)
-
-# load trading config
-with open(stock_trade_fees_path, "r", encoding="utf-8") as f:
-    stock_trade_fees = json.load(f) or {}
-
-# load buy and sell fee schedules
-buy_fee_schedule = BuyFeeSchedule.from_config(stock_trade_fees)
-sell_fee_schedule = SellFeeSchedule.from_config(stock_trade_fees)
-
-# load liability fee
-with open(liability_fee_path, "r", encoding="utf-8") as f:
-    liability_fees = json.load(f) or {}
-
-# load liability fee schedule
-liability_fee_schedule = LiabilityFeeSchedule.from_config(liability_fees)
-
-# run engine
-engine = 中证500指增_LGBM_BacktestEngine(
-    df_expanded=df, 
-    market_path=market_base_path, 
-    initial_cash=10000000,
-    buy_fee_schedule=buy_fee_schedule,
-    sell_fee_schedule=sell_fee_schedule,
-    liability_fee_schedule=liability_fee_schedule
-)
-
-engine.run()
-
-# diagnostic
-print_backtest_diagnostic(engine, save_path=diagnostic_log_path, daily_csv_path=diagnostic_daily_path)
-
-# benchmark and plot equity curve
-benchmark = get_benchmark_series(list(engine.equity_history.keys()), "000905.SH", index_base_path)
-plot_equity_curve(
-    equity_history=engine.equity_history, 
-    benchmark=benchmark,
-    title=f"{name}_净值曲线",
-    save_path=plot_save_path
-)
-
-# performance analysis
-save_performance_summary(
-    equity_history=engine.equity_history,
-    save_path=performance_summary_path,
-    benchmark=benchmark,
-)
+def cli(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="中证500指增_LGBM backtest")
+    parser.add_argument('--list-runs', nargs='?', const='%', metavar='NAME',
+                        help="list registered runs (NAME: SQL LIKE pattern)")
+    parser.add_argument('--show', metavar='RUN', help="metrics and config of one run (run_id or name, latest run)")
+    parser.add_argument('--order-by', default='created_at', help="runs column or metric, e.g. sharpe_ratio")
+    parser.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args(argv)
+    if args.list_runs is not None or args.show is not None:
+        show_runs(args)
+    else:
+        main()
 
 
+if __name__ == "__main__":
+    cli()
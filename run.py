@@ -1,43 +1,118 @@
 """
-Run 日频回测 pipeline step by step (readme 步骤 2–7).
-Each script runs in project root; one finishes then the next runs.
-Step 1 (更新 daily_stockpool.xlsx) is manual — do that before running this.
+Run 日频回测 pipeline (readme 步骤 2–7) as a dependency graph.
+Each script runs in project root. Steps declare what they read and write
+(utils/pipeline.py): index.py, daily_data_collection.py and the
+weekly_to_daily → excel_upperlimit chain run concurrently, main.py waits for
+all of them, and a step whose script and inputs are unchanged since its last
+successful run is skipped. The QMT collectors (index.py,
+daily_data_collection.py) read remote data that changes every trading day, so
+they always run; what follows them is skipped when their outputs came out
+unchanged. With the partitioned daily layout, daily_partition.py rebuilds the
+dataset main.py reads whenever the per-stock bars change. main.py's inputs include the engine and report sources, so a
+change to backtest/, trading/, account/, analysis/ or utils/ reruns it.
+
+    python run.py                    # run what changed
+    python run.py --force            # rerun everything
+    python run.py --force index      # rerun selected steps (and whatever their new outputs change)
+    python run.py --dry-run          # show the plan only
+    python run.py --isolated         # one fresh interpreter per step instead of one process
+
+Steps run in this process by default (each script's main(), utils/pipeline.py
+run_module): libraries are imported and paths.yaml parsed once for all steps.
 """
-import subprocess
+import argparse
+import os
 import sys
 from pathlib import Path
 
+from utils.config import load_paths
+from utils.pipeline import FAILED, RAN, Step, run_module, run_pipeline, run_script
+
 PROJECT_ROOT = Path(__file__).resolve().parent
+STRATEGY = "中证500指增_LGBM"
+
+
+def build_steps(paths: dict) -> list:
+    """Pipeline steps with inputs / outputs resolved from config/paths.yaml (declaration order = readme order)."""
+    stock = paths["level1"]["daily"]["stock"]
+    index_dir = paths["level1"]["daily"]["index"]["base_dir"]
+    p = paths["input"][STRATEGY]
+    out = paths["output"][STRATEGY]
+    name = p["name"]
+    base = f"{p['base_dir']}/{p['year']}"
+    sdir = (PROJECT_ROOT / p["strategy_data_dir"]).resolve()
+    strategy_inputs = tuple(
+        Path(os.path.relpath(f, PROJECT_ROOT)).as_posix()
+        for f in (sdir / "result" / str(p["year"]) / f"{name}.xlsx", sdir / p["date_weekly_file"],
+                  sdir / p["date_daily_file"])
+    )
+    bars = f"{stock['base_dir']}/*.parquet"  # the stock pool xlsx lives in the same directory
+    partitioned = stock.get("layout", "per_stock") == "partitioned"
+    market = stock["partitioned_dir"] if partitioned else bars
+
+    from backtest.result_cache import ENGINE_SOURCES  # pandas only when a pipeline is built
+
+    sources = tuple(f"{src}/**/*.py" for src in (*ENGINE_SOURCES, "analysis"))
+    execution = paths.get("execution", {}).get(STRATEGY, {})
+    price_inputs = ()
+    if {execution.get("buy_price", "open"), execution.get("sell_price", "close")} - {"open", "close"}:
+        price_inputs = (paths["level1"]["minute"]["stock"]["ipc_dir"],)
+        if execution.get("source", "features") == "features":
+            price_inputs += (paths["level1"]["daily"]["features"]["base_dir"],)
+
+    return [
+        Step("index", "2. index.py — 更新中证500 benchmark", "data_collection/QMT/index.py",
+             inputs=(stock["stockpool"],), outputs=(index_dir,), always_run=True),
+        Step("daily_data", "3. daily_data_collection.py — 更新全A", "data_collection/QMT/daily_data_collection.py",
+             inputs=(stock["stockpool"],), outputs=(bars,), always_run=True),
+        Step("st_fill", "4. QMT_st_fill.py — ST/退市", "data_collection/tushare/QMT_st_fill.py",
+             inputs=(bars,), outputs=(bars,)),
+        *([Step("daily_partition", "4b. daily_partition.py — 日线按年分区", "data_collection/QMT/daily_partition.py",
+                inputs=(bars,), outputs=(market,))] if partitioned else []),
+        Step("weekly_to_daily", "5a. 中证500指增_LGBM_weekly_to_daily.py",
+             "data_collection/wind_choice/中证500指增_LGBM_weekly_to_daily.py",
+             inputs=strategy_inputs, outputs=(f"{base}/daily_{name}.xlsx",)),
+        Step("upperlimit", "5b. 中证500指增_LGBM_excel_upperlimit.py (Wind+Choice 涨跌停/停牌)",
+             "data_collection/wind_choice/中证500指增_LGBM_excel_upperlimit.py",
+             inputs=(f"{base}/daily_{name}.xlsx",), outputs=(f"{base}/daily_{name}_停牌.xlsx",)),
+        Step("main", "6. main.py — 回测", "main.py",
+             inputs=("config/paths.yaml", paths["config"]["stock_trade_fees"], paths["config"]["liability_fee"],
+                     f"{base}/daily_{name}_停牌.xlsx", market, index_dir, *price_inputs, *sources),
+             outputs=tuple(f"{base}/{name}_{out[k]}" for k in ("diagnostic_log", "performance_summary", "trade_ledger"))),
+    ]
+
+
+def main(argv=None, only=None, description="Pipeline"):
+    """only: step names to include (backtest.py runs the strategy steps and main.py only)."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--force", nargs="*", metavar="STEP", default=None,
+                        help="rerun these steps regardless of input hashes (no names: all steps)")
+    parser.add_argument("--jobs", type=int, default=None, help="max concurrent steps (default: CPU count)")
+    parser.add_argument("--dry-run", action="store_true", help="print which steps would run, run nothing")
+    parser.add_argument("--isolated", action="store_true", help="run each step in a fresh interpreter")
+    args = parser.parse_args(argv)
+
+    os.chdir(PROJECT_ROOT)  # scripts resolve relative paths against the project root
+    paths = load_paths()
+    steps = build_steps(paths)
+    if only is not None:
+        steps = [s for s in steps if s.name in only]
+    state_file = paths.get("pipeline", {}).get("state_file", "data/pipeline_state.json")
 
-# Order of scripts (relative to project root)
-STEPS = [
-    ("2. index.py — 更新中证500 benchmark", "data_collection/QMT/index.py"),
-    ("3. daily_data_collection.py — 更新全A", "data_collection/QMT/daily_data_collection.py"),
-    ("4. QMT_st_fill.py — ST/退市", "data_collection/tushare/QMT_st_fill.py"),
-    ("5a. 中证500指增_LGBM_weekly_to_daily.py", "data_collection/wind_choice/中证500指增_LGBM_weekly_to_daily.py"),
-    ("5b. 中证500指增_LGBM_excel_upperlimit.py (Wind+Choice 涨跌停/停牌)", "data_collection/wind_choice/中证500指增_LGBM_excel_upperlimit.py"),
-    ("6. main.py — 回测", "main.py"),
-]
-
-
-def main():
-    print("Pipeline run from:", PROJECT_ROOT)
-    print("(Step 1: 更新 daily_stockpool.xlsx 请先手动完成)\n")
-    for label, rel_path in STEPS:
-        script = PROJECT_ROOT / rel_path
-        if not script.exists():
-            print(f"[SKIP] {label}: file not found — {script}")
-            continue
-        print(f"[RUN] {label}")
-        print(f"      {script}\n")
-        ret = subprocess.run(
-            [sys.executable, str(script)],
-            cwd=str(PROJECT_ROOT),
-        )
-        if ret.returncode != 0:
-            print(f"\n[FAIL] {label} exited with code {ret.returncode}. Stopping.")
-            sys.exit(ret.returncode)
-    print("\n[DONE] All steps finished.")
+    print(f"{description} run from:", PROJECT_ROOT)
+    if only is None:
+        print("(Step 1: 更新 daily_stockpool.xlsx 请先手动完成)\n")
+    status = run_pipeline(steps, PROJECT_ROOT, PROJECT_ROOT / state_file, max_workers=args.jobs,
+                          force=args.force, dry_run=args.dry_run,
+                          runner=run_script if args.isolated else run_module)
+    if FAILED in status.values():
+        print("\n[FAIL] Pipeline stopped: " + ", ".join(n for n, s in status.items() if s == FAILED))
+        sys.exit(1)
+    if args.dry_run:
+        print(f"\n[PLAN] {sum(v == RAN for v in status.values())} of {len(status)} steps would run.")
+        return
+    counts = {s: sum(v == s for v in status.values()) for s in sorted(set(status.values()))}
+    print("\n[DONE] All steps finished. " + ", ".join(f"{v} {k}" for k, v in counts.items()))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,107 @@
+"""
+Test ledger-based attribution: gross P&L per stock from fills and closes,
+fee and capital gains tax drag, and that per-stock, per-week and per-industry
+tables all add up to the daily totals, and that on an engine run over a
+synthetic market the daily net P&L reconciles with the NAV change.
+
+Run from project root: python -m pytest tests/test_attribution.py -v
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from account.liability import LiabilityFeeSchedule
+from analysis.attribution import compute_attribution
+from backtest.ledger import TradeLedger
+from utils.中证500指增_LGBM.fees import BuyFeeSchedule, SellFeeSchedule
+from utils.中证500指增_LGBM.中证500指增_LGBM_data_loader import MarketPanel, load_market_panel
+
+BUY = BuyFeeSchedule(commission_rate=0.00025, csrc_fee_rate=0.00002, handling_fee_rate=0.0000487,
+                     transfer_fee_rate_sh=0.00001, min_fee=5.0)
+SELL = SellFeeSchedule(commission_rate=0.00025, csrc_fee_rate=0.00002, handling_fee_rate=0.0000487,
+                       stamp_tax_rate=0.0005, transfer_fee_rate_sh=0.00001, min_fee=5.0)
+LIAB = LiabilityFeeSchedule(management_fee_rate=0.0001, custodian_fee_rate=0.00001,
+                            administration_services_fee_rate=0.000005, tax_fee_rate=0.1)
+
+
+def test_attribution_per_stock_and_totals():
+    dates = ["20250106", "20250107", "20250108", "20250113", "20250114"]
+    symbols = ["600001.SH", "000002.SZ", "000003.SZ"]
+    close = np.array([
+        [10.0, 20.0, 5.0],
+        [10.5, 19.0, 5.1],
+        [11.0, 18.0, 5.2],
+        [11.5, 18.5, 5.3],
+        [12.0, 19.5, 5.4],
+    ])
+    panel = MarketPanel(dates, symbols, {"close": close}, np.full(close.shape, "x", dtype="U8"))
+
+    ledger = TradeLedger()
+    ledger.record_buy("20250106", "600001.SH", 9.9, 1000, BUY)
+    ledger.record_buy("20250106", "000002.SZ", 20.2, 500, BUY)
+    ledger.record_sell("20250108", "600001.SH", 11.1, 1000, 9.9, SELL)   # gain -> tax
+    ledger.record_stuck("20250108", "000002.SZ", 18.0, 500, 20.2, "LIMIT_DOWN")
+    ledger.record_sell("20250113", "000002.SZ", 18.4, 500, 20.2, SELL)   # loss -> no tax
+
+    equity = {"20250103": 1e6, **{d: 1e6 + 100 * i for i, d in enumerate(dates)}}
+    out = compute_attribution(ledger, panel, equity, LIAB, industry_map={"600001.SH": "bank"})
+
+    stock = out["stock"].set_index("symbol")
+    assert list(stock.index) == ["600001.SH", "000002.SZ"]  # by net P&L, untraded symbol dropped
+    assert stock.loc["600001.SH", "gross_pnl"] == pytest.approx(1000 * (11.1 - 9.9))
+    assert stock.loc["000002.SZ", "gross_pnl"] == pytest.approx(500 * (18.4 - 20.2))
+    assert stock.loc["600001.SH", "liability_tax"] == pytest.approx(1000 * (11.1 - 9.9) * 0.1)
+    assert stock.loc["000002.SZ", "liability_tax"] == 0.0
+    assert stock.loc["600001.SH", "fee_stamp"] == pytest.approx(11100 * 0.0005)
+
+    daily = out["daily"].set_index("date")
+    assert daily.loc["20250107", "gross_pnl"] == pytest.approx(1000 * 0.5 + 500 * -1.0)
+    assert daily.loc["20250114", "gross_pnl"] == 0.0
+    assert daily.loc["20250107", "liability_management"] == pytest.approx(equity["20250106"] * 0.0001)
+
+    operating = daily[["liability_management", "liability_custodian", "liability_administration"]].sum().sum()
+    assert daily["net_pnl"].sum() == pytest.approx(stock["net_pnl"].sum() - operating)
+    assert out["week"]["net_pnl"].sum() == pytest.approx(daily["net_pnl"].sum())
+    assert list(out["week"]["week"]) == ["2025-W02", "2025-W03"]
+    industry = out["industry"].set_index("industry")
+    assert industry.loc["bank", "n_stocks"] == 1 and industry.loc["UNKNOWN", "n_sells"] == 1
+    assert industry["net_pnl"].sum() == pytest.approx(stock["net_pnl"].sum())
+
+
+def test_attribution_rejects_dates_outside_panel():
+    panel = MarketPanel(["20250106"], ["600001.SH"], {"close": np.array([[10.0]])}, np.array([["x"]]))
+    ledger = TradeLedger()
+    ledger.record_buy("20250107", "600001.SH", 9.9, 100, BUY)
+    with pytest.raises(ValueError):
+        compute_attribution(ledger, panel)
+
+
+def test_daily_net_pnl_reconciles_with_engine_nav(tmp_path):
+    pytest.importorskip("pyarrow")
+    pytest.importorskip("yaml")
+    from backtest.session import BacktestSession
+    from utils.synthetic.market_generator import SyntheticMarketSpec, generate_market
+
+    # suspensions and limit moves so stuck and excluded paths are in the ledger too
+    spec = SyntheticMarketSpec(n_stocks=60, n_days=120, seed=11, suspensions_per_year=4, limit_move_prob=0.03,
+                               portfolio_size=20)
+    market = generate_market(tmp_path / "syn", spec, verbose=False)
+    session = BacktestSession(market.paths_config(), root=market.root)
+    result = session.run(market.portfolio())
+
+    ledger = result.ledger.to_frame()
+    assert {"buy", "sell", "stuck"} <= set(ledger["side"].astype(str))
+    panel = load_market_panel(ledger["symbol"].astype(str).unique().tolist(), sorted(result.equity_history)[1:],
+                              session.market_path, layout=session.market_layout, columns=["close"])
+    daily = compute_attribution(ledger, panel, result.equity_history, session.liability_fee_schedule)["daily"]
+
+    assert len(daily) == len(result.equity_history) - 1
+    np.testing.assert_allclose(daily["net_pnl"], daily["nav_change"], rtol=0, atol=1e-6)
@@ -0,0 +1,41 @@
+"""
+Test the benchmark harness on a tiny grid: every scenario runs and reports,
+generated markets are reused, and stored results round-trip into a comparison.
+
+Run from project root: python -m pytest tests/test_benchmarks.py -v
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+pytest.importorskip("yaml")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from benchmarks.bench import SCENARIOS, compare, get_market, load_results, run_suite, save_results
+
+
+def test_suite_runs_every_scenario(tmp_path):
+    rows = run_suite([30], [0.1], seed=1, repeat=1, min_time=0.001, data_dir=tmp_path)
+    assert [r["scenario"] for r in rows] == list(SCENARIOS)
+    assert all(r["best_s"] > 0 and r["n_stocks"] == 30 and r["n_days"] == 24 for r in rows)
+    assert "per_day_ms" in rows[list(SCENARIOS).index("engine_run")]
+
+    path = save_results(rows, tmp_path / "results", commit="abc123")
+    assert path.name == "abc123.json"
+    lines = compare(rows, load_results("abc123", tmp_path / "results"))
+    assert all("x1.00 vs base" in line for line in lines)
+
+
+def test_markets_are_reused(tmp_path):
+    first = get_market(20, 24, 0, 0.1, tmp_path)
+    stamp = first.portfolio_path.stat().st_mtime_ns
+    again = get_market(20, 24, 0, 0.1, tmp_path)
+    assert again.portfolio_path.stat().st_mtime_ns == stamp
+    assert list(again.dates) == list(first.dates)
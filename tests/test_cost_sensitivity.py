@@ -0,0 +1,129 @@
+"""
+Test cost re-evaluation: replaying a recorded run under its own schedules
+reproduces the engine's cash / liability accounting, alternate schedules
+change only the costs, and lot-change flags catch budgets that no longer fit.
+
+Run from project root: python -m pytest tests/test_cost_sensitivity.py -v
+"""
+import sys
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from account.liability import LiabilityFeeSchedule
+from analysis.cost_sensitivity import CostScenario, recost_run, scenario_grid, verify_lot_changes
+from backtest.ledger import TradeLedger
+from backtest.recorder import DailyRecorder
+from trading.中证500指增_LGBM.position_manager import PositionManager
+from utils.中证500指增_LGBM.fees import (
+    BuyFeeSchedule,
+    SellFeeSchedule,
+    calc_buy_total_cost,
+    calc_sell_net_proceeds,
+)
+
+BUY = BuyFeeSchedule(commission_rate=0.00025, csrc_fee_rate=0.00002, handling_fee_rate=0.0000341,
+                     transfer_fee_rate_sh=0.00001, min_fee=5.0)
+SELL = SellFeeSchedule(commission_rate=0.00025, csrc_fee_rate=0.00002, handling_fee_rate=0.0000341,
+                       stamp_tax_rate=0.0005, transfer_fee_rate_sh=0.00001, min_fee=5.0)
+LIAB = LiabilityFeeSchedule(management_fee_rate=0.0001, custodian_fee_rate=0.00001,
+                            administration_services_fee_rate=0.000005, tax_fee_rate=0.1)
+BASE = CostScenario("base", BUY, SELL, LIAB)
+
+
+def _recorded_run():
+    """Buy two stocks, hold, sell: ledger + daily records following the engine's accounting."""
+    cash0 = 100000.0
+    buy_px, sell_px = {"600001.SH": 10.0, "000002.SZ": 25.0}, {"600001.SH": 10.8, "000002.SZ": 24.0}
+    alloc = PositionManager(BUY, SELL).calculate_full_allocation(
+        list(buy_px), cash0, {s: {"open": p, "close": p} for s, p in buy_px.items()}, prices=buy_px)
+    fills = [(a["symbol"], buy_px[a["symbol"]], sell_px[a["symbol"]], a["volume"]) for a in alloc]
+    ledger = TradeLedger()
+    cost = 0.0
+    for sym, buy_px, _, vol in fills:
+        ledger.record_buy("20250106", sym, buy_px, vol, BUY)
+        cost += calc_buy_total_cost(buy_px, vol, sym[-2:], BUY)
+    closes = {"20250106": (10.2, 24.5), "20250107": (10.5, 24.2)}
+    rate = 0.0001 + 0.00001 + 0.000005
+
+    daily = DailyRecorder(3)
+    nav_prev, cash, acc = cash0, cash0 - cost, 0.0
+    for d, day_type in (("20250106", "buy"), ("20250107", "hold")):
+        mv = sum(c * f[3] for c, f in zip(closes[d], fills))
+        liab = nav_prev * rate
+        acc += liab
+        nav_prev = cash + mv - acc
+        daily.append({"date": d, "day_type": day_type, "cash_start": cash0 if day_type == "buy" else cash,
+                      "market_value": mv, "nav": nav_prev, "liabilities_today": liab})
+    proceeds = 0.0
+    for sym, buy_px, sell_px, vol in fills:
+        ledger.record_sell("20250108", sym, sell_px, vol, buy_px, SELL)
+        proceeds += calc_sell_net_proceeds(sell_px, vol, sym[-2:], SELL)
+    liab = nav_prev * rate + fills[0][3] * (10.8 - 10.0) * 0.1
+    cash = cash + proceeds - (acc + liab)
+    daily.append({"date": "20250108", "day_type": "sell", "cash_start": cash, "market_value": 0.0, "nav": cash})
+    return ledger, daily
+
+
+def test_base_replay_matches_recorded_nav():
+    ledger, daily = _recorded_run()
+    scenarios = scenario_grid(BASE, commission_rate=[0.0001, 0.0005], tax_fee_rate=[0.0])
+    assert len(scenarios) == 3 and scenarios[1].sell_fee_schedule.commission_rate == 0.0001
+
+    res = recost_run(ledger, daily, scenarios)
+    np.testing.assert_allclose(res["nav"]["base"].to_numpy(), daily.column("nav"), rtol=1e-12)
+    summary = res["summary"]
+    assert summary.loc["base", "nav_diff_vs_base"] == 0.0
+    low, high = scenarios[1].name, scenarios[2].name
+    assert summary.loc[low, "buy_fees"] < summary.loc["base", "buy_fees"] < summary.loc[high, "buy_fees"]
+    assert summary.loc[low, "stamp_tax"] == summary.loc["base", "stamp_tax"]
+    # no capital gains tax in the alternates: NAV gap >= the recorded tax
+    assert summary.loc[high, "final_nav"] - summary.loc["base", "final_nav"] > 4000 * 0.8 * 0.1 - 100
+    assert not res["lot_change"]["base"].any()
+
+
+def test_lot_change_flag_and_verification():
+    ledger, daily = _recorded_run()
+    pricey = CostScenario("pricey", replace(BUY, commission_rate=0.01), SELL, LIAB)
+    res = recost_run(ledger, daily, [BASE, pricey])
+    assert res["lot_change"].loc["20250106", "pricey"]  # recorded lots no longer affordable
+    verified = verify_lot_changes(ledger, [BASE, pricey], res, only_flagged=False)
+    assert verified.loc["20250106", "pricey"] and not verified.loc["20250106", "base"]
+
+
+def test_zero_lot_pool_stocks_keep_the_engine_budget():
+    # 600519.SH cannot get a lot from a third of the cash: the engine records it as unfilled
+    cash0 = 100000.0
+    px = {"600001.SH": 10.0, "000002.SZ": 25.0, "600519.SH": 1800.0}
+    alloc = PositionManager(BUY, SELL).calculate_full_allocation(
+        list(px), cash0, {s: {"open": p, "close": p} for s, p in px.items()}, prices=px)
+    ledger = TradeLedger()
+    for a in alloc:
+        if a["volume"] > 0:
+            ledger.record_buy("20250106", a["symbol"], a["open_buy_price"], a["volume"], BUY)
+        else:
+            ledger.record_unfilled("20250106", a["symbol"], a["open_buy_price"])
+    assert (ledger.to_frame()["side"].astype(str) == "unfilled").sum() == 1
+    cost = sum(calc_buy_total_cost(px[a["symbol"]], a["volume"], a["symbol"][-2:], BUY) for a in alloc)
+    mv = sum(px[a["symbol"]] * a["volume"] for a in alloc)
+    daily = DailyRecorder(1)
+    daily.append({"date": "20250106", "day_type": "buy", "cash_start": cash0, "market_value": mv,
+                  "nav": cash0 - cost + mv})
+
+    res = recost_run(ledger, daily, [BASE])
+    assert not res["lot_change"].loc["20250106", "base"]
+    # the exact check reallocates over all three stocks: the recorded lots come out again
+    assert not verify_lot_changes(ledger, [BASE], res, only_flagged=False).loc["20250106", "base"]
+
+
+def test_unknown_grid_field_raises():
+    with pytest.raises(ValueError):
+        scenario_grid(BASE, commision_rate=[0.0001])
@@ -0,0 +1,152 @@
+"""
+Test that the hive-partitioned daily bar layout returns the same market data
+as the per-stock parquet layout, including the last-available-close fallback
+for suspended stocks across a year boundary, and that a rebuilt partitioned
+dataset is reopened instead of served from the dataset cache, and that every
+reader rejects a stock with a zero value anywhere in its file.
+
+Run from project root: python -m pytest tests/test_data_loader.py -v
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import utils.中证500指增_LGBM.中证500指增_LGBM_data_loader as loader
+from utils.中证500指增_LGBM.中证500指增_LGBM_data_loader import (
+    build_partitioned_daily,
+    get_market_data,
+    load_market_panel,
+)
+
+
+def _write_per_stock(base_dir: Path) -> None:
+    dates = ["20241230", "20241231", "20250102", "20250103", "20250106"]
+    for i, code in enumerate(["600390.SH", "000415.SZ", "300390.SZ"]):
+        df = pd.DataFrame({
+            "open": [10.0 + i + k for k in range(5)],
+            "high": [11.0 + i + k for k in range(5)],
+            "low": [9.0 + i + k for k in range(5)],
+            "close": [10.5 + i + k for k in range(5)],
+            "volume": [1000 + k for k in range(5)],
+            "amount": [10500.0 + k for k in range(5)],
+        }, index=dates)
+        if code == "300390.SZ":
+            df = df.iloc[:2]  # suspended from 20250102
+        df.to_parquet(base_dir / f"{code}.parquet")
+
+
+@pytest.mark.parametrize("n_buckets", [0, 3])
+def test_partitioned_layout_matches_per_stock(tmp_path, n_buckets):
+    base_dir, part_dir = tmp_path / "stock", tmp_path / "partitioned"
+    base_dir.mkdir()
+    _write_per_stock(base_dir)
+    build_partitioned_daily(str(base_dir), str(part_dir), n_buckets=n_buckets, chunk_size=2)
+
+    stocks = ["600390.SH", "000415.SZ", "300390.SZ"]
+    for target in ["20241231", "20250103", "20250106"]:
+        expected = get_market_data(stocks, target, str(base_dir))
+        got = get_market_data(stocks, target, str(part_dir), layout="partitioned")
+        assert got == expected, target
+
+    got = get_market_data(stocks, "20250106", str(part_dir), layout="partitioned", columns=["open", "close"])
+    assert got["300390.SZ"] == {"open": 13.0, "close": 13.5}  # last bar 20241231
+    assert get_market_data(stocks, "20200101", str(part_dir), layout="partitioned") == {}
+
+
+def test_unknown_layout_raises(tmp_path):
+    with pytest.raises(ValueError):
+        get_market_data(["600390.SH"], "20250102", str(tmp_path), layout="columnar")
+
+
+def test_market_data_stats_counters(tmp_path):
+    base_dir, part_dir = tmp_path / "stock", tmp_path / "partitioned"
+    base_dir.mkdir()
+    _write_per_stock(base_dir)
+    build_partitioned_daily(str(base_dir), str(part_dir))
+    stocks = ["600390.SH", "000415.SZ", "300390.SZ"]
+
+    stats = {}
+    get_market_data(stocks, "20250106", str(base_dir), stats=stats)
+    assert stats["files_read"] == 3 and stats["rows_read"] == 12 and stats["fallback_days"] == 1
+    assert stats["bytes_read"] == sum((base_dir / f"{c}.parquet").stat().st_size for c in stocks)
+
+    stats = {}
+    for _ in range(2):
+        get_market_data(stocks, "20250106", str(part_dir), layout="partitioned", stats=stats)
+    assert stats["dataset_cache_hits"] >= 1 and stats["fallback_days"] == 2
+    assert stats["scans"] == 4  # target year, then earlier years for the suspended stock
+
+
+def test_rebuilt_partitioned_dataset_is_reopened(tmp_path, monkeypatch):
+    base_dir, part_dir = tmp_path / "stock", tmp_path / "partitioned"
+    base_dir.mkdir()
+    _write_per_stock(base_dir)
+    build_partitioned_daily(str(base_dir), str(part_dir))
+    assert get_market_data(["000415.SZ"], "20250106", str(part_dir), layout="partitioned")["000415.SZ"]["close"] == 15.5
+
+    # rebuild with corrected bars, as another process would: this process's cache entry survives
+    cached = dict(loader._DATASETS)
+    df = pd.read_parquet(base_dir / "000415.SZ.parquet")
+    df["close"] += 1.0
+    df.to_parquet(base_dir / "000415.SZ.parquet")
+    layout_mtime = (part_dir / "_layout.json").stat().st_mtime_ns
+    build_partitioned_daily(str(base_dir), str(part_dir), n_buckets=3)
+    os.utime(part_dir / "_layout.json", ns=(layout_mtime, layout_mtime + 10**9))  # mtime granularity
+    monkeypatch.setattr(loader, "_DATASETS", cached)
+
+    stats = {}
+    got = get_market_data(["000415.SZ"], "20250106", str(part_dir), layout="partitioned", stats=stats)
+    assert got["000415.SZ"]["close"] == 16.5 and "dataset_cache_hits" not in stats
+    assert loader._DATASETS[str(part_dir)][2] == 3
+
+
+@pytest.mark.parametrize("layout", ["per_stock", "partitioned"])
+@pytest.mark.parametrize("columns", [None, ["open", "close"]])
+def test_zero_value_anywhere_in_file_raises(tmp_path, layout, columns):
+    base_dir, part_dir = tmp_path / "stock", tmp_path / "partitioned"
+    base_dir.mkdir()
+    _write_per_stock(base_dir)
+    df = pd.read_parquet(base_dir / "000415.SZ.parquet")
+    df.loc["20250106", "volume"] = 0  # after the target date, in a column that is not read
+    df.to_parquet(base_dir / "000415.SZ.parquet")
+    build_partitioned_daily(str(base_dir), str(part_dir), n_buckets=3)
+    path = str(base_dir) if layout == "per_stock" else str(part_dir)
+
+    with pytest.raises(ValueError, match="000415.SZ"):
+        get_market_data(["600390.SH", "000415.SZ"], "20241231", path, layout=layout, columns=columns)
+    with pytest.raises(ValueError, match="000415.SZ"):
+        load_market_panel(["600390.SH", "000415.SZ"], ["20241231", "20250102"], path, layout=layout,
+                          columns=columns)
+    assert get_market_data(["600390.SH"], "20241231", path, layout=layout, columns=columns)
+
+    if layout == "partitioned":  # a layout file written before zero_codes was recorded: scanned on open
+        (part_dir / "_layout.json").write_text('{"n_buckets": 3}')
+        loader._DATASETS.clear()
+        with pytest.raises(ValueError, match="000415.SZ"):
+            get_market_data(["000415.SZ"], "20241231", path, layout=layout, columns=columns)
+
+
+@pytest.mark.parametrize("layout", ["per_stock", "partitioned"])
+def test_market_panel_matches_get_market_data(tmp_path, layout):
+    base_dir, part_dir = tmp_path / "stock", tmp_path / "partitioned"
+    base_dir.mkdir()
+    _write_per_stock(base_dir)
+    build_partitioned_daily(str(base_dir), str(part_dir))
+    path = str(base_dir) if layout == "per_stock" else str(part_dir)
+
+    stocks = ["600390.SH", "000415.SZ", "300390.SZ"]
+    dates = ["20241231", "20250102", "20250103", "20250106"]
+    panel = load_market_panel(stocks, dates, path, layout=layout)
+    assert panel["close"].shape == (4, 3)
+    for d in dates:
+        assert panel.market_data(stocks, d) == get_market_data(stocks, d, path, layout=layout), d
+    assert panel.market_data(stocks, "20250106")["300390.SZ"]["close"] == 13.5  # last bar 20241231
@@ -0,0 +1,71 @@
+"""
+Test the differential equivalence harness: the resident-panel path matches the
+reference engine, an altered allocator is reported section by section, and
+differences within tolerance pass but are still reported.
+
+Run from project root: python -m pytest tests/test_equivalence.py -v
+"""
+import copy
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+pytest.importorskip("yaml")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from backtest.equivalence import check_equivalence, compare_results, engine_runner, session_runner
+from backtest.session import BacktestSession
+from trading.中证500指增_LGBM.position_manager import PositionManager
+from utils.synthetic.market_generator import SyntheticMarketSpec, generate_market
+
+
+class _UnderInvested(PositionManager):
+    def calculate_full_allocation(self, stock_pool, total_budget, market_data_today, prices=None):
+        return super().calculate_full_allocation(stock_pool, total_budget * 0.99, market_data_today, prices)
+
+
+@pytest.fixture(scope="module")
+def setup(tmp_path_factory):
+    market = generate_market(tmp_path_factory.mktemp("syn"), SyntheticMarketSpec(n_stocks=40, n_days=60, seed=3,
+                                                                                portfolio_size=10), verbose=False)
+    session = BacktestSession(market.paths_config(), root=market.root)
+    fees = (session.buy_fee_schedule, session.sell_fee_schedule, session.liability_fee_schedule)
+    return market.portfolio(), session, engine_runner(session.market_path, *fees), fees
+
+
+def test_panel_path_is_equivalent(setup):
+    portfolio, session, reference, _ = setup
+    report = check_equivalence(portfolio, reference, session_runner(session))
+    assert report.passed, report.summary()
+    assert report.sections["equity_history"].compared == portfolio["daily_date"].nunique() + 1
+    assert report.sections["ledger"].compared > 0 and report.speedup > 0
+    assert "EQUIVALENT" in report.summary()
+
+
+def test_altered_allocator_is_reported(setup):
+    portfolio, session, reference, fees = setup
+    candidate = engine_runner(session.market_path, *fees, position_manager_cls=_UnderInvested)
+    report = check_equivalence(portfolio, reference, candidate)
+    assert not report.passed
+    for name in ("equity_history", "diag", "daily", "ledger"):
+        assert report.sections[name].mismatched > 0, name
+    assert report.sections["equity_history"].examples[0].startswith("20")
+    assert "DIFFERENT" in report.summary()
+
+
+def test_tolerance(setup):
+    portfolio, session, _, _ = setup
+    result = session.run(portfolio)
+    nudged = copy.deepcopy(result)
+    last = max(nudged.equity_history)
+    nudged.equity_history[last] += 1e-7
+    within = compare_results(result, nudged, atol=1e-6)
+    assert within.passed and 0 < within.sections["equity_history"].max_abs_diff < 1e-6
+    assert not compare_results(result, nudged, atol=1e-8, rtol=0).passed
@@ -0,0 +1,56 @@
+"""
+Startup budget of the entry points: main.py and run.py import only the
+standard library, the registry query path stays under a second, and the
+collectors import without their vendor libraries (xtquant / tushare / xlwings).
+
+Run from project root: python -m pytest tests/test_import_time.py -v
+"""
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from utils.importtime import import_time
+
+# cumulative import time budgets (ms); see python utils/importtime.py <module> for the breakdown
+BUDGET_MS = {
+    "main": 250,
+    "run": 250,
+    "analysis.run_registry": 1000,  # main.py --list-runs / --show
+}
+HEAVY = ("pandas", "numpy", "pyarrow", "matplotlib", "backtest.engine")
+COLLECTORS = (
+    "data_collection/QMT/index.py",
+    "data_collection/QMT/daily_data_collection.py",
+    "data_collection/tushare/QMT_st_fill.py",
+    "data_collection/wind_choice/中证500指增_LGBM_excel_upperlimit.py",
+)
+
+
+@pytest.mark.parametrize("module", sorted(BUDGET_MS))
+def test_import_budget(module):
+    pytest.importorskip("pandas")
+    total, modules = import_time(module)
+    assert total <= BUDGET_MS[module], f"import {module} took {total:.0f} ms (budget {BUDGET_MS[module]} ms)"
+    if module in ("main", "run"):
+        assert not [m for m in HEAVY if m in modules]
+    assert "matplotlib" not in modules
+
+
+def test_collectors_import_without_vendor_libraries():
+    pytest.importorskip("pandas")
+    code = (
+        "import importlib.util, sys\n"
+        "for i, path in enumerate(sys.argv[1:]):\n"
+        "    spec = importlib.util.spec_from_file_location(f'_collector_{i}', path)\n"
+        "    spec.loader.exec_module(importlib.util.module_from_spec(spec))\n"
+        "print(sorted(m for m in ('xtquant', 'tushare', 'xlwings') if m in sys.modules))\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", code, *COLLECTORS], cwd=PROJECT_ROOT, capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip() == "[]"
@@ -0,0 +1,52 @@
+"""
+Test backtest instrumentation: phase timings per day, counters, the record
+fields it adds, and the no-op NullInstrumentation used when disabled.
+
+Run from project root: python -m pytest tests/test_instrumentation.py -v
+"""
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from analysis.diagnostic import format_instrumentation_summary
+from backtest.instrumentation import PHASES, Instrumentation, NullInstrumentation
+
+
+def test_instrumentation_records_phases_and_counters():
+    instr = Instrumentation()
+    for d in ("20250102", "20250103"):
+        instr.start_day(d)
+        with instr.phase("market_data"):
+            time.sleep(0.01)
+        with instr.phase("allocation"):
+            pass
+        instr.count("files_read", 3)
+        day = instr.end_day()
+        assert set(day) == set(Instrumentation.record_fields())
+        assert day["t_market_data"] >= 0.009 and day["t_exclusions"] == 0.0
+
+    assert instr.counters == {"files_read": 6}
+    summary = instr.summary().set_index("phase")
+    assert list(summary.index) == list(PHASES)
+    assert summary.loc["market_data", "share_pct"] > 90
+    lines = format_instrumentation_summary(instr)
+    assert any(line.startswith("market_data") for line in lines) and "files_read" in lines[-1]
+
+
+def test_null_instrumentation_is_noop():
+    instr = NullInstrumentation()
+    assert not instr.enabled and instr.counters is None
+    instr.start_day("20250102")
+    with instr.phase("market_data"):
+        pass
+    instr.count("files_read")
+    assert instr.end_day() == {}
@@ -0,0 +1,63 @@
+"""
+Test the fill ledger: fee components add up to the fee functions used for
+cash, sells keep the position cost price, stuck rows carry their cause, and
+the parquet round-trip decodes symbols and sides.
+
+Run from project root: python -m pytest tests/test_ledger.py -v
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from backtest.ledger import TradeLedger
+from utils.中证500指增_LGBM.fees import (
+    BuyFeeSchedule,
+    SellFeeSchedule,
+    calc_buy_total_cost,
+    calc_sell_net_proceeds,
+)
+
+BUY = BuyFeeSchedule(commission_rate=0.00025, csrc_fee_rate=0.00002, handling_fee_rate=0.0000487,
+                     transfer_fee_rate_sh=0.00001, min_fee=5.0)
+SELL = SellFeeSchedule(commission_rate=0.00025, csrc_fee_rate=0.00002, handling_fee_rate=0.0000487,
+                       stamp_tax_rate=0.0005, transfer_fee_rate_sh=0.00001, min_fee=5.0)
+
+
+def test_ledger_fills_and_round_trip(tmp_path):
+    ledger = TradeLedger(capacity=2)
+    ledger.record_buy("20250102", "600519.SH", 1500.0, 100, BUY)
+    ledger.record_buy("20250102", "000001.SZ", 10.5, 300, BUY)  # min fee
+    ledger.record_sell("20250108", "600519.SH", 1520.0, 100, 1500.0, SELL)
+    ledger.record_stuck("20250108", "000001.SZ", 9.45, 300, 10.5, "LIMIT_DOWN")
+
+    df = ledger.to_frame()
+    assert list(df["symbol"]) == ["600519.SH", "000001.SZ", "600519.SH", "000001.SZ"]
+    assert list(df["side"]) == ["buy", "buy", "sell", "stuck"]
+    assert list(df["stuck_cause"]) == ["", "", "", "LIMIT_DOWN"]
+
+    buy = df.iloc[0]
+    assert buy["notional"] + buy["fee_total"] == pytest.approx(calc_buy_total_cost(1500.0, 100, "SH", BUY), rel=1e-15)
+    assert df.iloc[1]["fee_base"] == 5.0 and df.iloc[1]["fee_transfer"] == 0.0
+    sell = df.iloc[2]
+    assert sell["notional"] - sell["fee_total"] == pytest.approx(calc_sell_net_proceeds(1520.0, 100, "SH", SELL), rel=1e-15)
+    assert sell["fee_stamp"] == pytest.approx(1520.0 * 100 * 0.0005) and sell["cost_price"] == 1500.0
+    assert df.iloc[3]["fee_total"] == 0.0
+
+    ledger.to_parquet(tmp_path / "ledger.parquet")
+    back = pd.read_parquet(tmp_path / "ledger.parquet")
+    assert list(back["side"].astype(str)) == list(df["side"].astype(str))
+    assert back["fee_total"].sum() == pytest.approx(df["fee_total"].sum())
+    pd.testing.assert_frame_equal(TradeLedger.from_frame(back).to_frame(), df)
+
+
+def test_unknown_stuck_cause_raises():
+    with pytest.raises(ValueError):
+        TradeLedger().record_stuck("20250108", "000001.SZ", 9.45, 300, 10.5, "UNKNOWN")
@@ -0,0 +1,85 @@
+"""
+Test the synthetic market generator: output is deterministic from the seed,
+bars obey tick / price-limit rules, suspensions leave gaps that the portfolio's
+suspension columns report, and the engine runs on it through every
+exclusion / stuck path.
+
+Run from project root: python -m pytest tests/test_market_generator.py -v
+"""
+import sys
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+pytest.importorskip("yaml")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from backtest.session import BacktestSession
+from utils.synthetic.market_generator import SyntheticMarketSpec, generate_market
+
+# busier than the defaults so a small universe hits every path
+SPEC = SyntheticMarketSpec(n_stocks=60, n_days=120, seed=7, suspensions_per_year=4, limit_move_prob=0.03,
+                           portfolio_size=20)
+
+
+@pytest.fixture(scope="module")
+def market(tmp_path_factory):
+    return generate_market(tmp_path_factory.mktemp("syn"), SPEC, verbose=False)
+
+
+def test_deterministic_and_prefix_stable(market, tmp_path):
+    again = generate_market(tmp_path / "again", SPEC, verbose=False)
+    pd.testing.assert_frame_equal(again.portfolio(), market.portfolio())
+    larger = generate_market(tmp_path / "larger", replace(SPEC, n_stocks=80), verbose=False)
+    universe = pd.read_parquet(market.universe_path)
+    pd.testing.assert_frame_equal(pd.read_parquet(larger.universe_path).iloc[:len(universe)], universe)
+    for code in universe["code"]:
+        pd.testing.assert_frame_equal(pd.read_parquet(larger.stock_dir / f"{code}.parquet"),
+                                      pd.read_parquet(market.stock_dir / f"{code}.parquet"))
+
+
+def test_bars_follow_tick_and_limit_rules(market):
+    universe = pd.read_parquet(market.universe_path)
+    assert set(universe.loc[universe["is_st"], "limit_pct"]) <= {0.05}
+    gaps = 0
+    for code, limit in zip(universe["code"], universe["limit_pct"]):
+        bars = pd.read_parquet(market.stock_dir / f"{code}.parquet")
+        prices = bars[["open", "high", "low", "close"]].to_numpy()
+        assert (prices > 0).all() and (bars["volume"] > 0).all()
+        assert np.allclose(prices, np.round(prices, 2))
+        assert (bars["high"] >= bars[["open", "close"]].max(axis=1)).all()
+        assert (bars["low"] <= bars[["open", "close"]].min(axis=1)).all()
+        move = bars["close"].to_numpy()[1:] / bars["close"].to_numpy()[:-1] - 1
+        assert (np.abs(move) <= limit + 0.01 / bars["close"].min()).all()
+        gaps += len(market.dates) - len(bars) - market.dates.get_loc(pd.Timestamp(bars.index[0]))
+    assert gaps > 0  # suspended days have no bar
+
+
+def test_portfolio_columns_match_bars(market):
+    df = market.portfolio()
+    assert list(df.columns[:6]) == ["Date", "Name", "week_end", "daily_date", "first_trading_day", "last_trading_day"]
+    first, last = df["first_trading_day"] == 1, df["last_trading_day"] == 1
+    assert df.loc[first, "UpperLimit"].notna().all() and df.loc[~first, "UpperLimit"].isna().all()
+    assert df.loc[last, "LowerLimit"].notna().all() and df.loc[~last, "LowerLimit"].isna().all()
+    suspended = df[df["停牌起始日期"] > 0]
+    assert len(suspended)
+    for _, row in suspended.iterrows():
+        bars = pd.read_parquet(market.stock_dir / f"{row['Name']}.parquet")
+        assert row["daily_date"].strftime("%Y%m%d") not in bars.index
+        assert str(int(row["停牌起始日期"])) <= row["daily_date"].strftime("%Y%m%d")
+
+
+def test_engine_runs_every_path(market):
+    session = BacktestSession(market.paths_config(), root=market.root)
+    result = session.run(market.portfolio())
+    diag = result._diag
+    assert diag["excluded_suspended"] > 0 and diag["excluded_upper_limit"] > 0
+    assert diag["stuck_suspension"] and diag["stuck_limit_down"]
+    assert len(result.equity_history) == len(market.dates) - 5 + 1  # first week is only the signal week
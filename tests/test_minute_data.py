@@ -0,0 +1,240 @@
+"""
+Test minute data compaction (monthly per-stock files -> per-year per-board parquet),
+the memory-mapped Arrow IPC minute store built from it, the daily execution
+feature store, and the minute-bar execution price models.
+
+Run from project root: python -m pytest tests/test_minute_data.py -v
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pq = pytest.importorskip("pyarrow.parquet")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from data_collection.tushare.minute_compaction import (
+    board_from_symbol,
+    compact_minute_year,
+    is_year_up_to_date,
+    read_compacted_day,
+)
+from utils.minute.minute_store import MinuteStore, build_minute_ipc, ipc_year_up_to_date
+from utils.minute.daily_features import build_daily_features, load_daily_features
+from trading.中证500指增_LGBM.execution_price import MinuteVWAPModel, make_execution_price_model
+
+STOCKS = ["600390.SH", "000415.SZ", "300390.SZ", "688001.SH"]
+DAYS = ["2025-03-03", "2025-03-04", "2025-04-01"]
+MINUTES = ["09:31:00", "09:32:00", "09:33:00"]
+
+
+def _write_raw_minutes(base_dir: Path) -> None:
+    """Write files in the minut_data_collection.py layout: {stock}/{year}/{stock}_{YYYYMM}.parquet."""
+    for i, stock in enumerate(STOCKS):
+        rows = []
+        for day in DAYS:
+            for j, minute in enumerate(MINUTES):
+                price = round(10.0 + i + j * 0.01, 2)
+                rows.append({
+                    "ts_code": stock,
+                    "trade_time": f"{day} {minute}",
+                    "close": price, "open": price, "high": price + 0.01, "low": price - 0.01,
+                    "vol": 100.0 * (j + 1), "amount": price * 100.0 * (j + 1),
+                })
+        df = pd.DataFrame(rows)
+        df["month"] = df["trade_time"].str[:7].str.replace("-", "")
+        for month, g in df.groupby("month"):
+            d = base_dir / stock / month[:4]
+            d.mkdir(parents=True, exist_ok=True)
+            g.drop(columns="month").to_parquet(d / f"{stock}_{month}.parquet")
+
+
+def test_board_from_symbol():
+    assert board_from_symbol("600390.SH") == "SH_MAIN"
+    assert board_from_symbol("688001.SH") == "STAR"
+    assert board_from_symbol("000415.SZ") == "SZ_MAIN"
+    assert board_from_symbol("300390.SZ") == "GEM"
+    assert board_from_symbol("830799.BJ") == "BJ"
+
+
+def test_compact_minute_year(tmp_path):
+    base_dir, compact_dir = tmp_path / "raw", tmp_path / "compact"
+    _write_raw_minutes(base_dir)
+
+    rows = compact_minute_year(base_dir, compact_dir, 2025)
+    assert rows == {"SH_MAIN": 9, "SZ_MAIN": 9, "GEM": 9, "STAR": 9}
+    assert is_year_up_to_date(base_dir, compact_dir, 2025)
+
+    pf = pq.ParquetFile(compact_dir / "2025" / "SH_MAIN.parquet")
+    assert pf.metadata.num_row_groups == len(DAYS)  # one row group per trading day
+    schema = pf.schema_arrow
+    assert str(schema.field("close").type) == "float"
+    assert str(schema.field("ts_code").type).startswith("dictionary")
+
+    day = read_compacted_day(compact_dir, "20250304", columns=["ts_code", "trade_time", "close"]).to_pandas()
+    assert len(day) == len(STOCKS) * len(MINUTES)
+    assert set(day["ts_code"].astype(str)) == set(STOCKS)
+    assert day["close"].astype("float64").round(2).isin([round(10.0 + i + j * 0.01, 2) for i in range(4) for j in range(3)]).all()
+
+
+def test_compact_falls_back_to_float64_where_float32_is_lossy(tmp_path, capsys):
+    base_dir, compact_dir = tmp_path / "raw", tmp_path / "compact"
+    _write_raw_minutes(base_dir)
+    # a later month of 600390.SH has an off-tick close: SH_MAIN's March row groups are widened too
+    d = base_dir / "600390.SH" / "2025"
+    pd.DataFrame({
+        "ts_code": ["600390.SH"], "trade_time": ["2025-05-06 09:31:00"],
+        "close": [10.123456], "open": [10.0], "high": [10.2], "low": [10.0],
+        "vol": [100.0], "amount": [1012.0],
+    }).to_parquet(d / "600390.SH_202505.parquet")
+
+    rows = compact_minute_year(base_dir, compact_dir, 2025)
+    assert rows["SH_MAIN"] == 10 and rows["GEM"] == 9
+    assert "SH_MAIN.parquet: close has 1 values not lossless in float32" in capsys.readouterr().out
+
+    sh = pq.ParquetFile(compact_dir / "2025" / "SH_MAIN.parquet")
+    assert str(sh.schema_arrow.field("close").type) == "double"
+    assert str(sh.schema_arrow.field("open").type) == "float"
+    assert sh.metadata.num_row_groups == len(DAYS) + 1  # earlier row groups kept on rewrite
+    assert str(pq.read_schema(compact_dir / "2025" / "GEM.parquet").field("close").type) == "float"
+    assert not list((compact_dir / "2025").glob("*.old"))
+
+    closes = sh.read(columns=["close"]).column("close").to_pylist()
+    assert closes[-1] == 10.123456 and round(closes[0], 2) == 10.0
+    day = read_compacted_day(compact_dir, "20250304", columns=["ts_code", "close"])  # float32 + float64 boards
+    assert day.num_rows == len(STOCKS) * len(MINUTES) and str(day.schema.field("close").type) == "double"
+
+
+def test_minute_store_day_slice(tmp_path):
+    base_dir, compact_dir, ipc_dir = tmp_path / "raw", tmp_path / "compact", tmp_path / "ipc"
+    _write_raw_minutes(base_dir)
+    compact_minute_year(base_dir, compact_dir, 2025)
+
+    written = build_minute_ipc(compact_dir, ipc_dir, 2025)
+    assert written == {"202503": 2, "202504": 1}
+
+    store = MinuteStore(ipc_dir)
+    assert store.available_dates() == ["20250303", "20250304", "20250401"]
+    assert store.get_day("20250305") is None
+
+    panel = store.get_day("20250304", fields=["close", "vol"], start="09:32", end="09:33")
+    assert panel.minutes == ["09:32", "09:33"]
+    assert panel.shape == (len(STOCKS), 2)
+    assert not panel["close"].base.flags.owndata  # view into the mapped batch
+
+    row = panel.symbol_index(["300390.SZ", "999999.SZ"])
+    assert row[1] == -1
+    close = panel["close"][row[0]].astype("float64").round(2).tolist()
+    assert close == [12.01, 12.02]
+    assert panel["vol"][row[0]].tolist() == [200.0, 300.0]
+
+    days = [p.date for p in store.iter_days("20250304", "20250430", fields=["close"])]
+    assert days == ["20250304", "20250401"]
+
+    version = store.version()
+    assert MinuteStore(ipc_dir).version() == version
+    os.utime(ipc_dir / "2025" / "202504.arrow", ns=(1, 1))  # a rebuilt month
+    assert store.version() != version
+
+
+def test_ipc_freshness_is_checked_apart_from_compaction(tmp_path):
+    base_dir, compact_dir, ipc_dir = tmp_path / "raw", tmp_path / "compact", tmp_path / "ipc"
+    _write_raw_minutes(base_dir)
+    compact_minute_year(base_dir, compact_dir, 2025)
+    assert is_year_up_to_date(base_dir, compact_dir, 2025)
+    assert not ipc_year_up_to_date(compact_dir, ipc_dir, 2025)  # new ipc_dir, compaction current
+
+    build_minute_ipc(compact_dir, ipc_dir, 2025)
+    assert ipc_year_up_to_date(compact_dir, ipc_dir, 2025)
+    (ipc_dir / "2025" / "202504.arrow").unlink()  # partly wiped / failed build
+    assert not ipc_year_up_to_date(compact_dir, ipc_dir, 2025)
+
+    build_minute_ipc(compact_dir, ipc_dir, 2025)
+    st = (compact_dir / "2025" / "GEM.parquet").stat()
+    os.utime(compact_dir / "2025" / "GEM.parquet", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))  # recompacted
+    assert not ipc_year_up_to_date(compact_dir, ipc_dir, 2025)
+    assert ipc_year_up_to_date(compact_dir, ipc_dir, 2024)  # no compacted files: nothing to build
+
+
+def test_execution_price_models(tmp_path):
+    base_dir, compact_dir, ipc_dir = tmp_path / "raw", tmp_path / "compact", tmp_path / "ipc"
+    _write_raw_minutes(base_dir)
+    compact_minute_year(base_dir, compact_dir, 2025)
+    build_minute_ipc(compact_dir, ipc_dir, 2025)
+    store = MinuteStore(ipc_dir)
+
+    daily = {s: {"open": 1.0, "close": 2.0} for s in STOCKS + ["000001.SZ"]}
+    vwap = make_execution_price_model("vwap", store)
+    twap = make_execution_price_model("twap_first_n", store, first_n_minutes=2)
+    vwap.prepare(["20250303", "20250304", "20250305"])
+
+    # stock i: close = 10 + i + 0.01 * j, vol = 100 * (j + 1) for minute j
+    prices = vwap.get_prices("20250304", ["000415.SZ", "000001.SZ"], daily, side="buy")
+    expected = sum((11.0 + 0.01 * j) * (j + 1) for j in range(3)) / 6
+    assert abs(prices["000415.SZ"] - expected) < 1e-4
+    assert prices["000001.SZ"] == 1.0  # no minute bars: daily open for buys
+
+    prices = twap.get_prices("20250304", ["000415.SZ"], daily, side="sell")
+    assert abs(prices["000415.SZ"] - 11.005) < 1e-4
+
+    # date not in the store: daily close for sells
+    assert vwap.get_prices("20250305", ["000415.SZ"], daily, side="sell") == {"000415.SZ": 2.0}
+
+    # per-instance cache bounded in days
+    small = MinuteVWAPModel(store, max_cached_days=2)
+    small.prepare(["20250303", "20250304", "20250401"])
+    assert len(small.cache) == 2
+
+    # store rebuilt with new bars: the resident model reprices instead of serving its cache
+    raw = base_dir / "000415.SZ" / "2025" / "000415.SZ_202503.parquet"
+    bars = pd.read_parquet(raw)
+    bars[["open", "high", "low", "close"]] += 1.0
+    bars.to_parquet(raw)
+    compact_minute_year(base_dir, compact_dir, 2025)
+    build_minute_ipc(compact_dir, ipc_dir, 2025)
+    vwap.prepare(["20250304"])
+    prices = vwap.get_prices("20250304", ["000415.SZ"], daily, side="buy")
+    assert abs(prices["000415.SZ"] - (expected + 1.0)) < 1e-4
+
+    open_model = make_execution_price_model("open")
+    assert open_model.get_prices("20250304", ["000415.SZ"], daily, side="buy") == {"000415.SZ": 1.0}
+    with pytest.raises(ValueError):
+        make_execution_price_model("vwap")
+
+
+def test_daily_features_incremental(tmp_path):
+    base_dir, compact_dir, features_dir = tmp_path / "raw", tmp_path / "compact", tmp_path / "features"
+    _write_raw_minutes(base_dir)
+    compact_minute_year(base_dir, compact_dir, 2025)
+
+    written = build_daily_features(compact_dir, features_dir, participation_rate=0.1, open_window=2)
+    assert written == {"202503": 8, "202504": 4}
+    # rerun on the same compacted files: nothing recomputed
+    assert build_daily_features(compact_dir, features_dir, open_window=2) == {}
+    # the year was recompacted (e.g. a backfilled stock): every month of it is recomputed
+    os.utime(compact_dir / "2025" / "GEM.parquet", ns=(1, 1))
+    assert list(build_daily_features(compact_dir, features_dir, open_window=2)) == ["202503", "202504"]
+    # other parameters: recomputed
+    assert list(build_daily_features(compact_dir, features_dir, open_window=3)) == ["202503", "202504"]
+    build_daily_features(compact_dir, features_dir, open_window=2)
+
+    df = load_daily_features(features_dir, "20250304", "20250304", symbols=["000415.SZ"])
+    assert len(df) == 1
+    row = df.iloc[0]
+    assert row["volume"] == 600.0
+    assert row["participation_volume"] == 60.0
+    assert row["n_bars"] == 3
+    assert abs(row["vwap_open2"] - (11.0 * 1 + 11.01 * 2) / 3) < 1e-4
+    assert abs(row["high_after_open"] - 11.03) < 1e-4  # first bar (high 11.01) excluded
+    assert abs(row["low_after_open"] - 11.00) < 1e-4
+
+    model = make_execution_price_model("vwap_first_n", first_n_minutes=2, features_dir=features_dir)
+    model.prepare(["20250304"])
+    prices = model.get_prices("20250304", ["000415.SZ", "000001.SZ"], {"000001.SZ": {"open": 1.0}}, side="buy")
+    assert abs(prices["000415.SZ"] - row["vwap_open2"]) < 1e-9
+    assert prices["000001.SZ"] == 1.0
@@ -0,0 +1,141 @@
+"""
+Test the vectorized performance metrics: hand-checked values on a small curve,
+batch (dates x runs) results equal to the single-curve API per run, the
+online (O(1) per day) accumulator agreeing with both, and the cumulative-sum
+rolling metrics agreeing with pandas .rolling().
+
+Run from project root: python -m pytest tests/test_performance_matrix.py -v
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from analysis.performance_matrix import (
+    TRADING_DAYS_PER_YEAR,
+    compute_performance_metrics,
+    compute_performance_metrics_batch,
+)
+from analysis.online_metrics import OnlinePerformanceMetrics
+from analysis.rolling_metrics import compute_rolling_metrics
+
+DATES = ["20250102", "20250103", "20250106", "20250107", "20250108"]
+
+
+def test_small_curve_by_hand():
+    equity = dict(zip(DATES, [100.0, 110.0, 99.0, 104.5, 120.0]))
+    bench = dict(zip(DATES, [10.0, 10.5, 10.0, 10.2, 11.0]))
+    m = compute_performance_metrics(equity, bench)
+
+    r = pd.Series([0.1, -0.1, 5.5 / 99.0, 15.5 / 104.5])
+    assert m["n_observations"] == 5
+    assert m["total_return"] == pytest.approx(0.2)
+    assert m["max_drawdown"] == pytest.approx(-11.0)
+    assert m["max_drawdown_pct"] == pytest.approx(-0.1)
+    assert m["max_drawdown_duration_periods"] == 2
+    assert m["win_rate"] == pytest.approx(0.75)
+    assert m["annualized_volatility"] == pytest.approx(r.std() * np.sqrt(TRADING_DAYS_PER_YEAR))
+    assert m["sharpe_ratio"] == pytest.approx(r.mean() * TRADING_DAYS_PER_YEAR / m["annualized_volatility"])
+
+    rb = pd.Series(bench).pct_change().dropna().to_numpy()
+    beta = np.cov(r, rb)[0, 1] / np.var(rb, ddof=1)
+    assert m["beta"] == pytest.approx(beta)
+    assert m["alpha_annualized"] == pytest.approx((r - beta * rb).mean() * TRADING_DAYS_PER_YEAR)
+
+
+def test_batch_matches_single_curve():
+    rng = np.random.default_rng(7)
+    dates = pd.bdate_range("2024-01-01", periods=300).strftime("%Y%m%d")
+    nav = pd.DataFrame(
+        1e7 * np.cumprod(1 + rng.normal(0.0005, 0.012, (len(dates), 6)), axis=0),
+        index=dates, columns=[f"run{i}" for i in range(6)],
+    )
+    nav["flat"] = 1e7
+    # benchmark on a shorter calendar: only common return dates are used
+    bench = dict(zip(dates[3:], 5000 * np.cumprod(1 + rng.normal(0, 0.01, len(dates) - 3))))
+
+    batch = compute_performance_metrics_batch(nav, benchmark=bench)
+    for run in nav.columns:
+        single = compute_performance_metrics(nav[run].to_dict(), benchmark=bench)
+        assert list(single) == list(batch.columns)
+        for key, value in single.items():
+            if isinstance(value, str):
+                assert batch.loc[run, key] == value
+            else:
+                assert batch.loc[run, key] == pytest.approx(value, nan_ok=True), (run, key)
+
+    assert np.isnan(batch.loc["flat", "sharpe_ratio"])
+    assert np.isnan(batch.loc["flat", "calmar_ratio"])
+
+
+def test_too_short_history():
+    assert compute_performance_metrics({"20250102": 1.0}) == {}
+
+
+def test_online_metrics_match_batch_at_every_step():
+    rng = np.random.default_rng(3)
+    dates = pd.bdate_range("2024-01-01", periods=120).strftime("%Y%m%d")
+    nav = 1e7 * np.cumprod(1 + rng.normal(0.0002, 0.01, len(dates)))
+    bench = dict(zip(dates[::2], 5000 * np.cumprod(1 + rng.normal(0, 0.01, len(dates[::2])))))
+
+    online = OnlinePerformanceMetrics(benchmark=bench)
+    for i, (d, v) in enumerate(zip(dates, nav)):
+        online.update(d, v)
+        if i in (0, 30, 60, len(dates) - 1):
+            snap = online.snapshot()
+            expected = compute_performance_metrics(dict(zip(dates[:i + 1], nav[:i + 1])), benchmark=bench)
+            if i == 0:
+                assert snap == expected == {}
+                continue
+            for key, value in snap.items():
+                if key in expected:
+                    assert value == pytest.approx(expected[key], rel=1e-9, nan_ok=True), (i, key)
+
+
+def test_online_metrics_streamed_benchmark():
+    rng = np.random.default_rng(5)
+    dates = pd.bdate_range("2024-01-01", periods=80).strftime("%Y%m%d")
+    nav = 1e7 * np.cumprod(1 + rng.normal(0.0002, 0.01, len(dates)))
+    closes = 5000 * np.cumprod(1 + rng.normal(0, 0.01, len(dates)))
+
+    streamed, preloaded = OnlinePerformanceMetrics(), OnlinePerformanceMetrics(benchmark=dict(zip(dates, closes)))
+    for d, v, c in zip(dates, nav, closes):
+        streamed.update(d, v, benchmark_close=c)
+        preloaded.update(d, v)
+    got, expected = streamed.snapshot(), preloaded.snapshot()
+    assert "beta" in got and "tracking_error_annualized" in got
+    for key, value in expected.items():
+        assert got[key] == pytest.approx(value, rel=1e-12, nan_ok=True), key
+
+
+def test_rolling_metrics_match_pandas_rolling():
+    rng = np.random.default_rng(11)
+    dates = pd.bdate_range("2023-01-02", periods=200).strftime("%Y%m%d")
+    nav = pd.DataFrame(
+        np.cumprod(1 + rng.normal(0.0003, 0.01, (len(dates), 3)), axis=0),
+        index=dates, columns=["a", "b", "c"],
+    )
+    bench = dict(zip(dates, 5000 * np.cumprod(1 + rng.normal(0, 0.01, len(dates)))))
+    rolling = compute_rolling_metrics(nav, windows=(20, 60), benchmark=bench)
+
+    r = nav["b"].pct_change().dropna()
+    rb = pd.Series(bench).pct_change().dropna()
+    for w in (20, 60):
+        got = rolling[(rolling["window"] == w) & (rolling["run"] == "b")].set_index("date")
+        assert len(got) == len(r) - w + 1
+        beta = r.rolling(w).cov(rb) / rb.rolling(w).var()
+        expected = pd.DataFrame({
+            "rolling_volatility": r.rolling(w).std() * np.sqrt(TRADING_DAYS_PER_YEAR),
+            "rolling_beta": beta,
+            "rolling_alpha": (r.rolling(w).mean() - beta * rb.rolling(w).mean()) * TRADING_DAYS_PER_YEAR,
+            "rolling_drawdown": nav["b"] / nav["b"].rolling(w + 1).max() - 1.0,
+        }).loc[got.index]
+        for col in expected.columns:
+            np.testing.assert_allclose(got[col].to_numpy(), expected[col].to_numpy(), rtol=1e-9, atol=1e-12)
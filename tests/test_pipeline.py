@@ -0,0 +1,167 @@
+"""
+Test the pipeline scheduler: dependencies from declared inputs / outputs,
+concurrent independent steps, content-hash skipping, --force and failures,
+the in-process runner, the shared config cache and run.py's step graph.
+
+Run from project root: python -m pytest tests/test_pipeline.py -v
+"""
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from utils.pipeline import BLOCKED, FAILED, RAN, SKIPPED, Step, resolve_dependencies, run_pipeline
+
+# stock pool (read by a and b) lives next to the bars a writes
+STEPS = [
+    Step("a", "a", "a.py", inputs=("data/stock/pool.txt",), outputs=("data/stock/*.parquet",)),
+    Step("b", "b", "b.py", inputs=("data/stock/pool.txt",), outputs=("data/index",)),
+    Step("c", "c", "c.py", inputs=("data/stock/*.parquet",), outputs=("data/stock/*.parquet",)),
+    Step("d", "d", "d.py", inputs=("data/stock", "data/index"), outputs=("out/report.txt",)),
+]
+
+
+class _Runner:
+    """Writes each step's outputs in-process and records calls / concurrency."""
+
+    def __init__(self, fail=()):
+        self.calls, self.fail, self.active, self.max_active = [], set(fail), 0, 0
+        self.lock = threading.Lock()
+
+    def __call__(self, step, root):
+        with self.lock:
+            self.calls.append(step.name)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.05)
+        for out in step.outputs:
+            path = root / out.replace("*", step.name)
+            if not path.suffix:
+                path = path / "x.csv"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(f"{step.name}")
+        with self.lock:
+            self.active -= 1
+        return 1 if step.name in self.fail else 0
+
+
+@pytest.fixture
+def root(tmp_path):
+    for s in STEPS:
+        (tmp_path / s.script).write_text("pass\n")
+    (tmp_path / "data" / "stock").mkdir(parents=True)
+    (tmp_path / "data" / "stock" / "pool.txt").write_text("000001.SZ\n")
+    return tmp_path
+
+
+def test_dependencies_from_inputs_and_outputs():
+    deps = resolve_dependencies(STEPS)
+    assert deps == {"a": set(), "b": set(), "c": {"a"}, "d": {"a", "b", "c"}}
+
+
+def test_parallel_then_skip_then_rerun_on_change(root):
+    state = root / "state.json"
+    runner = _Runner()
+    status = run_pipeline(STEPS, root, state, max_workers=4, runner=runner)
+    assert set(status.values()) == {RAN}
+    assert runner.max_active == 2  # a and b together
+    assert runner.calls.index("d") == 3 and runner.calls.index("c") > runner.calls.index("a")
+
+    runner = _Runner()
+    assert set(run_pipeline(STEPS, root, state, runner=runner).values()) == {SKIPPED}
+    assert runner.calls == []
+
+    (root / "b.py").write_text("print('changed')\n")  # b reruns with the same output -> d still skipped
+    status = run_pipeline(STEPS, root, state, runner=runner)
+    assert status == {"a": SKIPPED, "b": RAN, "c": SKIPPED, "d": SKIPPED}
+
+    (root / "data" / "stock" / "pool.txt").write_text("000002.SZ\n")
+    (root / "out" / "report.txt").unlink()
+    status = run_pipeline(STEPS, root, state, force=["c"], runner=runner)
+    assert status == {"a": RAN, "b": RAN, "c": RAN, "d": RAN}
+
+
+def test_always_run_step_is_never_skipped(root):
+    steps = [Step("a", "a", "a.py", inputs=("data/stock/pool.txt",), outputs=("data/stock/*.parquet",),
+                  always_run=True), *STEPS[1:]]
+    state = root / "state.json"
+    run_pipeline(steps, root, state, runner=_Runner())
+    runner = _Runner()
+    status = run_pipeline(steps, root, state, runner=runner)
+    # a reran with the same outputs -> its dependents stay skipped
+    assert status == {"a": RAN, "b": SKIPPED, "c": SKIPPED, "d": SKIPPED}
+    assert runner.calls == ["a"]
+
+
+def test_failure_blocks_dependents(root):
+    runner = _Runner(fail={"a"})
+    status = run_pipeline(STEPS, root, root / "state.json", max_workers=1, runner=runner)
+    assert status["a"] == FAILED and status["d"] == BLOCKED and status["c"] == BLOCKED
+    with pytest.raises(ValueError):
+        run_pipeline(STEPS, root, root / "state.json", force=["nope"], runner=runner)
+
+
+def test_run_script_streams_prefixed_output(root, capsys):
+    from utils.pipeline import run_script
+
+    (root / "a.py").write_text("print('收集完成')\nraise SystemExit(3)\n", encoding="utf-8")
+    assert run_script(STEPS[0], root) == 3
+    assert "[a] 收集完成" in capsys.readouterr().out
+
+
+def test_run_module_calls_main_in_process(root, capsys):
+    from utils.pipeline import run_module
+
+    (root / "a.py").write_text(
+        "import sys\n\ndef main():\n    print('第一行')\n    print('partial', end='')\n"
+        "    sys.modules['_pipeline_test_marker'] = True\n", encoding="utf-8")
+    (root / "b.py").write_text("def main():\n    raise RuntimeError('boom')\n")
+    (root / "c.py").write_text("def main():\n    raise SystemExit(2)\n")
+    try:
+        assert run_module(STEPS[0], root) == 0
+        assert sys.modules.pop("_pipeline_test_marker")  # ran in this interpreter
+        assert run_module(STEPS[1], root) == 1
+        assert run_module(STEPS[2], root) == 2
+    finally:
+        sys.stdout = sys.stdout.stream if hasattr(sys.stdout, "stream") else sys.stdout
+    out = capsys.readouterr()
+    assert "[a] 第一行\n[a] partial\n" in out.out
+    assert "[b] RuntimeError: boom" in out.out + out.err
+
+
+def test_partitioned_layout_rebuilds_the_dataset_before_main():
+    pytest.importorskip("yaml")
+    pytest.importorskip("pandas")
+    import copy
+
+    from run import build_steps
+    from utils.config import load_paths
+
+    paths = copy.deepcopy(load_paths())
+    stock = paths["level1"]["daily"]["stock"]
+    stock["layout"] = "per_stock"
+    assert "daily_partition" not in {s.name for s in build_steps(paths)}
+    stock["layout"] = "partitioned"
+    deps = resolve_dependencies(build_steps(paths))
+    assert deps["daily_partition"] == {"daily_data", "st_fill"}
+    assert "daily_partition" in deps["main"]
+
+
+def test_config_cache_reloads_on_change(tmp_path):
+    from utils.config import load_json
+
+    path = tmp_path / "fees.json"
+    path.write_text('{"min_fee": 5}')
+    first = load_json(path)
+    assert load_json(path) is first
+    st = path.stat()
+    path.write_text('{"min_fee": 0.1}')
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))  # mtime granularity on some filesystems
+    assert load_json(path) == {"min_fee": 0.1}
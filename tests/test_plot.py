@@ -0,0 +1,53 @@
+"""
+Test the equity curve plot: LTTB downsampling keeps the endpoints and extremes,
+importing analysis.plot does not import matplotlib, and a downsampled chart
+renders with the Agg backend.
+
+Run from project root: python -m pytest tests/test_plot.py -v
+"""
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from analysis.plot import lttb_indices, plot_equity_curve
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    rng = np.random.default_rng(5)
+    y = np.cumsum(rng.normal(0, 1, 5000))
+    y[1234] += 500.0
+    y[3210] -= 500.0
+    idx = lttb_indices(y, 200)
+    assert len(idx) == 200
+    assert idx[0] == 0 and idx[-1] == len(y) - 1
+    assert np.all(np.diff(idx) > 0)
+    assert 1234 in idx and 3210 in idx
+    np.testing.assert_array_equal(lttb_indices(y[:50], 200), np.arange(50))
+
+
+def test_plot_module_imports_matplotlib_lazily():
+    code = "import sys; import analysis.plot; print('matplotlib' in sys.modules)"
+    res = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    assert res.stdout.strip() == "False"
+
+
+def test_plot_downsampled_renders(tmp_path):
+    pytest.importorskip("matplotlib")
+    import pandas as pd
+
+    dates = pd.bdate_range("2015-01-05", periods=3000).strftime("%Y%m%d")
+    rng = np.random.default_rng(2)
+    equity = dict(zip(dates, 1e7 * np.cumprod(1 + rng.normal(0.0004, 0.01, len(dates)))))
+    bench = dict(zip(dates, 5000 * np.cumprod(1 + rng.normal(0.0002, 0.01, len(dates)))))
+    out = tmp_path / "equity.png"
+    plot_equity_curve(equity, benchmark=bench, title="t", save_path=out, dpi=60, max_points=500)
+    assert out.stat().st_size > 0
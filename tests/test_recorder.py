@@ -0,0 +1,59 @@
+"""
+Test the columnar per-day recorder: typed columns, growth past the preallocated
+size, extra fields with missing values, and list-of-dict compatible access.
+
+Run from project root: python -m pytest tests/test_recorder.py -v
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from analysis.diagnostic import get_daily_df
+from backtest.recorder import DAILY_FIELDS, EXCLUSION_FIELDS, DailyRecorder
+
+
+def _day(i):
+    return {
+        "date": f"202501{i + 1:02d}", "day_type": "hold", "cash_start": 100.0 + i, "buy_cost": 0.0,
+        "sell_proceeds": 0.0, "liabilities_today": 0.5, "accumulated_liabilities": 0.5 * (i + 1),
+        "liabilities_paid": 0.0, "cash_end": 100.0 + i, "market_value": 900.0, "nav": 1000.0 + i,
+        "positions": 10,
+    }
+
+
+def test_recorder_matches_list_of_dicts(tmp_path):
+    days = [_day(i) for i in range(7)]
+    rec = DailyRecorder(3, extra_fields=EXCLUSION_FIELDS)  # grows past 3
+    for i, d in enumerate(days):
+        rec.append({**d, "stuck_suspension": i % 2} if i else d)
+
+    assert len(rec) == 7
+    df = rec.to_frame()
+    assert list(df.columns) == list(DAILY_FIELDS) + list(EXCLUSION_FIELDS)
+    assert df["positions"].dtype == np.int32
+    pd.testing.assert_frame_equal(
+        df[list(DAILY_FIELDS)].astype({"positions": "int64"}), pd.DataFrame(days), check_dtype=False)
+    assert list(df["stuck_suspension"]) == [0, 1, 0, 1, 0, 1, 0]
+    assert rec[-1]["nav"] == 1006.0 and [r["date"] for r in rec] == [d["date"] for d in days]
+
+    class _E:
+        _daily_records = rec
+    pd.testing.assert_frame_equal(get_daily_df(_E), df)
+
+    rec.to_parquet(tmp_path / "daily.parquet")
+    pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / "daily.parquet"), df, check_dtype=False)
+
+
+def test_recorder_rejects_unknown_field():
+    rec = DailyRecorder(1)
+    with pytest.raises(KeyError):
+        rec.append({"not_a_field": 1})
+    assert not rec and get_daily_df(type("E", (), {"_daily_records": rec})) is None
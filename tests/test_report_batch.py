@@ -0,0 +1,61 @@
+"""
+Test the parallel batch reports: every run gets its report files, the
+comparison table matches the single-run metrics, and BacktestResult can be
+sent to worker processes.
+
+Run from project root: python -m pytest tests/test_report_batch.py -v
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from analysis.performance_matrix import compute_performance_metrics
+from analysis.report_batch import DEFAULT_SUFFIXES, run_report_batch
+from backtest.result import AccountSnapshot, BacktestResult
+
+
+def _result(name, seed, n_days):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2024-01-02", periods=n_days).strftime("%Y%m%d")
+    nav = 1e7 * np.cumprod(1 + rng.normal(0.0005, 0.01, n_days))
+    diag = {
+        "total_buy_cost": 1e7, "total_sell_proceeds": 9.9e6, "total_liabilities": 1e4,
+        "buy_days": 4, "sell_days": 4, "excluded_suspended": 1, "excluded_upper_limit": 0,
+        "stuck_limit_down": [(dates[10], "000001.SZ")], "stuck_suspension": [],
+    }
+    records = [{"date": d, "nav": v} for d, v in zip(dates, nav)]
+    return BacktestResult(name, dict(zip(dates, nav)), diag, records,
+                          AccountSnapshot(cash=1e5, market_value=nav[-1] - 1e5, NAV=nav[-1]))
+
+
+def test_report_batch_writes_all_runs(tmp_path):
+    results = [_result(f"run{i}", i, 120 if i < 3 else 80) for i in range(4)]
+    dates = list(results[0].equity_history)
+    benchmark = dict(zip(dates, 5000 + np.arange(len(dates), dtype=float)))
+
+    table = run_report_batch(results, tmp_path, benchmark=benchmark, max_workers=2, plot=False)
+
+    for r in results:
+        for key in ("diagnostic_log", "diagnostic_daily_csv", "performance_summary"):
+            assert (tmp_path / f"{r.name}_{DEFAULT_SUFFIXES[key]}").exists()
+        assert not (tmp_path / f"{r.name}_{DEFAULT_SUFFIXES['plot_equity']}").exists()
+    assert (tmp_path / "index.html").read_text(encoding="utf-8").count("<tr>") == 1 + len(results)
+    assert list(pd.read_csv(tmp_path / "comparison.csv")["run"]) == [r.name for r in results]
+
+    for r in results:
+        single = compute_performance_metrics(r.equity_history, benchmark=benchmark)
+        for key in ("total_return", "sharpe_ratio", "max_drawdown_pct", "beta"):
+            assert table.loc[r.name, key] == pytest.approx(single[key], rel=1e-12)
+
+
+def test_report_batch_rejects_duplicate_names(tmp_path):
+    with pytest.raises(ValueError):
+        run_report_batch([_result("a", 0, 30), _result("a", 1, 30)], tmp_path, max_workers=1)
@@ -0,0 +1,97 @@
+"""
+Test the backtest result cache: keys change with every input that changes a
+result, stored results round-trip, hits are reported and eviction is LRU by size.
+
+Run from project root: python -m pytest tests/test_result_cache.py -v
+"""
+import os
+import sys
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from account.liability import LiabilityFeeSchedule
+from backtest.result import AccountSnapshot, BacktestResult
+from backtest.result_cache import ResultCache, code_version, result_key
+from utils.中证500指增_LGBM.fees import BuyFeeSchedule, SellFeeSchedule
+from utils.中证500指增_LGBM.中证500指增_LGBM_data_loader import market_data_version
+
+BUY = BuyFeeSchedule(commission_rate=0.00025, csrc_fee_rate=0.00002, handling_fee_rate=0.0000341,
+                     transfer_fee_rate_sh=0.00001, min_fee=5.0)
+SELL = SellFeeSchedule(commission_rate=0.00025, csrc_fee_rate=0.00002, handling_fee_rate=0.0000341,
+                       stamp_tax_rate=0.0005, transfer_fee_rate_sh=0.00001, min_fee=5.0)
+LIAB = LiabilityFeeSchedule(management_fee_rate=0.0001, custodian_fee_rate=0.00001,
+                            administration_services_fee_rate=0.000005, tax_fee_rate=0.1)
+PORTFOLIO = pd.DataFrame({"Name": ["600001.SH", "000002.SZ"], "daily_date": ["20250106", "20250106"]})
+
+
+def _result(name, n_days=50):
+    nav = 1e7 * np.cumprod(1 + np.random.default_rng(0).normal(0, 0.01, n_days))
+    dates = pd.bdate_range("2025-01-02", periods=n_days).strftime("%Y%m%d")
+    return BacktestResult(name=name, equity_history=dict(zip(dates, nav)), _diag={"buy_days": 3}, _daily_records=[],
+                          account=AccountSnapshot(cash=1.0, market_value=0.0, NAV=1.0))
+
+
+def test_key_depends_on_every_input():
+    base = result_key(PORTFOLIO, "m1", BUY, SELL, LIAB, 1e7, code="c1", market_layout="per_stock")
+    assert base == result_key(PORTFOLIO.copy(), "m1", BUY, SELL, LIAB, 1e7, code="c1", market_layout="per_stock")
+    changed = PORTFOLIO.assign(Name=["600001.SH", "000003.SZ"])
+    variants = [
+        result_key(changed, "m1", BUY, SELL, LIAB, 1e7, code="c1", market_layout="per_stock"),
+        result_key(PORTFOLIO, "m2", BUY, SELL, LIAB, 1e7, code="c1", market_layout="per_stock"),
+        result_key(PORTFOLIO, "m1", replace(BUY, min_fee=0.1), SELL, LIAB, 1e7, code="c1", market_layout="per_stock"),
+        result_key(PORTFOLIO, "m1", BUY, SELL, LIAB, 2e7, code="c1", market_layout="per_stock"),
+        result_key(PORTFOLIO, "m1", BUY, SELL, LIAB, 1e7, code="c2", market_layout="per_stock"),
+        result_key(PORTFOLIO, "m1", BUY, SELL, LIAB, 1e7, code="c1", market_layout="partitioned"),
+    ]
+    assert len({base, *variants}) == 7
+    assert code_version() == code_version()
+
+
+def test_market_data_version_tracks_relevant_files(tmp_path):
+    for code in ("600001.SH", "000002.SZ", "000003.SZ"):
+        pd.DataFrame({"close": [1.0]}).to_parquet(tmp_path / f"{code}.parquet")
+    stocks = ["600001.SH", "000002.SZ"]
+    v1, all1 = market_data_version(tmp_path, stock_list=stocks), market_data_version(tmp_path)
+    pd.DataFrame({"close": [1.0, 2.0]}).to_parquet(tmp_path / "000003.SZ.parquet")
+    assert market_data_version(tmp_path, stock_list=stocks) == v1  # not in the portfolio
+    assert market_data_version(tmp_path) != all1
+    pd.DataFrame({"close": [1.0, 2.0]}).to_parquet(tmp_path / "000002.SZ.parquet")
+    assert market_data_version(tmp_path, stock_list=stocks) != v1
+
+
+def test_run_stores_then_hits(tmp_path, capsys):
+    cache = ResultCache(tmp_path)
+    calls = []
+
+    def run():
+        calls.append(1)
+        return _result("a")
+
+    first, hit = cache.run("k1", run)
+    assert not hit and "miss" in capsys.readouterr().out
+    second, hit = cache.run("k1", run)
+    assert hit and len(calls) == 1 and "cache hit" in capsys.readouterr().out
+    assert second.equity_history == first.equity_history and second._diag == first._diag
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lru_eviction_by_size(tmp_path):
+    cache = ResultCache(tmp_path)
+    for i, key in enumerate(["old", "used", "new"]):
+        cache.put(key, _result(key))
+        os.utime(tmp_path / f"{key}.pkl", ns=(0, (i + 1) * 10**9))
+    cache.get("used")  # now the most recently used
+    size = (tmp_path / "new.pkl").stat().st_size
+    cache.max_bytes = 2 * size + 10
+    assert cache.evict() == 1
+    assert sorted(p.stem for p in tmp_path.glob("*.pkl")) == ["new", "used"]
@@ -0,0 +1,73 @@
+"""
+Test the SQLite run registry: registered runs round-trip (metadata, config,
+metrics, NAV), list_runs filters / orders in SQL, and nav_matrix aligns runs.
+
+Run from project root: python -m pytest tests/test_run_registry.py -v
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from analysis.performance_matrix import compute_performance_metrics
+from analysis.run_registry import RunRegistry
+
+
+def _equity(seed, start="2024-01-02", n_days=120):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start, periods=n_days).strftime("%Y%m%d")
+    return dict(zip(dates, 1e7 * np.cumprod(1 + rng.normal(0.0005, 0.01, n_days))))
+
+
+@pytest.fixture
+def registry(tmp_path):
+    reg = RunRegistry(tmp_path / "runs.sqlite")
+    for i in range(3):
+        reg.register(_equity(i), name=f"lgbm_{i}", strategy="中证500指增_LGBM", config={"seed": i, "名称": "全A"})
+    reg.register(_equity(9, start="2024-02-01"), name="other", strategy="x")
+    return reg
+
+
+def test_register_round_trip(registry):
+    runs = registry.list_runs(name="lgbm_1")
+    assert len(runs) == 1
+    run_id = int(runs.index[0])
+    expected = compute_performance_metrics(_equity(1))
+    assert runs.loc[run_id, "sharpe_ratio"] == pytest.approx(expected["sharpe_ratio"])
+    assert runs.loc[run_id, "start_date"] == expected["start_date"].replace("-", "")
+    assert registry.config(run_id) == {"seed": 1, "名称": "全A"}
+    nav = registry.nav(run_id)
+    assert nav.to_dict() == pytest.approx(_equity(1))
+
+
+def test_list_runs_order_and_filters(registry):
+    by_sharpe = registry.list_runs(strategy="中证500指增_LGBM", order_by="sharpe_ratio", metrics=["sharpe_ratio"])
+    assert list(by_sharpe.columns[-1:]) == ["sharpe_ratio"] and len(by_sharpe) == 3
+    assert by_sharpe["sharpe_ratio"].is_monotonic_decreasing
+    assert len(registry.list_runs(order_by="total_return", limit=2)) == 2
+    assert registry.list_runs(name="nope%").empty
+    picked = by_sharpe.index[:2].tolist()
+    assert sorted(registry.list_runs(run_ids=picked).index) == sorted(picked)
+
+
+def test_nav_matrix_alignment_and_latest_name(registry):
+    inner = registry.nav_matrix(["lgbm_0", "other"])
+    assert inner.index[0] == "20240201" and inner.notna().all().all()
+    outer = registry.nav_matrix(["lgbm_0", "other"], how="outer", normalize=True)
+    assert outer.index[0] == "20240102" and outer.notna().all(axis=1).sum() == len(inner)
+    assert outer["lgbm_0"].iloc[0] == 1.0
+
+    newer = registry.register(_equity(5), name="lgbm_0")  # a name resolves to its latest run
+    assert registry.nav("lgbm_0").equals(registry.nav(newer))
+    both = registry.nav_matrix([newer - 4, newer])  # ids of the same name get distinct columns
+    assert list(both.columns) == ["lgbm_0", f"lgbm_0#{newer}"]
+    registry.delete([newer])
+    with pytest.raises(KeyError):
+        registry.nav(newer)
@@ -0,0 +1,74 @@
+"""
+Test the local backtest service end to end over localhost HTTP: queued runs on
+the shared session return the same results as a direct session run, as Arrow
+tables, and bad requests are rejected.
+
+Run from project root: python -m pytest tests/test_service.py -v
+"""
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+pytest.importorskip("yaml")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from backtest.service import BacktestClient, BacktestService, from_arrow, serve, to_arrow
+from backtest.session import BacktestSession
+from test_session import SYMBOLS, _dataset, _portfolio
+
+
+@pytest.fixture
+def running(tmp_path):
+    paths, dates = _dataset(tmp_path)
+    session = BacktestSession(paths, root=tmp_path)
+    service = BacktestService(session, workers=2).start()
+    server = serve(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield session, dates, BacktestClient(f"http://127.0.0.1:{server.server_address[1]}", timeout=30)
+    server.shutdown()
+    server.server_close()
+    service.stop()
+
+
+def test_arrow_round_trip():
+    df = _portfolio(pd.bdate_range("2025-01-02", periods=5), [SYMBOLS[:3]])
+    back = from_arrow(to_arrow(df))
+    pd.testing.assert_frame_equal(back, df, check_dtype=False)
+
+
+def test_runs_match_session(running):
+    session, dates, client = running
+    portfolios = [_portfolio(dates, [SYMBOLS[0:4], SYMBOLS[2:6]]), _portfolio(dates, [SYMBOLS[6:10], SYMBOLS[1:5]])]
+    jobs = [client.submit(df, name=f"p{i}", initial_cash=5e6) for i, df in enumerate(portfolios)]
+    results = [client.result(job) for job in jobs]
+
+    for df, result, job in zip(portfolios, results, jobs):
+        direct = session.run(df, initial_cash=5e6)
+        assert result.equity_history == pytest.approx(direct.equity_history, rel=0, abs=1e-9)
+        assert result._diag["buy_days"] == direct._diag["buy_days"]
+        assert result.account.NAV == pytest.approx(direct.account.NAV)
+        pd.testing.assert_frame_equal(result._daily_records.to_frame(), direct._daily_records.to_frame())
+        pd.testing.assert_frame_equal(result.ledger.to_frame(), direct.ledger.to_frame())
+    assert results[0].name == "p0"
+    health = client.health()
+    assert health["workers"] == 2 and health["panel"]["symbols"] == 10
+
+
+def test_errors(running):
+    _, _, client = running
+    with pytest.raises(RuntimeError, match="404"):
+        client.status(999)
+    with pytest.raises(RuntimeError, match="400"):
+        client._request("/runs", b"not arrow", "application/octet-stream")
+    bad = client.submit(pd.DataFrame({"Name": ["600001.SH"]}))
+    with pytest.raises(RuntimeError, match="failed"):
+        client.result(bad)
@@ -0,0 +1,177 @@
+"""
+Test the warm BacktestSession: runs on the resident market panel match a plain
+engine run, repeated runs read no market files, a portfolio with new stocks
+only loads those, rewritten bar files are reloaded and a zero value in a bar
+file is rejected as in main.py, and the engine streams the benchmark into its
+online metrics.
+
+Run from project root: python -m pytest tests/test_session.py -v
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+pytest.importorskip("yaml")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import backtest.session as session_module
+from backtest.engine import 中证500指增_LGBM_BacktestEngine
+from backtest.session import BacktestSession
+from utils.中证500指增_LGBM.中证500指增_LGBM_data_loader import get_benchmark_series
+
+SYMBOLS = [f"{600000 + i:06d}.SH" if i % 2 else f"{i + 1:06d}.SZ" for i in range(12)]
+
+
+def _dataset(root):
+    rng = np.random.default_rng(3)
+    dates = pd.bdate_range("2025-01-02", periods=25)
+    (root / "stock").mkdir()
+    (root / "index").mkdir()
+    for code in SYMBOLS:
+        close = np.round(10 * np.exp(np.cumsum(rng.normal(0, 0.02, len(dates)))), 2)
+        open_ = np.round(close * (1 + rng.normal(0, 0.005, len(dates))), 2)
+        pd.DataFrame({"open": open_, "high": np.maximum(open_, close), "low": np.minimum(open_, close),
+                      "close": close, "volume": 5000.0, "amount": close * 5000},
+                     index=dates.strftime("%Y%m%d")).to_parquet(root / "stock" / f"{code}.parquet")
+    pd.DataFrame({"close": 5000 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates))))},
+                 index=dates.strftime("%Y%m%d")).to_parquet(root / "index" / "000905.SH.parquet")
+    for name in ("stock_trade_fees.json", "liability_fee.json"):
+        (root / name).write_bytes((PROJECT_ROOT / "config" / name).read_bytes())
+    paths = {
+        "level1": {"daily": {"stock": {"base_dir": "stock", "layout": "per_stock"}, "index": {"base_dir": "index"}}},
+        "config": {"stock_trade_fees": "stock_trade_fees.json", "liability_fee": "liability_fee.json"},
+    }
+    return paths, dates
+
+
+def _portfolio(dates, picks):
+    rows = []
+    for w, pick in enumerate(picks):
+        week = dates[5 * w:5 * w + 5]
+        for i, d in enumerate(week):
+            for code in pick:
+                rows.append(dict(Date=week[0] - pd.Timedelta(days=3), Name=code, week_end=week[-1], daily_date=d,
+                                 first_trading_day=int(i == 0), last_trading_day=int(i == len(week) - 1),
+                                 UpperLimit=1e9, LowerLimit=0.0, 停牌起始日期=0, 停牌结束日期=0, 停牌结束最后交易日=np.nan))
+    return pd.DataFrame(rows)
+
+
+def _count_loads(monkeypatch):
+    loads = []
+    real = session_module.load_market_panel
+
+    def load(stock_list, *args, **kwargs):
+        loads.append(list(stock_list))
+        return real(stock_list, *args, **kwargs)
+
+    monkeypatch.setattr(session_module, "load_market_panel", load)
+    return loads
+
+
+def test_session_run_matches_engine(tmp_path):
+    paths, dates = _dataset(tmp_path)
+    df = _portfolio(dates, [SYMBOLS[0:4], SYMBOLS[2:6], SYMBOLS[4:8], SYMBOLS[1:5]])
+    session = BacktestSession(paths, root=tmp_path)
+    result = session.run(df, name="warm")
+
+    engine = 中证500指增_LGBM_BacktestEngine(
+        df_expanded=df, market_path=str(tmp_path / "stock"), initial_cash=10000000,
+        buy_fee_schedule=session.buy_fee_schedule, sell_fee_schedule=session.sell_fee_schedule,
+        liability_fee_schedule=session.liability_fee_schedule)
+    engine.run()
+    assert result.name == "warm"
+    assert result.equity_history == pytest.approx(engine.equity_history, rel=0, abs=1e-9)
+    assert result._diag == engine._diag
+    assert session.calendar == list(dates.strftime("%Y%m%d"))
+    assert session.benchmark(session.calendar[3:9]) == get_benchmark_series(session.calendar[3:9], "000905.SH",
+                                                                            str(tmp_path / "index"))
+
+
+def test_panel_stays_resident_and_grows_by_new_stocks(tmp_path, monkeypatch):
+    paths, dates = _dataset(tmp_path)
+    loads = _count_loads(monkeypatch)
+    session = BacktestSession(paths, root=tmp_path)
+    df = _portfolio(dates, [SYMBOLS[0:4], SYMBOLS[2:6]])
+
+    first = session.run(df)
+    again = session.run(df, initial_cash=5000000)
+    assert len(loads) == 1 and len(session.panel.dates) == 10  # the calendar range of the portfolio, loaded once
+    assert again.equity_history != first.equity_history
+
+    other = _portfolio(dates, [SYMBOLS[0:4], SYMBOLS[8:12]])
+    session.run(other)
+    assert loads[1] == SYMBOLS[8:12]
+    assert set(session.panel.symbols) == set(SYMBOLS[0:6] + SYMBOLS[8:12])
+    assert session.run(df).equity_history == first.equity_history
+    assert len(loads) == 2
+
+
+def test_rewritten_bars_reload_the_panel(tmp_path, monkeypatch):
+    paths, dates = _dataset(tmp_path)
+    loads = _count_loads(monkeypatch)
+    session = BacktestSession(paths, root=tmp_path)
+    df = _portfolio(dates, [SYMBOLS[0:4], SYMBOLS[2:6]])
+    first = session.run(df)
+
+    path = tmp_path / "stock" / f"{SYMBOLS[0]}.parquet"
+    bars = pd.read_parquet(path)
+    bars[["open", "close"]] *= 1.1  # e.g. a re-collection with corrected prices
+    st = path.stat()
+    bars.to_parquet(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))  # mtime granularity on some filesystems
+
+    rerun = session.run(df)
+    assert len(loads) == 2 and set(loads[1]) == set(SYMBOLS[0:6])
+    assert session.panel.market_data([SYMBOLS[0]], dates[0].strftime("%Y%m%d"))[SYMBOLS[0]]["close"] == pytest.approx(
+        bars["close"].iloc[0])
+    assert rerun.equity_history != first.equity_history
+    session.run(df)
+    assert len(loads) == 2  # unchanged files: no reload
+
+
+def test_zero_volume_bar_raises_like_main(tmp_path):
+    paths, dates = _dataset(tmp_path)
+    path = tmp_path / "stock" / f"{SYMBOLS[1]}.parquet"
+    bars = pd.read_parquet(path)
+    bars.loc[bars.index[-1], "volume"] = 0.0  # a later day than the portfolio covers
+    bars.to_parquet(path)
+
+    session = BacktestSession(paths, root=tmp_path)
+    assert session.market_columns is None
+    with pytest.raises(ValueError, match=SYMBOLS[1]):
+        session.run(_portfolio(dates, [SYMBOLS[0:4]]))
+
+
+def test_engine_streams_benchmark_into_online_metrics(tmp_path):
+    from analysis.online_metrics import OnlinePerformanceMetrics
+    from analysis.performance_matrix import compute_performance_metrics
+
+    paths, dates = _dataset(tmp_path)
+    df = _portfolio(dates, [SYMBOLS[0:4], SYMBOLS[2:6], SYMBOLS[4:8], SYMBOLS[1:5]])
+    session = BacktestSession(paths, root=tmp_path)
+    online = OnlinePerformanceMetrics()  # no benchmark history up front
+    engine = 中证500指增_LGBM_BacktestEngine(
+        df_expanded=df, market_path=str(tmp_path / "stock"), initial_cash=10000000,
+        buy_fee_schedule=session.buy_fee_schedule, sell_fee_schedule=session.sell_fee_schedule,
+        liability_fee_schedule=session.liability_fee_schedule, online_metrics=online,
+        benchmark_close=session.benchmark_close)
+    engine.run()
+
+    benchmark = get_benchmark_series(list(engine.equity_history), "000905.SH", str(tmp_path / "index"))
+    expected = compute_performance_metrics(engine.equity_history, benchmark=benchmark)
+    got = online.snapshot()
+    assert np.isfinite(got["beta"])
+    for key in ("beta", "alpha_annualized", "tracking_error_annualized", "information_ratio"):
+        assert got[key] == pytest.approx(expected[key], rel=1e-9), key
+
+    via_session = OnlinePerformanceMetrics()
+    session.run(df, online_metrics=via_session)
+    assert via_session.snapshot()["beta"] == pytest.approx(got["beta"], rel=1e-12)
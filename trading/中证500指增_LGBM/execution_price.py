@@ -0,0 +1,238 @@
+"""
+Execution price models: the per-day fill price used for buys and sells.
+
+- OpenPriceModel / ClosePriceModel: daily bar open / close (the original behaviour)
+- MinuteVWAPModel: volume-weighted close over the full day or a minute window
+- MinuteTWAPModel: mean close over a minute window (e.g. our first-30-minute TWAP)
+- FeatureVWAPModel: VWAP columns from the precomputed daily feature store
+  (utils/minute/daily_features.py), no minute bars read at backtest time
+
+Minute models compute prices for every symbol of a day in one vectorized pass
+over the MinutePanel, and prepare(dates) fills the cache for all buy/sell days
+before the daily loop. Each model instance has its own LRU cache of at most
+max_cached_days days, keyed by (data version, date): prepare() re-reads the
+version of the minute store / feature files (a manifest of file sizes and
+mtimes), so a model kept resident across runs (BacktestSession, the service)
+serves new prices after the data is rebuilt. Symbols without minute bars on a
+day fall back to the daily bar (open for buys, close for sells).
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+FALLBACK_FIELD = {"buy": "open", "sell": "close"}
+MAX_CACHED_DAYS = 2500  # ~10 years of trading days per model
+
+
+class ExecutionPriceModel:
+    name = "base"
+
+    @property
+    def cache_key(self) -> str:
+        return self.name
+
+    def prepare(self, dates: Iterable[str]) -> None:
+        """Precompute prices for all dates ('YYYYMMDD') before the daily loop. No-op for daily bar models."""
+
+    def get_prices(self, date_str: str, symbols: List[str], market_data_today: dict, side: str) -> Dict[str, float]:
+        """Fill price per symbol for one day. side: 'buy' or 'sell'."""
+        raise NotImplementedError
+
+
+class DailyBarPriceModel(ExecutionPriceModel):
+    def __init__(self, field: str):
+        self.field = field
+        self.name = field
+
+    def get_prices(self, date_str, symbols, market_data_today, side):
+        return {s: market_data_today[s][self.field] for s in symbols}
+
+
+class OpenPriceModel(DailyBarPriceModel):
+    def __init__(self):
+        super().__init__("open")
+
+
+class ClosePriceModel(DailyBarPriceModel):
+    def __init__(self):
+        super().__init__("close")
+
+
+class _DayPriceCache:
+    """Bounded LRU of {symbol: price} per (data version, 'YYYYMMDD'); thread-safe (service workers share models)."""
+
+    def __init__(self, max_days: int = MAX_CACHED_DAYS):
+        self.max_days = max_days
+        self._days: "OrderedDict[Tuple[str, str], Dict[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key) -> bool:
+        return key in self._days
+
+    def get(self, key) -> Optional[Dict[str, float]]:
+        with self._lock:
+            day = self._days.get(key)
+            if day is not None:
+                self._days.move_to_end(key)
+            return day
+
+    def put(self, key, day: Dict[str, float]) -> None:
+        with self._lock:
+            self._days[key] = day
+            self._days.move_to_end(key)
+            while len(self._days) > self.max_days:
+                self._days.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._days.clear()
+
+    def __len__(self) -> int:
+        return len(self._days)
+
+
+class _MinutePriceModel(ExecutionPriceModel):
+    """Shared window handling, batch precompute and cache for minute-bar models."""
+
+    def __init__(self, minute_store, start: Optional[str] = None, end: Optional[str] = None,
+                 first_n_minutes: Optional[int] = None, max_cached_days: int = MAX_CACHED_DAYS):
+        self.minute_store = minute_store
+        self.start = start
+        self.end = end
+        self.first_n_minutes = first_n_minutes
+        self.cache = _DayPriceCache(max_cached_days)
+        self._version = None
+
+    @property
+    def cache_key(self) -> str:
+        return f"{self.name}|{self.minute_store.ipc_dir}|{self.start}|{self.end}|{self.first_n_minutes}"
+
+    def _day_prices(self, panel) -> np.ndarray:
+        """One price per panel symbol (NaN if no usable bars). Arrays are (symbols x minutes)."""
+        raise NotImplementedError
+
+    def _window(self, panel, field: str) -> np.ndarray:
+        arr = panel[field]
+        if self.first_n_minutes is not None:
+            arr = arr[:, :self.first_n_minutes]
+        return arr
+
+    def _store_day(self, panel) -> Dict[str, float]:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            prices = self._day_prices(panel)
+        day = {s: float(p) for s, p in zip(panel.symbols, prices) if np.isfinite(p) and p > 0}
+        self.cache.put((self._version, panel.date), day)
+        return day
+
+    def prepare(self, dates):
+        self._version = self.minute_store.refresh()  # a rebuilt store gets new keys
+        todo = sorted({d for d in dates if (self._version, d) not in self.cache})
+        if not todo:
+            return
+        wanted = set(todo)
+        for panel in self.minute_store.iter_days(todo[0], todo[-1], fields=["close", "vol"],
+                                                 start=self.start, end=self.end):
+            if panel.date in wanted:
+                self._store_day(panel)
+                wanted.discard(panel.date)
+        for d in wanted:  # no minute data for these days: daily bar fallback only
+            self.cache.put((self._version, d), {})
+
+    def get_prices(self, date_str, symbols, market_data_today, side):
+        if self._version is None:
+            self._version = self.minute_store.refresh()
+        day = self.cache.get((self._version, date_str))
+        if day is None:
+            panel = self.minute_store.get_day(date_str, fields=["close", "vol"], start=self.start, end=self.end)
+            day = self._store_day(panel) if panel is not None else {}
+            self.cache.put((self._version, date_str), day)
+        fallback = FALLBACK_FIELD[side]
+        return {s: day[s] if s in day else market_data_today[s][fallback] for s in symbols}
+
+
+class MinuteVWAPModel(_MinutePriceModel):
+    """sum(close * vol) / sum(vol) over the window (independent of the vol unit)."""
+    name = "vwap"
+
+    def _day_prices(self, panel):
+        close = self._window(panel, "close").astype(np.float64)
+        vol = self._window(panel, "vol").astype(np.float64)
+        valid = np.isfinite(close) & np.isfinite(vol)
+        notional = np.where(valid, close * vol, 0.0).sum(axis=1)
+        volume = np.where(valid, vol, 0.0).sum(axis=1)
+        return notional / volume
+
+
+class MinuteTWAPModel(_MinutePriceModel):
+    """Mean close over the window; minutes without a bar are skipped."""
+    name = "twap"
+
+    def _day_prices(self, panel):
+        close = self._window(panel, "close").astype(np.float64)
+        valid = np.isfinite(close)
+        return np.where(valid, close, 0.0).sum(axis=1) / valid.sum(axis=1)
+
+
+class FeatureVWAPModel(ExecutionPriceModel):
+    """Fill price read from a daily feature column (vwap, vwap_open30, ...)."""
+
+    def __init__(self, features_dir, column: str = "vwap", max_cached_days: int = MAX_CACHED_DAYS):
+        self.features_dir = features_dir
+        self.column = column
+        self.name = f"feature_{column}"
+        self.cache = _DayPriceCache(max_cached_days)
+        self._version = None
+
+    @property
+    def cache_key(self) -> str:
+        return f"{self.name}|{self.features_dir}"
+
+    def prepare(self, dates):
+        from utils.minute.daily_features import features_version, load_daily_features
+
+        self._version = features_version(self.features_dir)
+        todo = sorted({d for d in dates if (self._version, d) not in self.cache})
+        if not todo:
+            return
+        df = load_daily_features(self.features_dir, todo[0], todo[-1], columns=[self.column])
+        df = df[df["date"].isin(todo) & (df[self.column] > 0)]
+        by_date = {d: dict(zip(g["symbol"], g[self.column].astype(float))) for d, g in df.groupby("date")}
+        for d in todo:
+            self.cache.put((self._version, d), by_date.get(d, {}))
+
+    def get_prices(self, date_str, symbols, market_data_today, side):
+        day = self.cache.get((self._version, date_str)) if self._version is not None else None
+        if day is None:
+            self.prepare([date_str])
+            day = self.cache.get((self._version, date_str))
+        fallback = FALLBACK_FIELD[side]
+        return {s: day[s] if s in day else market_data_today[s][fallback] for s in symbols}
+
+
+def make_execution_price_model(kind: str, minute_store=None, first_n_minutes: int = 30,
+                               features_dir=None) -> ExecutionPriceModel:
+    """
+    Build a model from config. kind: open | close | vwap | vwap_first_n | twap_first_n.
+    vwap / vwap_first_n read the daily feature store when features_dir is given
+    (first_n_minutes must match the store's vwap_open{N} column); otherwise
+    minute models require minute_store (utils.minute.minute_store.MinuteStore).
+    """
+    if kind == "open":
+        return OpenPriceModel()
+    if kind == "close":
+        return ClosePriceModel()
+    if features_dir is not None and kind == "vwap":
+        return FeatureVWAPModel(features_dir, "vwap")
+    if features_dir is not None and kind == "vwap_first_n":
+        return FeatureVWAPModel(features_dir, f"vwap_open{first_n_minutes}")
+    if minute_store is None:
+        raise ValueError(f"Execution price model {kind} requires minute data (minute_store)")
+    if kind == "vwap":
+        return MinuteVWAPModel(minute_store)
+    if kind == "vwap_first_n":
+        return MinuteVWAPModel(minute_store, first_n_minutes=first_n_minutes)
+    if kind == "twap_first_n":
+        return MinuteTWAPModel(minute_store, first_n_minutes=first_n_minutes)
+    raise ValueError(f"Unknown execution price model: {kind}")
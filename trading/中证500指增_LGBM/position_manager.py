@@ -1,3 +1,5 @@
+import logging
+
 from utils.中证500指增_LGBM.fees import (
     calc_buy_total_cost,
     calc_sell_net_proceeds,
@@ -5,6 +7,9 @@ from utils.中证500指增_LGBM.fees import (
     calc_incremental_cost_for_additional_volume,
 )
 
+logger = logging.getLogger(__name__)
+
+
 class PositionManager:
     def __init__(self, buy_fee_schedule, sell_fee_schedule=None):
         if buy_fee_schedule is None:
@@ -13,6 +18,7 @@ class PositionManager:
         if sell_fee_schedule is None:
             raise ValueError("sell_fee_schedule is required. PositionManager must be initialized with a valid SellFeeSchedule.")
         self.sell_fee_schedule = sell_fee_schedule
+        self.last_allocation_rounds = 0  # top-up rounds of the last calculate_full_allocation call
 
 
     def _max_volume_for_budget(self, symbol: str, price: float, budget: float) -> int:
@@ -42,11 +48,14 @@ class PositionManager:
                 hi = mid - 100
         return max(lo, 0)
 
-    def calculate_full_allocation(self, stock_pool, total_budget, market_data_today):
+    def calculate_full_allocation(self, stock_pool, total_budget, market_data_today, prices=None):
         """
         等权重优先策略：每只股票最多补偿 100 股，最大化利用资金。
+        prices: optional {symbol: fill price} from an execution price model; defaults to daily open.
         """
-        if not stock_pool: return []
+        if not stock_pool:
+            self.last_allocation_rounds = 0
+            return []
         
         # --- 1. 初始等权重分配 ---
         per_stock_budget = total_budget / len(stock_pool)
@@ -54,7 +63,7 @@ class PositionManager:
         total_allocated = 0.0  # includes fees
 
         for symbol in stock_pool:
-            price = market_data_today[symbol]['open']
+            price = prices[symbol] if prices is not None else market_data_today[symbol]['open']
             close = market_data_today[symbol]['close']
             volume = self._max_volume_for_budget(symbol, price, per_stock_budget)
             results.append({
@@ -106,12 +115,13 @@ class PositionManager:
             if not has_any_added:
                 break
         
+        self.last_allocation_rounds = round_num - 1
         if round_num > 1:
-            print(f"补余阶段完成，共进行了 {round_num - 1} 轮补仓")
+            logger.info("补余阶段完成，共进行了 %d 轮补仓", round_num - 1)
 
         total_cost_with_fees = total_budget-remaining_money
 
-        print(f"分配完成, 总预算:{total_budget:.2f}, 实际分配:{total_cost_with_fees}, 零头:{remaining_money:.2f}")
+        logger.info("分配完成, 总预算:%.2f, 实际分配:%s, 零头:%.2f", total_budget, total_cost_with_fees, remaining_money)
         return results
 
     def calculate_total_cost(self, results):
@@ -127,17 +137,18 @@ class PositionManager:
             total += calc_buy_total_cost(item["open_buy_price"], item["volume"], ex, self.buy_fee_schedule)
         return total
 
-    def calculate_net_sell_proceeds(self, positions_to_sell, market_data_today):
+    def calculate_net_sell_proceeds(self, positions_to_sell, market_data_today, prices=None):
         """
         Given positions to sell (list of dicts with 'symbol', 'volume', ...) and market data,
         return total net cash received after deducting sell fees (commission, stamp tax, etc.).
         Mirrors calculate_total_cost but for the sell side.
+        prices: optional {symbol: fill price} from an execution price model; defaults to daily close.
         """
 
         total = 0.0
         for pos in positions_to_sell:
             symbol = pos["symbol"]
-            close_price = market_data_today[symbol]["close"]
+            close_price = prices[symbol] if prices is not None else market_data_today[symbol]["close"]
             ex = exchange_from_symbol(symbol)
             if ex is not None:
                 total += calc_sell_net_proceeds(
@@ -0,0 +1,51 @@
+"""
+Shared config loading for main.py, the collectors and the pipeline runner.
+
+load_paths() parses config/paths.yaml once per process and load_json() the fee
+files; both keep the parsed object keyed by file path and reload only when the
+file's mtime changes, so steps run in one process (run.py) share a single
+parse while edits between runs are still picked up. Returned objects are
+shared: treat them as read-only.
+"""
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+PATHS_FILE = PROJECT_ROOT / "config" / "paths.yaml"
+
+_CACHE: Dict[Path, Tuple[int, Any]] = {}
+_LOCK = threading.Lock()
+
+
+def _cached(path, parse) -> Any:
+    path = Path(path)
+    if not path.is_absolute():
+        path = PROJECT_ROOT / path
+    mtime = path.stat().st_mtime_ns
+    with _LOCK:
+        hit = _CACHE.get(path)
+        if hit is not None and hit[0] == mtime:
+            return hit[1]
+        with open(path, "r", encoding="utf-8") as f:
+            value = parse(f)
+        _CACHE[path] = (mtime, value)
+        return value
+
+
+def load_paths(path=PATHS_FILE) -> dict:
+    """config/paths.yaml as a dict (relative paths resolve against the project root)."""
+    import yaml
+
+    return _cached(path, yaml.safe_load)
+
+
+def load_json(path) -> dict:
+    """A JSON config file (e.g. paths['config']['stock_trade_fees']); {} for an empty file."""
+    return _cached(path, json.load) or {}
+
+
+def clear_cache() -> None:
+    with _LOCK:
+        _CACHE.clear()
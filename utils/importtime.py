@@ -0,0 +1,56 @@
+"""
+Startup cost of the entry points, measured with `python -X importtime`.
+
+Each measurement imports the module in a fresh interpreter (run from the
+project root) and parses the importtime report: the module's cumulative
+import time and every module it pulled in. tests/test_import_time.py holds
+the budgets; this script prints the report:
+
+    python utils/importtime.py main analysis.run_registry --top 15
+"""
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+
+def import_time(module: str, root: Path = PROJECT_ROOT, repeat: int = 2) -> Tuple[float, Dict[str, float]]:
+    """
+    (cumulative ms of importing module, {imported module: cumulative ms}) in a fresh interpreter.
+    The best of repeat runs is kept, so a cold file cache does not count against the entry point.
+    """
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=root,
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+        modules = {}
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line.split(":", 1)[1].split("|")
+            modules[name.strip()] = int(cumulative) / 1000
+        if best is None or modules[module] < best[1][module]:
+            best = (modules[module], modules)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import time of entry point modules")
+    parser.add_argument("modules", nargs="+")
+    parser.add_argument("--top", type=int, default=10, help="slowest imported modules to list")
+    args = parser.parse_args(argv)
+    for module in args.modules:
+        total, modules = import_time(module)
+        print(f"{module}: {total:.1f} ms")
+        slowest = sorted(((ms, m) for m, ms in modules.items() if m != module), reverse=True)[:args.top]
+        for ms, name in slowest:
+            print(f"    {ms:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
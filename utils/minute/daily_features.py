@@ -0,0 +1,183 @@
+"""
+Daily execution features derived from minute bars, keyed by (date, symbol).
+
+build_daily_features walks the compacted minute parquet
+(data_collection/tushare/minute_compaction.py) one month at a time, so memory
+is bounded by a month of bars, and writes {features_dir}/{YYYYMM}.parquet next
+to the daily bar store. Each month file records in its schema metadata the
+source it was computed from: the (name, size, mtime) manifest of that year's
+compacted files plus the feature parameters. A rerun recomputes a month only
+when that record no longer matches, so new months, a rewritten year
+(minute_compaction.py rewrites the whole year when any input changed, e.g. a
+backfilled stock) and a partial latest month that has since been completed are
+all recomputed, while the months of untouched years are not read.
+
+Columns (per stock-day):
+    vwap                    sum(close * vol) / sum(vol) over the day
+    vwap_open{N}            same over the first N bars (default 30)
+    volume, amount          day totals from minute bars
+    participation_volume    volume * participation_rate (max shares we can trade)
+    high_after_open         max high excluding the first bar
+    low_after_open          min low excluding the first bar
+    n_bars                  number of minute bars
+"""
+import json
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+MINUTE_COLUMNS = ["ts_code", "trade_date", "trade_time", "high", "low", "close", "vol", "amount"]
+SOURCE_KEY = b"features_source"
+
+
+def _month_filters(month: str):
+    y, m = int(month[:4]), int(month[4:])
+    first = date(y, m, 1)
+    nxt = date(y + 1, 1, 1) if m == 12 else date(y, m + 1, 1)
+    return [("trade_date", ">=", first), ("trade_date", "<", nxt)]
+
+
+def _source_record(files: Sequence[Path], participation_rate: float, open_window: int) -> str:
+    """What a month's features were computed from: compacted year files (name, size, mtime) and parameters."""
+    manifest = [[f.name, f.stat().st_size, f.stat().st_mtime_ns] for f in files]
+    return json.dumps({"files": manifest, "participation_rate": participation_rate, "open_window": open_window})
+
+
+def _recorded_source(path: Path) -> Optional[str]:
+    if not path.exists():
+        return None
+    meta = pq.read_schema(path).metadata or {}
+    return meta[SOURCE_KEY].decode("utf-8") if SOURCE_KEY in meta else None
+
+
+def compute_daily_features(minutes: pd.DataFrame, participation_rate: float = 0.1,
+                           open_window: int = 30) -> pd.DataFrame:
+    """
+    Aggregate minute bars (columns as MINUTE_COLUMNS) to one row per (date, symbol).
+    Rows must be sorted by trade_time within each (trade_date, ts_code).
+    """
+    df = pd.DataFrame({
+        "date": pd.to_datetime(minutes["trade_date"]).dt.strftime("%Y%m%d"),
+        "symbol": minutes["ts_code"].astype(str),
+        "high": minutes["high"].astype(np.float64),
+        "low": minutes["low"].astype(np.float64),
+        "close": minutes["close"].astype(np.float64),
+        "vol": minutes["vol"].astype(np.float64),
+        "amount": minutes["amount"].astype(np.float64),
+    })
+    keys = ["date", "symbol"]
+    bar = df.groupby(keys, sort=False).cumcount().to_numpy()
+    df["notional"] = df["close"] * df["vol"]
+    in_open = bar < open_window
+    df["open_notional"] = np.where(in_open, df["notional"], 0.0)
+    df["open_vol"] = np.where(in_open, df["vol"], 0.0)
+    after_open = bar >= 1
+    df["high_after_open"] = np.where(after_open, df["high"], np.nan)
+    df["low_after_open"] = np.where(after_open, df["low"], np.nan)
+
+    g = df.groupby(keys, sort=True)
+    out = g.agg(
+        notional=("notional", "sum"),
+        volume=("vol", "sum"),
+        amount=("amount", "sum"),
+        open_notional=("open_notional", "sum"),
+        open_vol=("open_vol", "sum"),
+        high_after_open=("high_after_open", "max"),
+        low_after_open=("low_after_open", "min"),
+        n_bars=("close", "size"),
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out["vwap"] = out["notional"] / out["volume"].replace(0, np.nan)
+        out[f"vwap_open{open_window}"] = out["open_notional"] / out["open_vol"].replace(0, np.nan)
+    out["participation_volume"] = out["volume"] * participation_rate
+    cols = ["vwap", f"vwap_open{open_window}", "volume", "amount", "participation_volume",
+            "high_after_open", "low_after_open", "n_bars"]
+    return out[cols].reset_index()
+
+
+def build_daily_features(
+    compact_dir,
+    features_dir,
+    years: Optional[Sequence[int]] = None,
+    participation_rate: float = 0.1,
+    open_window: int = 30,
+    rebuild: bool = False,
+) -> Dict[str, int]:
+    """
+    Write {features_dir}/{YYYYMM}.parquet for every month of the compacted minute data
+    whose recorded source differs from the current compacted files (rebuild: every month).
+    Returns {month: rows written} for the months (re)computed.
+    """
+    compact_dir, features_dir = Path(compact_dir), Path(features_dir)
+    features_dir.mkdir(parents=True, exist_ok=True)
+    if years is None:
+        years = sorted(int(p.name) for p in compact_dir.iterdir() if p.is_dir() and p.name.isdigit())
+
+    written = {}
+    for year in years:
+        files = sorted((compact_dir / str(year)).glob("*.parquet"))
+        if not files:
+            continue
+        source = _source_record(files, participation_rate, open_window)
+        for m in range(1, 13):
+            month = f"{year}{m:02d}"
+            path = features_dir / f"{month}.parquet"
+            if not rebuild and _recorded_source(path) == source:
+                continue
+            filters = _month_filters(month)
+            tables = [pq.read_table(f, columns=MINUTE_COLUMNS, filters=filters) for f in files]
+            tbl = pa.concat_tables(tables, promote_options="permissive")  # float32 / float64 price boards
+            if tbl.num_rows == 0:
+                continue
+            features = compute_daily_features(tbl.to_pandas(), participation_rate, open_window)
+            out = pa.Table.from_pandas(features, preserve_index=False)
+            out = out.replace_schema_metadata({**(out.schema.metadata or {}), SOURCE_KEY: source.encode("utf-8")})
+            tmp_path = features_dir / f"{month}.parquet.tmp"
+            pq.write_table(out, tmp_path)
+            tmp_path.replace(path)
+            written[month] = len(features)
+            print(f"  ✅ features {month}: {len(features)} stock-days")
+    return written
+
+
+def features_version(features_dir) -> str:
+    """Manifest hash (name, size, mtime) of the month files: changes whenever a month is rewritten."""
+    import hashlib
+
+    h = hashlib.blake2b(digest_size=16)
+    for f in sorted(Path(features_dir).glob("*.parquet")):
+        st = f.stat()
+        h.update(f"{f.name}|{st.st_size}|{st.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def load_daily_features(
+    features_dir,
+    start_date: str,
+    end_date: str,
+    symbols: Optional[List[str]] = None,
+    columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """
+    Read features for dates in [start_date, end_date] ('YYYYMMDD'), optionally for some symbols/columns.
+    Only the monthly files overlapping the range are opened.
+    """
+    features_dir = Path(features_dir)
+    read_cols = None if columns is None else ["date", "symbol"] + [c for c in columns if c not in ("date", "symbol")]
+    filters = [("date", ">=", start_date), ("date", "<=", end_date)]
+    if symbols is not None:
+        filters.append(("symbol", "in", list(symbols)))
+
+    frames = []
+    for f in sorted(features_dir.glob("*.parquet")):
+        if f.stem < start_date[:6] or f.stem > end_date[:6]:
+            continue
+        frames.append(pq.read_table(f, columns=read_cols, filters=filters).to_pandas())
+    if not frames:
+        return pd.DataFrame(columns=read_cols or ["date", "symbol"])
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,249 @@
+"""
+Minute bar store on memory-mapped Arrow IPC files.
+
+Layout: {ipc_dir}/{year}/{YYYYMM}.arrow, built from the compacted parquet
+(data_collection/tushare/minute_compaction.py). Each file holds one record batch
+per trading day; every column is a dense (symbols x minutes) grid flattened in
+symbol-major order, with NaN where a stock has no bar. Schema metadata carries
+the month's symbols, minute labels ('HH:MM') and dates ('YYYYMMDD').
+{ipc_dir}/{year}/_source.json, written after a year's months, records the
+compacted files they were built from (ipc_year_up_to_date).
+
+Reading a day maps the file and reshapes the columns, so
+    store.get_day("20250303", start="09:31", end="10:00")["close"]
+is a (symbols x minutes) view into the mapped file, not a copy.
+"""
+import bisect
+import hashlib
+import json
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+FIELDS = ["open", "high", "low", "close", "vol", "amount"]
+SOURCE_FILE = "_source.json"
+
+
+class MinutePanel:
+    """One trading day of minute bars: field -> (symbols x minutes) array."""
+
+    def __init__(self, trade_date: str, symbols: List[str], minutes: List[str], fields: Dict[str, np.ndarray]):
+        self.date = trade_date
+        self.symbols = symbols
+        self.minutes = minutes
+        self.fields = fields
+        self._symbol_pos = None
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.fields[field]
+
+    @property
+    def shape(self):
+        return (len(self.symbols), len(self.minutes))
+
+    def symbol_index(self, symbols: Sequence[str]) -> np.ndarray:
+        """Row positions for symbols (-1 if the symbol is not in this panel)."""
+        if self._symbol_pos is None:
+            self._symbol_pos = {s: i for i, s in enumerate(self.symbols)}
+        return np.array([self._symbol_pos.get(s, -1) for s in symbols], dtype=np.int64)
+
+
+class MinuteStore:
+    """Read-only access to the Arrow IPC minute store."""
+
+    def __init__(self, ipc_dir):
+        self.ipc_dir = Path(ipc_dir)
+        self._months = {}  # 'YYYYMM' -> (reader, meta) or None if missing
+        self._version = None  # version() when the months above were opened
+
+    def _open_month(self, month: str):
+        if month not in self._months:
+            path = self.ipc_dir / month[:4] / f"{month}.arrow"
+            if not path.exists():
+                self._months[month] = None
+            else:
+                reader = pa.ipc.open_file(pa.memory_map(str(path), "r"))
+                meta = reader.schema.metadata
+                self._months[month] = (reader, {
+                    "symbols": json.loads(meta[b"symbols"]),
+                    "minutes": json.loads(meta[b"minutes"]),
+                    "dates": {d: i for i, d in enumerate(json.loads(meta[b"dates"]))},
+                })
+        return self._months[month]
+
+    def version(self) -> str:
+        """Manifest hash of the store's files (relative path, size, mtime): changes when any month is rebuilt."""
+        h = hashlib.blake2b(digest_size=16)
+        for path in sorted(self.ipc_dir.glob("*/*.arrow")):
+            st = path.stat()
+            h.update(f"{path.relative_to(self.ipc_dir).as_posix()}|{st.st_size}|{st.st_mtime_ns}\n".encode("utf-8"))
+        return h.hexdigest()
+
+    def refresh(self) -> str:
+        """Current version(); months opened under an older version are dropped and re-mapped on next use."""
+        version = self.version()
+        if version != self._version:
+            self._months.clear()
+            self._version = version
+        return version
+
+    def available_dates(self) -> List[str]:
+        """All trading dates ('YYYYMMDD') in the store, sorted."""
+        dates = []
+        for path in sorted(self.ipc_dir.glob("*/*.arrow")):
+            opened = self._open_month(path.stem)
+            if opened:
+                dates.extend(opened[1]["dates"])
+        return sorted(dates)
+
+    def get_day(
+        self,
+        trade_date: str,
+        fields: Optional[Sequence[str]] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+    ) -> Optional[MinutePanel]:
+        """
+        Minute bars of all symbols on trade_date ('YYYYMMDD'), minutes in [start, end]
+        ('HH:MM', inclusive). Returns None if the date is not in the store.
+        Arrays are zero-copy views into the memory-mapped file.
+        """
+        opened = self._open_month(trade_date[:6])
+        if opened is None or trade_date not in opened[1]["dates"]:
+            return None
+        reader, meta = opened
+        batch = reader.get_batch(meta["dates"][trade_date])
+
+        minutes = meta["minutes"]
+        lo = bisect.bisect_left(minutes, start) if start else 0
+        hi = bisect.bisect_right(minutes, end) if end else len(minutes)
+        n_sym, n_min = len(meta["symbols"]), len(minutes)
+
+        out = {}
+        for f in fields or FIELDS:
+            arr = batch.column(f).to_numpy(zero_copy_only=True)
+            out[f] = arr.reshape(n_sym, n_min)[:, lo:hi]
+        return MinutePanel(trade_date, meta["symbols"], minutes[lo:hi], out)
+
+    def iter_days(
+        self,
+        start_date: str,
+        end_date: str,
+        fields: Optional[Sequence[str]] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+    ) -> Iterator[MinutePanel]:
+        """Yield one MinutePanel per trading day in [start_date, end_date], in date order."""
+        for path in sorted(self.ipc_dir.glob("*/*.arrow")):
+            month = path.stem
+            if month < start_date[:6] or month > end_date[:6]:
+                continue
+            opened = self._open_month(month)
+            if opened is None:
+                continue
+            for d in sorted(opened[1]["dates"]):
+                if start_date <= d <= end_date:
+                    yield self.get_day(d, fields=fields, start=start, end=end)
+
+
+def _month_bounds(month: str):
+    y, m = int(month[:4]), int(month[4:])
+    first = date(y, m, 1)
+    nxt = date(y + 1, 1, 1) if m == 12 else date(y, m + 1, 1)
+    return first, nxt
+
+
+def _write_month(tbl: pa.Table, path: Path) -> int:
+    """Write one month of compacted rows as one dense record batch per day. Returns days written."""
+    codes = tbl.column("ts_code").cast(pa.string()).to_numpy(zero_copy_only=False)
+    tt = tbl.column("trade_time").to_numpy(zero_copy_only=False).astype("datetime64[s]")
+    day = tt.astype("datetime64[D]")
+    tod = (tt - day).astype(np.int64)
+
+    symbols, sym_idx = np.unique(codes, return_inverse=True)
+    tods, min_idx = np.unique(tod, return_inverse=True)
+    days, day_idx = np.unique(day, return_inverse=True)
+    minutes = [f"{t // 3600:02d}:{t % 3600 // 60:02d}" for t in tods.tolist()]
+    dates = [str(d).replace("-", "") for d in days]
+    n_sym, n_min = len(symbols), len(minutes)
+
+    values = {f: tbl.column(f).to_numpy(zero_copy_only=False) for f in FIELDS}
+    schema = pa.schema(
+        [(f, pa.from_numpy_dtype(values[f].dtype)) for f in FIELDS],
+        metadata={
+            "symbols": json.dumps(symbols.tolist()),
+            "minutes": json.dumps(minutes),
+            "dates": json.dumps(dates),
+        },
+    )
+
+    order = np.argsort(day_idx, kind="stable")
+    bounds = np.searchsorted(day_idx[order], np.arange(len(days) + 1))
+    tmp_path = path.with_suffix(".arrow.tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        for i in range(len(days)):
+            rows = order[bounds[i]:bounds[i + 1]]
+            flat = sym_idx[rows] * n_min + min_idx[rows]
+            arrays = []
+            for f in FIELDS:
+                grid = np.full(n_sym * n_min, np.nan, dtype=values[f].dtype)
+                grid[flat] = values[f][rows]
+                arrays.append(pa.array(grid))
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+    tmp_path.replace(path)
+    return len(days)
+
+
+def _source_manifest(files: Sequence[Path]) -> list:
+    return [[f.name, f.stat().st_size, f.stat().st_mtime_ns] for f in files]
+
+
+def ipc_year_up_to_date(compact_dir, ipc_dir, year: int) -> bool:
+    """
+    True if {ipc_dir}/{year} was fully built from the current compacted files of the year:
+    its source record matches their (name, size, mtime) and every month it lists exists.
+    A missing / wiped ipc_dir or a build that failed part way has no matching record.
+    """
+    files = sorted((Path(compact_dir) / str(year)).glob("*.parquet"))
+    if not files:
+        return True  # nothing to build
+    out_dir = Path(ipc_dir) / str(year)
+    record_path = out_dir / SOURCE_FILE
+    if not record_path.exists():
+        return False
+    record = json.loads(record_path.read_text(encoding="utf-8"))
+    if record.get("files") != _source_manifest(files):
+        return False
+    return all((out_dir / f"{month}.arrow").exists() for month in record.get("months", []))
+
+
+def build_minute_ipc(compact_dir, ipc_dir, year: int) -> Dict[str, int]:
+    """
+    Convert {compact_dir}/{year}/*.parquet into {ipc_dir}/{year}/{YYYYMM}.arrow.
+    Reads one month at a time (trade_date pushdown). Returns {month: days written}.
+    The source record is written last, so an interrupted build is rebuilt next time.
+    """
+    files = sorted((Path(compact_dir) / str(year)).glob("*.parquet"))
+    if not files:
+        return {}
+    out_dir = Path(ipc_dir) / str(year)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / SOURCE_FILE).unlink(missing_ok=True)
+
+    written = {}
+    for m in range(1, 13):
+        month = f"{year}{m:02d}"
+        first, nxt = _month_bounds(month)
+        filters = [("trade_date", ">=", first), ("trade_date", "<", nxt)]
+        tables = [pq.read_table(f, columns=["ts_code", "trade_time"] + FIELDS, filters=filters) for f in files]
+        tbl = pa.concat_tables(tables, promote_options="permissive")  # float32 / float64 price boards
+        if tbl.num_rows == 0:
+            continue
+        written[month] = _write_month(tbl, out_dir / f"{month}.arrow")
+    record = {"files": _source_manifest(files), "months": sorted(written)}
+    (out_dir / SOURCE_FILE).write_text(json.dumps(record), encoding="utf-8")
+    return written
@@ -0,0 +1,349 @@
+"""
+Small DAG scheduler for the data / backtest pipeline (run.py, backtest.py).
+
+Each Step names its script and the files, directories or glob patterns
+("dir/*.parquet") it reads (inputs) and writes (outputs), relative to the
+project root. Dependencies follow from the declaration order: a step runs
+after every earlier step that writes what it reads, reads what it writes, or
+writes the same path. Steps with no such relation run concurrently, with
+their output prefixed by step name.
+
+Two runners: run_module (default in run.py) imports the step's script and
+calls its main() in a worker thread of this process, so pandas / pyarrow /
+yaml / xtquant are imported once and config/paths.yaml is parsed once
+(utils/config.py) for the whole pipeline; run_script starts a fresh
+interpreter per step (run.py --isolated).
+
+A step is skipped when the content hash of its script plus inputs matches the
+last successful run and all its outputs exist. Steps whose real input is
+remote (the QMT / Tushare collectors) are declared always_run: their local
+inputs say nothing about whether new trading days exist, so they run every
+time and their downstream steps are skipped only if the outputs came out the same. File hashes are cached by
+(size, mtime) in the state file, so an unchanged multi-thousand-file data
+directory costs one stat per file rather than a re-read. Hashes are taken
+after a step succeeds, so steps that rewrite their own inputs (QMT_st_fill.py)
+are skipped on the next run too.
+"""
+import fnmatch
+import hashlib
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import threading
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+# Step outcomes
+RAN, SKIPPED, MISSING, FAILED, BLOCKED = "ran", "skipped", "missing", "failed", "blocked"
+
+
+@dataclass(frozen=True)
+class Step:
+    name: str
+    label: str
+    script: str                 # relative to project root
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    always_run: bool = False    # never skipped (inputs not visible as local files)
+
+
+def _is_glob(path: str) -> bool:
+    return any(c in path for c in "*?[")
+
+
+def _static_dir(pattern: str) -> str:
+    """Leading part of a glob pattern without wildcards."""
+    parts = PurePosixPath(pattern).parts
+    n = next(i for i, part in enumerate(parts) if _is_glob(part))
+    return PurePosixPath(*parts[:n]).as_posix() if n else "."
+
+
+def _glob(root: Path, pattern: str) -> List[Path]:
+    """Files matching a pattern relative to root (the static part may be absolute or contain '..')."""
+    static = _static_dir(pattern)
+    rest = PurePosixPath(pattern).relative_to(static).as_posix() if static != "." else pattern
+    return sorted((root / static).glob(rest))
+
+
+def _contains(outer: str, inner: str) -> bool:
+    po, pi = PurePosixPath(outer).parts, PurePosixPath(inner).parts
+    return po == (".",) or pi[:len(po)] == po
+
+
+def _overlaps(a: str, b: str) -> bool:
+    """Same path, one contains the other, or a path matched by the other's glob pattern."""
+    if _is_glob(a) and _is_glob(b):
+        sa, sb = _static_dir(a), _static_dir(b)
+        return _contains(sa, sb) or _contains(sb, sa)
+    if _is_glob(b):
+        a, b = b, a
+    if _is_glob(a):  # pattern a, path b
+        return fnmatch.fnmatchcase(b, a) or _contains(b, _static_dir(a))
+    return _contains(a, b) or _contains(b, a)
+
+
+def _touches(xs: Iterable[str], ys: Iterable[str]) -> bool:
+    return any(_overlaps(x, y) for x in xs for y in ys)
+
+
+def resolve_dependencies(steps: Sequence[Step]) -> Dict[str, Set[str]]:
+    """{step name: names of earlier steps it must wait for} (read-after-write, write-after-read, write-after-write)."""
+    names = [s.name for s in steps]
+    if len(set(names)) != len(names):
+        raise ValueError("Step names must be unique")
+    deps: Dict[str, Set[str]] = {s.name: set() for s in steps}
+    for j, later in enumerate(steps):
+        for earlier in steps[:j]:
+            if (_touches(earlier.outputs, later.inputs) or _touches(earlier.inputs, later.outputs)
+                    or _touches(earlier.outputs, later.outputs)):
+                deps[later.name].add(earlier.name)
+    return deps
+
+
+class FileHasher:
+    """Content hashes of files / directory trees, cached by (size, mtime_ns)."""
+
+    def __init__(self, root: Path, cache: Optional[Dict[str, list]] = None):
+        self.root = Path(root)
+        self.cache: Dict[str, list] = cache if cache is not None else {}
+
+    def _file(self, path: Path, rel: str) -> str:
+        st = path.stat()
+        hit = self.cache.get(rel)
+        if hit and hit[0] == st.st_size and hit[1] == st.st_mtime_ns:
+            return hit[2]
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        self.cache[rel] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+        return h.hexdigest()
+
+    def _key(self, path: Path) -> str:
+        try:
+            return path.relative_to(self.root).as_posix()
+        except ValueError:  # data directories configured outside the project
+            return path.as_posix()
+
+    def digest(self, rel_paths: Iterable[str]) -> str:
+        """One hash over every file under the given paths; missing paths count as 'missing'."""
+        entries = []
+        for rel in sorted(set(rel_paths)):
+            path = self.root / rel
+            if _is_glob(rel):
+                files = [f for f in _glob(self.root, rel) if f.is_file()]
+            elif path.is_file():
+                files = [path]
+            elif path.is_dir():
+                files = []
+                for dirpath, dirnames, filenames in os.walk(path):
+                    dirnames.sort()
+                    files.extend(Path(dirpath) / fn for fn in sorted(filenames))
+            else:
+                entries.append((rel, "missing"))
+                continue
+            for full in files:
+                key = self._key(full)
+                entries.append((key, self._file(full, key)))
+        return hashlib.blake2b(json.dumps(entries).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def load_state(state_path: Path) -> dict:
+    if state_path.exists():
+        with open(state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"steps": {}, "files": {}}
+
+
+def save_state(state: dict, state_path: Path) -> None:
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = state_path.with_suffix(state_path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, state_path)
+
+
+_PRINT_LOCK = threading.Lock()
+
+
+def run_script(step: Step, root: Path) -> int:
+    """Run the step's script in a fresh interpreter at the project root; stream its output prefixed by step name."""
+    env = dict(os.environ, PYTHONIOENCODING="utf-8", PYTHONUNBUFFERED="1")
+    proc = subprocess.Popen(
+        [sys.executable, str(root / step.script)], cwd=str(root), env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding="utf-8", errors="replace",
+    )
+    for line in proc.stdout:
+        with _PRINT_LOCK:
+            print(f"[{step.name}] {line}", end="", flush=True)
+    return proc.wait()
+
+
+class _PrefixedStdout:
+    """sys.stdout wrapper: lines written from a step's worker thread get that step's prefix."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text: str) -> int:
+        prefix = getattr(self.local, "prefix", None)
+        if prefix is None:
+            return self.stream.write(text)
+        buf = getattr(self.local, "buf", "") + text
+        *lines, self.local.buf = buf.split("\n")
+        if lines:
+            with _PRINT_LOCK:
+                self.stream.write("".join(f"{prefix}{line}\n" for line in lines))
+        return len(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def run_module(step: Step, root: Path) -> int:
+    """
+    Import the step's script as a fresh module and call its main() in this process.
+    Output is prefixed by step name; SystemExit codes are returned, exceptions print a traceback and return 1.
+    Relative paths in the scripts resolve against the working directory: run from the project root.
+    """
+    if not isinstance(sys.stdout, _PrefixedStdout):
+        sys.stdout = _PrefixedStdout(sys.stdout)
+    out = sys.stdout
+    out.local.prefix, out.local.buf = f"[{step.name}] ", ""
+    try:
+        if str(root) not in sys.path:
+            sys.path.insert(0, str(root))
+        spec = importlib.util.spec_from_file_location(f"_pipeline_step_{step.name}", root / step.script)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        if not callable(getattr(module, "main", None)):
+            print(f"{step.script} has no main()")
+            return 1
+        module.main()
+        return 0
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception:
+        traceback.print_exc(file=out)
+        return 1
+    finally:
+        if out.local.buf:
+            out.write("\n")
+        out.local.prefix = None
+
+
+def _log(msg: str) -> None:
+    with _PRINT_LOCK:
+        print(msg, flush=True)
+
+
+def run_pipeline(
+    steps: Sequence[Step],
+    root,
+    state_path,
+    max_workers: Optional[int] = None,
+    force: Optional[Iterable[str]] = None,
+    dry_run: bool = False,
+    runner: Callable[[Step, Path], int] = run_script,
+) -> Dict[str, str]:
+    """
+    Run steps in dependency order, independent ones concurrently, skipping unchanged ones.
+
+    force: step names to run regardless of hashes (an empty iterable forces every step).
+    dry_run: print the plan (a step whose upstream would run is shown as run) without running anything.
+    runner: runner(step, root) -> exit code; run_script by default.
+    Returns {step name: 'ran' | 'skipped' | 'missing' | 'failed' | 'blocked'}.
+    """
+    root, state_path = Path(root), Path(state_path)
+    deps = resolve_dependencies(steps)
+    by_name = {s.name: s for s in steps}
+    if force is not None:
+        force = set(force) or set(by_name)
+        unknown = force - set(by_name)
+        if unknown:
+            raise ValueError(f"Unknown step(s): {', '.join(sorted(unknown))}")
+    else:
+        force = set()
+
+    state = load_state(state_path)
+    hasher = FileHasher(root, state.setdefault("files", {}))
+    last = state.setdefault("steps", {})
+    status: Dict[str, str] = {}
+    pending: List[str] = [s.name for s in steps]
+    running = {}
+
+    def _inputs(step):
+        return [step.script, *step.inputs]
+
+    def _decide(step) -> Optional[str]:
+        """Status without running (missing / skipped / blocked), or None if the step must run."""
+        if any(status[d] in (FAILED, BLOCKED) for d in deps[step.name]):
+            return BLOCKED
+        if not (root / step.script).exists():
+            return MISSING
+        if step.name in force or step.always_run:
+            return None
+        if dry_run and any(status[d] == RAN for d in deps[step.name]):
+            return None
+        prev = last.get(step.name)
+        if (prev and prev.get("inputs") == hasher.digest(_inputs(step))
+                and all(any(_glob(root, o)) if _is_glob(o) else (root / o).exists() for o in step.outputs)):
+            return SKIPPED
+        return None
+
+    messages = {SKIPPED: "unchanged since last successful run", MISSING: "script not found",
+                BLOCKED: "an upstream step failed"}
+    failure_code = 0
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as pool:
+        while pending or running:
+            for name in list(pending):
+                if failure_code or any(d not in status for d in deps[name]):
+                    continue
+                pending.remove(name)
+                step = by_name[name]
+                decided = _decide(step)
+                if decided is not None:
+                    status[name] = decided
+                    _log(f"[SKIP] {step.label}: {messages[decided]}")
+                elif dry_run:
+                    status[name] = RAN
+                    _log(f"[PLAN] {step.label}")
+                else:
+                    _log(f"[RUN] {step.label}")
+                    running[pool.submit(runner, step, root)] = name
+            if failure_code:
+                for name in pending:
+                    status[name] = BLOCKED
+                pending = []
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                step = by_name[name]
+                try:
+                    code = fut.result()
+                except Exception as e:
+                    _log(f"[FAIL] {step.label}: {e!r}")
+                    code = 1
+                if code != 0:
+                    status[name] = FAILED
+                    failure_code = failure_code or code
+                    _log(f"[FAIL] {step.label} exited with code {code}.")
+                    continue
+                status[name] = RAN
+                last[name] = {"inputs": hasher.digest(_inputs(step))}
+                save_state(state, state_path)
+                _log(f"[OK] {step.label}")
+    if not dry_run:
+        save_state(state, state_path)  # file hash cache, also when everything was skipped
+    return status
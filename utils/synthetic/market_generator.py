@@ -0,0 +1,347 @@
+"""
+Synthetic A-share daily market for load, scaling and equivalence tests.
+
+Writes a universe that exercises every engine path, fully offline:
+
+    {out_dir}/stock/{code}.parquet     daily bars (open, high, low, close, volume, amount) on a
+                                       'YYYYMMDD' index, the per_stock layout of daily_data_collection.py
+    {out_dir}/index/000905.SH.parquet  benchmark index bars
+    {out_dir}/stock_list.parquet       code, name, is_st, limit_pct, list_date
+    {out_dir}/portfolio.parquet        df_expanded (the daily_{name}_停牌.xlsx columns)
+
+Prices follow a one-factor model (market return x beta + fat-tailed
+idiosyncratic noise) with A-share rules: prices on a 0.01 tick, daily moves
+capped at the board's price limit (10% main board, 20% ChiNext / STAR, 5% ST),
+news jumps that close at the limit, one-word limit-up days (open = close =
+limit), suspension spells (no bar: loaders fall back to the last close) and
+stocks listed during the period. The portfolio picks portfolio_size listed
+stocks per week and fills UpperLimit (first day), LowerLimit (last day) and the
+suspension columns (first / last day) from the generated bars, as
+中证500指增_LGBM_excel_upperlimit.py does from Wind / Choice; suspension dates
+are YYYYMMDD integers (0 = not suspended).
+
+Everything derives from the seed: stock j's attributes and path depend only on
+(seed, j) and the calendar, so a larger universe with the same n_days extends a
+smaller one (the weekly portfolio picks differ). Stocks are simulated chunk_size at a
+time, which bounds memory for 5000 stocks x 20 years.
+
+    python utils/synthetic/market_generator.py data/synthetic --stocks 5000 --years 20 --seed 0
+"""
+import argparse
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from time import perf_counter
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+INDEX_CODE = "000905.SH"
+TRADING_DAYS_PER_YEAR = 243
+# board: (first code, exchange, price limit, share of the universe)
+BOARDS = (
+    (1, "SZ", 0.10, 0.30),       # 000001.SZ main board
+    (300001, "SZ", 0.20, 0.20),  # ChiNext
+    (600000, "SH", 0.10, 0.35),  # main board
+    (688001, "SH", 0.20, 0.15),  # STAR
+)
+ST_LIMIT = 0.05
+GENERATOR_VERSION = 2  # bump when the same spec would generate different data
+PORTFOLIO_COLUMNS = ["Date", "Name", "week_end", "daily_date", "first_trading_day", "last_trading_day",
+                     "UpperLimit", "LowerLimit", "停牌起始日期", "停牌结束日期", "停牌结束最后交易日"]
+
+
+@dataclass(frozen=True)
+class SyntheticMarketSpec:
+    n_stocks: int = 500
+    n_days: int = 2 * TRADING_DAYS_PER_YEAR
+    start: str = "2015-01-05"
+    seed: int = 0
+    st_fraction: float = 0.04
+    late_listing_fraction: float = 0.15  # listed after the first day
+    suspensions_per_year: float = 0.5  # suspension spells per stock-year
+    mean_suspension_days: float = 6.0
+    limit_move_prob: float = 0.004  # per stock-day chance of a news jump to the limit
+    one_word_prob: float = 0.5  # share of limit-up jumps that open at the limit
+    market_vol: float = 0.22  # annualized
+    idio_vol: float = 0.35  # annualized
+    portfolio_size: int = 100
+
+
+@dataclass(frozen=True)
+class SyntheticMarket:
+    root: Path
+    stock_dir: Path
+    index_dir: Path
+    universe_path: Path
+    portfolio_path: Path
+    dates: pd.DatetimeIndex
+
+    def portfolio(self) -> pd.DataFrame:
+        return pd.read_parquet(self.portfolio_path)
+
+    def paths_config(self, fees_dir: Optional[Path] = None) -> dict:
+        """paths.yaml-shaped dict for BacktestSession (fee JSONs from fees_dir, default the project's config/)."""
+        fees_dir = Path(fees_dir) if fees_dir is not None else Path(__file__).resolve().parents[2] / "config"
+        return {
+            "level1": {"daily": {"stock": {"base_dir": str(self.stock_dir), "layout": "per_stock"},
+                                 "index": {"base_dir": str(self.index_dir)}}},
+            "config": {"stock_trade_fees": str(fees_dir / "stock_trade_fees.json"),
+                       "liability_fee": str(fees_dir / "liability_fee.json")},
+        }
+
+
+def trading_calendar(start: str, n_days: int) -> pd.DatetimeIndex:
+    """n_days weekdays from start without the fixed holiday weeks (New Year, Spring Festival, May Day, National Day)."""
+    days = pd.bdate_range(start, periods=int(n_days * 1.1) + 30)
+    m, d = days.month, days.day
+    holiday = (((m == 1) & (d == 1)) | ((m == 2) & (d >= 10) & (d <= 16)) | ((m == 5) & (d <= 3))
+               | ((m == 10) & (d <= 7)))
+    return days[~holiday][:n_days]
+
+
+def make_universe(spec: SyntheticMarketSpec, dates: pd.DatetimeIndex) -> pd.DataFrame:
+    """code, name, is_st, limit_pct, list_idx (first day with a bar) per stock; stock j's draws use (seed, 0, j)."""
+    n, shares = spec.n_stocks, [b[3] for b in BOARDS]
+    board = np.empty(n, dtype=np.int64)
+    is_st, late = np.empty(n, dtype=bool), np.empty(n, dtype=bool)
+    list_idx = np.zeros(n, dtype=np.int64)
+    for j in range(n):
+        rng = np.random.default_rng([spec.seed, 0, j])
+        board[j] = rng.choice(len(BOARDS), p=shares)
+        is_st[j] = rng.random() < spec.st_fraction
+        late[j] = rng.random() < spec.late_listing_fraction
+        if late[j]:
+            list_idx[j] = rng.integers(1, max(2, int(len(dates) * 0.9)))
+    codes, counters = [], [b[0] for b in BOARDS]
+    for b in board:
+        codes.append(f"{counters[b]:06d}.{BOARDS[b][1]}")
+        counters[b] += 1
+    limit = np.where(is_st, ST_LIMIT, np.array([BOARDS[b][2] for b in board]))
+    return pd.DataFrame({
+        "code": codes,
+        "name": [f"{'ST' if st else ''}合成{j:04d}" for j, st in enumerate(is_st)],
+        "is_st": is_st,
+        "limit_pct": limit,
+        "list_idx": list_idx,
+    })
+
+
+def _tick(x):
+    """Round to the 0.01 price tick, half up."""
+    return np.floor(x * 100 + 0.5) / 100
+
+
+def _market_returns(spec: SyntheticMarketSpec, n_days: int) -> np.ndarray:
+    rng = np.random.default_rng([spec.seed, 2])
+    daily = spec.market_vol / np.sqrt(TRADING_DAYS_PER_YEAR)
+    return 0.0003 + rng.standard_t(5, n_days) * daily * np.sqrt(3 / 5)
+
+
+def _suspensions(rng, spec, n_days, list_idx) -> np.ndarray:
+    """Boolean (n_days,) mask of suspended days; never the listing day."""
+    mask = np.zeros(n_days, dtype=bool)
+    n = rng.poisson(spec.suspensions_per_year * n_days / TRADING_DAYS_PER_YEAR)
+    if n and list_idx + 1 < n_days:
+        starts = rng.integers(list_idx + 1, n_days, n)
+        lengths = rng.geometric(1 / spec.mean_suspension_days, n)
+        for s, length in zip(starts, lengths):
+            mask[s:s + length] = True
+    return mask
+
+
+def simulate_chunk(spec: SyntheticMarketSpec, universe: pd.DataFrame, market: np.ndarray, j0: int, j1: int) -> dict:
+    """
+    Bars of stocks j0..j1-1 as (n_days x k) arrays: open, high, low, close, volume, amount,
+    up / down (limit prices from the previous close), active (listed and trading) and suspended.
+    """
+    T, k = len(market), j1 - j0
+    daily = spec.idio_vol / np.sqrt(TRADING_DAYS_PER_YEAR)
+    limit = universe["limit_pct"].to_numpy()[j0:j1]
+    list_idx = universe["list_idx"].to_numpy()[j0:j1]
+    shape = (T, k)
+    idio, gap, wick_h, wick_l, vol_noise = (np.empty(shape) for _ in range(5))
+    jump = np.zeros(shape)
+    one_word = np.zeros(shape, dtype=bool)
+    suspended = np.zeros(shape, dtype=bool)
+    beta, p0, base_volume = np.empty(k), np.empty(k), np.empty(k)
+    for i, j in enumerate(range(j0, j1)):
+        rng = np.random.default_rng([spec.seed, 1, j])
+        beta[i] = rng.uniform(0.6, 1.4)
+        p0[i] = rng.uniform(4, 60)
+        base_volume[i] = np.exp(rng.normal(11, 0.7))  # 手
+        idio[:, i] = rng.standard_t(4, T) * daily / np.sqrt(2)
+        gap[:, i] = rng.normal(0, 0.4 * daily, T)
+        wick_h[:, i] = rng.exponential(0.3 * daily, T)
+        wick_l[:, i] = rng.exponential(0.3 * daily, T)
+        vol_noise[:, i] = rng.normal(0, 0.4, T)
+        hits = rng.random(T) < spec.limit_move_prob
+        jump[:, i] = np.where(hits, rng.choice([-1.0, 1.0], T), 0.0)
+        one_word[:, i] = hits & (jump[:, i] > 0) & (rng.random(T) < spec.one_word_prob)
+        suspended[:, i] = _suspensions(rng, spec, T, list_idx[i])
+
+    active = (np.arange(T)[:, None] >= list_idx[None, :]) & ~suspended
+    out = {f: np.empty(shape) for f in ("open", "high", "low", "close", "up", "down")}
+    prev = _tick(p0)
+    for t in range(T):
+        up = _tick(prev * (1 + limit))
+        down = np.maximum(_tick(prev * (1 - limit)), 0.01)
+        r = np.where(jump[t] != 0, jump[t] * (limit + 0.05), beta * market[t] + idio[t])
+        close = np.clip(_tick(prev * np.exp(r)), down, up)
+        open_ = np.where(one_word[t], up, np.clip(_tick(prev * np.exp(gap[t])), down, up))
+        out["open"][t], out["close"][t], out["up"][t], out["down"][t] = open_, close, up, down
+        out["high"][t] = np.minimum(_tick(np.maximum(open_, close) * (1 + wick_h[t])), up)
+        out["low"][t] = np.maximum(_tick(np.minimum(open_, close) * (1 - wick_l[t])), down)
+        prev = np.where(active[t], close, prev)
+    out["volume"] = np.maximum(np.round(base_volume * np.exp(vol_noise)), 1.0)
+    out["amount"] = out["volume"] * 100 * (out["open"] + out["close"]) / 2
+    out["active"] = active
+    out["suspended"] = suspended
+    return out
+
+
+def week_bounds(dates: pd.DatetimeIndex):
+    """(first, one-past-last) day indices of each calendar week in dates."""
+    iso = dates.isocalendar()
+    week_id = (iso["year"].to_numpy() * 100 + iso["week"].to_numpy()).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, week_id[1:] != week_id[:-1]])
+    return starts, np.r_[starts[1:], len(dates)]
+
+
+def make_portfolio_skeleton(spec: SyntheticMarketSpec, universe: pd.DataFrame, dates: pd.DatetimeIndex) -> pd.DataFrame:
+    """Weekly picks of listed stocks: one row per (trading day, stock) with day / stock indices and week flags."""
+    rng = np.random.default_rng([spec.seed, 3])
+    starts, ends = week_bounds(dates)
+    list_idx = universe["list_idx"].to_numpy()
+    day_idx, stock_idx, first, last, week_first, week_last = [], [], [], [], [], []
+    for s, e in zip(starts[1:], ends[1:]):  # the first week has no signal date
+        eligible = np.flatnonzero(list_idx < s)
+        pick = rng.choice(eligible, min(spec.portfolio_size, len(eligible)), replace=False)
+        for d in range(s, e):
+            day_idx.append(np.full(len(pick), d))
+            stock_idx.append(pick)
+            first.append(np.full(len(pick), int(d == s)))
+            last.append(np.full(len(pick), int(d == e - 1)))
+            week_first.append(np.full(len(pick), s))
+            week_last.append(np.full(len(pick), e - 1))
+    cat = lambda parts: np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+    return pd.DataFrame({"day_idx": cat(day_idx), "stock_idx": cat(stock_idx), "first_trading_day": cat(first),
+                         "last_trading_day": cat(last), "week_first": cat(week_first), "week_last": cat(week_last)})
+
+
+def _fill_portfolio(skeleton: pd.DataFrame, bars: dict, j0: int, j1: int, values: dict, week_last_of_day) -> None:
+    """Limit prices and suspension columns of the skeleton rows of stocks j0..j1-1 (in place into values)."""
+    rows = np.flatnonzero((skeleton["stock_idx"].to_numpy() >= j0) & (skeleton["stock_idx"].to_numpy() < j1))
+    if not len(rows):
+        return
+    t = skeleton["day_idx"].to_numpy()[rows]
+    i = skeleton["stock_idx"].to_numpy()[rows] - j0
+    first = skeleton["first_trading_day"].to_numpy()[rows] == 1
+    last = skeleton["last_trading_day"].to_numpy()[rows] == 1
+    values["UpperLimit"][rows] = np.where(first, bars["up"][t, i], np.nan)
+    values["LowerLimit"][rows] = np.where(last, bars["down"][t, i], np.nan)
+
+    suspended = bars["suspended"]
+    T = suspended.shape[0]
+    edge = first | last
+    values["停牌起始日期"][rows[edge]] = 0
+    values["停牌结束日期"][rows[edge]] = 0
+    for r, day, col in zip(rows[edge], t[edge], i[edge]):
+        if not suspended[day, col]:
+            continue
+        start = day
+        while start > 0 and suspended[start - 1, col]:
+            start -= 1
+        resume = day
+        while resume < T and suspended[resume, col]:
+            resume += 1
+        values["停牌起始日期"][r] = values["_ymd"][start]
+        values["停牌结束日期"][r] = values["_ymd"][resume] if resume < T else np.nan
+        # week end of the resumption week, or the last calendar day if it resumes after the data (as "today")
+        values["停牌结束最后交易日"][r] = values["_ymd"][week_last_of_day[resume]] if resume < T else values["_ymd"][T - 1]
+
+
+def generate_market(out_dir, spec: SyntheticMarketSpec = SyntheticMarketSpec(), chunk_size: int = 256,
+                    partitioned_dir=None, verbose: bool = True) -> SyntheticMarket:
+    """Write the synthetic market under out_dir (see module docstring); partitioned_dir also builds that layout."""
+    t0 = perf_counter()
+    root = Path(out_dir)
+    stock_dir, index_dir = root / "stock", root / "index"
+    stock_dir.mkdir(parents=True, exist_ok=True)
+    index_dir.mkdir(parents=True, exist_ok=True)
+
+    dates = trading_calendar(spec.start, spec.n_days)
+    ymd = dates.strftime("%Y%m%d")
+    universe = make_universe(spec, dates)
+    market = _market_returns(spec, len(dates))
+    skeleton = make_portfolio_skeleton(spec, universe, dates)
+    starts, ends = week_bounds(dates)
+    week_last_of_day = np.repeat(ends - 1, ends - starts)
+    values = {c: np.full(len(skeleton), np.nan) for c in PORTFOLIO_COLUMNS[6:]}
+    values["_ymd"] = np.asarray(ymd, dtype=np.int64).astype(float)
+
+    for j0 in range(0, spec.n_stocks, chunk_size):
+        j1 = min(j0 + chunk_size, spec.n_stocks)
+        bars = simulate_chunk(spec, universe, market, j0, j1)
+        for i, code in enumerate(universe["code"].iloc[j0:j1]):
+            rows = bars["active"][:, i]
+            pd.DataFrame({f: bars[f][rows, i] for f in ("open", "high", "low", "close", "volume", "amount")},
+                         index=ymd[rows]).to_parquet(stock_dir / f"{code}.parquet")
+        _fill_portfolio(skeleton, bars, j0, j1, values, week_last_of_day)
+        if verbose:
+            print(f"  {j1}/{spec.n_stocks} stocks ({perf_counter() - t0:.1f} s)")
+
+    level = 5000 * np.cumprod(1 + market)
+    index_open = level / (1 + market) * (1 + market * 0.3)
+    pd.DataFrame({"open": index_open, "high": np.maximum(index_open, level) * 1.003,
+                  "low": np.minimum(index_open, level) * 0.997, "close": level,
+                  "volume": 1e8, "amount": 1e11}, index=ymd).to_parquet(index_dir / f"{INDEX_CODE}.parquet")
+
+    universe.assign(list_date=ymd[universe["list_idx"].to_numpy()]).drop(columns="list_idx") \
+        .to_parquet(root / "stock_list.parquet", index=False)
+
+    day, week_first, week_last = (skeleton[c].to_numpy() for c in ("day_idx", "week_first", "week_last"))
+    portfolio = pd.DataFrame({
+        "Date": dates[week_first - 1],  # signal date: the last trading day of the previous week
+        "Name": universe["code"].to_numpy()[skeleton["stock_idx"].to_numpy()],
+        "week_end": dates[week_last],
+        "daily_date": dates[day],
+        "first_trading_day": skeleton["first_trading_day"].to_numpy(),
+        "last_trading_day": skeleton["last_trading_day"].to_numpy(),
+        **{c: values[c] for c in PORTFOLIO_COLUMNS[6:]},
+    })
+    portfolio_path = root / "portfolio.parquet"
+    portfolio.to_parquet(portfolio_path, index=False)
+
+    if partitioned_dir is not None:
+        from utils.中证500指增_LGBM.中证500指增_LGBM_data_loader import build_partitioned_daily
+
+        build_partitioned_daily(str(stock_dir), str(partitioned_dir))
+    if verbose:
+        print(f"✅ Synthetic market: {spec.n_stocks} stocks x {len(dates)} days, {len(portfolio)} portfolio rows "
+              f"in {perf_counter() - t0:.1f} s -> {root}")
+    return SyntheticMarket(root, stock_dir, index_dir, root / "stock_list.parquet", portfolio_path, dates)
+
+
+def main(argv=None):
+    project_root = Path(__file__).resolve().parents[2]
+    if str(project_root) not in sys.path:
+        sys.path.insert(0, str(project_root))
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic A-share daily market")
+    parser.add_argument("out_dir")
+    parser.add_argument("--stocks", type=int, default=SyntheticMarketSpec.n_stocks)
+    parser.add_argument("--years", type=float, default=SyntheticMarketSpec.n_days / TRADING_DAYS_PER_YEAR)
+    parser.add_argument("--seed", type=int, default=SyntheticMarketSpec.seed)
+    parser.add_argument("--start", default=SyntheticMarketSpec.start)
+    parser.add_argument("--portfolio-size", type=int, default=SyntheticMarketSpec.portfolio_size)
+    parser.add_argument("--partitioned-dir", help="also build the hive-partitioned layout here")
+    args = parser.parse_args(argv)
+    spec = SyntheticMarketSpec(n_stocks=args.stocks, n_days=int(round(args.years * TRADING_DAYS_PER_YEAR)),
+                               start=args.start, seed=args.seed, portfolio_size=args.portfolio_size)
+    generate_market(args.out_dir, spec, partitioned_dir=args.partitioned_dir)
+
+
+if __name__ == "__main__":
+    main()
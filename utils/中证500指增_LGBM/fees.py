@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 
 # Python 3.7 compatibility: use str instead of Literal
 # Exchange should be "SH" or "SZ"
@@ -90,18 +90,29 @@ def exchange_from_symbol(full_symbol: str) -> Optional[Exchange]:
     return None
 
 
-def calc_buy_fees(amount: float, exchange: Exchange, schedule: BuyFeeSchedule) -> float:
+def calc_buy_fee_breakdown(amount: float, exchange: Exchange, schedule: BuyFeeSchedule) -> Tuple[float, float]:
     """
-    Calculate buy-side fees for a given notional amount.
+    Buy-side fees by component: (base, transfer).
+    base = commission + csrc + handling with min_fee applied; transfer is SH only.
     """
     if amount <= 0:
-        return 0.0
+        return 0.0, 0.0
 
     base_fee = amount * (schedule.commission_rate + schedule.csrc_fee_rate + schedule.handling_fee_rate)
     base_fee = max(base_fee, schedule.min_fee)
 
     transfer = amount * schedule.transfer_fee_rate_sh if exchange == "SH" else 0.0
 
+    return base_fee, transfer
+
+
+def calc_buy_fees(amount: float, exchange: Exchange, schedule: BuyFeeSchedule) -> float:
+    """
+    Calculate buy-side fees for a given notional amount.
+    """
+    if amount <= 0:
+        return 0.0
+    base_fee, transfer = calc_buy_fee_breakdown(amount, exchange, schedule)
     return base_fee + transfer
 
 
@@ -115,12 +126,13 @@ def calc_buy_total_cost(open_buy_price: float, volume: int, exchange: Exchange,
     return amount + calc_buy_fees(amount, exchange, schedule)
 
 
-def calc_sell_fees(amount: float, exchange: Exchange, schedule: SellFeeSchedule) -> float:
+def calc_sell_fee_breakdown(amount: float, exchange: Exchange, schedule: SellFeeSchedule) -> Tuple[float, float, float]:
     """
-    Calculate sell-side fees for a given notional amount (includes 印花税).
+    Sell-side fees by component: (base, transfer, stamp).
+    base = commission + csrc + handling with min_fee applied; transfer is SH only; stamp = 印花税.
     """
     if amount <= 0:
-        return 0.0
+        return 0.0, 0.0, 0.0
 
     base_fee = amount * (schedule.commission_rate + schedule.csrc_fee_rate + schedule.handling_fee_rate)
     base_fee = max(base_fee, schedule.min_fee)
@@ -128,6 +140,16 @@ def calc_sell_fees(amount: float, exchange: Exchange, schedule: SellFeeSchedule)
     transfer = amount * schedule.transfer_fee_rate_sh if exchange == "SH" else 0.0
     stamp = amount * schedule.stamp_tax_rate
 
+    return base_fee, transfer, stamp
+
+
+def calc_sell_fees(amount: float, exchange: Exchange, schedule: SellFeeSchedule) -> float:
+    """
+    Calculate sell-side fees for a given notional amount (includes 印花税).
+    """
+    if amount <= 0:
+        return 0.0
+    base_fee, transfer, stamp = calc_sell_fee_breakdown(amount, exchange, schedule)
     return base_fee + transfer + stamp
 
 
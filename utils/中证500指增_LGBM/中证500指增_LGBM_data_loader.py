@@ -1,22 +1,60 @@
+import numpy as np
 import pandas as pd
 import os
+import json
+import logging
+import zlib
 
-def get_market_data(stock_list, target_date, base_path):
+MARKET_FIELDS = ['open', 'close', 'high', 'low', 'volume', 'amount']
+
+# Daily bar layouts:
+#   per_stock:   {base_path}/{code}.parquet, full history per stock (QMT download format)
+#   partitioned: {base_path}/year=YYYY[/bucket=N]/*.parquet, hive-partitioned (build_partitioned_daily)
+LAYOUTS = ('per_stock', 'partitioned')
+_LAYOUT_FILE = '_layout.json'
+_DATASETS = {}  # base_path -> (layout file mtime, pyarrow dataset, n_buckets, zero_codes)
+
+logger = logging.getLogger(__name__)
+
+
+def _count(stats, name, n=1):
+    stats[name] = stats.get(name, 0) + n
+
+
+def _check_no_zeros(code, df):
+    # 杜绝数据=0的情况， 因为QMT 无权提供ST 和停牌股票的行情
+    # (every column of the whole file, whatever columns / dates the caller asked for)
+    if (df == 0).any().any():
+        raise ValueError(f"Parquet {code} contains zero values")
+
+
+def get_market_data(stock_list, target_date, base_path, layout='per_stock', columns=None, stats=None):
     """
     target_date: str '20250303'
+    layout: 'per_stock' or 'partitioned' (see LAYOUTS)
+    columns: optional subset of MARKET_FIELDS to return (e.g. ['open', 'close']); default all
+    stats: optional dict of counters to increment (files_read / scans, bytes_read, rows_read,
+           dataset_cache_hits, fallback_days); bytes are on-disk for per_stock, decoded Arrow for partitioned
     returns: dict { '000011.SZ': {'open': 8.3, 'close': 8.35, 'volume': 5000} }
     """
+    if layout == 'partitioned':
+        return _get_market_data_partitioned(stock_list, target_date, base_path, columns, stats)
+    if layout != 'per_stock':
+        raise ValueError(f"Unknown market data layout: {layout}, expected one of {LAYOUTS}")
+
+    fields = list(columns) if columns is not None else MARKET_FIELDS
     results = {}
     
     for code in stock_list:
         # Construct path: E:\妖魔鬼怪\...\000011.SZ.parquet
         file_path = os.path.join(base_path, f"{code}.parquet")
 
-        df = pd.read_parquet(file_path)
-
-        # 杜绝数据=0的情况， 因为QMT 无权提供ST 和停牌股票的行情
-        if (df == 0).any().any():
-            raise ValueError(f"Parquet {code} contains zero values")
+        df = pd.read_parquet(file_path)  # all columns: the zero check covers the whole file
+        if stats is not None:
+            _count(stats, 'files_read')
+            _count(stats, 'bytes_read', os.path.getsize(file_path))
+            _count(stats, 'rows_read', len(df))
+        _check_no_zeros(code, df)
 
         try:
             day_data = df.loc[target_date]
@@ -27,20 +65,279 @@ def get_market_data(stock_list, target_date, base_path):
             if len(available) == 0:
                 continue
             day_data = df.loc[available[-1]]
-            print(f"Stock {code} has no data for date {target_date}. Using last available close from {available[-1]}, price: {day_data['close']}")
+            if stats is not None:
+                _count(stats, 'fallback_days')
+            logger.info("Stock %s has no data for date %s. Using last available close from %s, price: %s",
+                        code, target_date, available[-1], day_data['close'])
             
-        results[code] = {
-            'open': day_data['open'],
-            'close': day_data['close'],
-            'high': day_data['high'],
-            'low': day_data['low'],
-            'volume': day_data['volume'],
-            'amount': day_data['amount']
-        }
+        results[code] = {f: day_data[f] for f in fields}
+
+    return results
+
+
+def _bucket_of(code, n_buckets):
+    return zlib.crc32(code.encode('utf-8')) % n_buckets
+
+
+def _open_partitioned(base_path, stats=None):
+    """
+    Open (and cache) the hive-partitioned dataset; returns (dataset, n_buckets, zero_codes).
+    build_partitioned_daily writes the layout file last, so the cache entry is
+    keyed on its mtime and a rebuild (also from another process) reopens the dataset.
+    zero_codes: stocks whose per-stock file contains a zero value (recorded at build
+    time; a layout file without it is scanned once here).
+    """
+    layout_path = os.path.join(base_path, _LAYOUT_FILE)
+    try:
+        mtime = os.stat(layout_path).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    hit = _DATASETS.get(base_path)
+    if hit is not None and hit[0] == mtime:
+        if stats is not None:
+            _count(stats, 'dataset_cache_hits')
+        return hit[1:]
+    import pyarrow.dataset as ds
+
+    layout = {}
+    if mtime is not None:
+        with open(layout_path, 'r', encoding='utf-8') as f:
+            layout = json.load(f)
+    dataset = ds.dataset(base_path, format='parquet', partitioning='hive')
+    if 'zero_codes' in layout:
+        zero_codes = frozenset(layout['zero_codes'])
+    else:
+        df = dataset.to_table(columns=['ts_code'] + MARKET_FIELDS).to_pandas()
+        zero_codes = frozenset(df.loc[(df[MARKET_FIELDS] == 0).any(axis=1), 'ts_code'])
+    _DATASETS[base_path] = (mtime, dataset, int(layout.get('n_buckets', 0)), zero_codes)
+    return _DATASETS[base_path][1:]
+
+
+def _check_no_zero_codes(stock_list, zero_codes):
+    # 杜绝数据=0的情况: same whole-file check as the per_stock layout, from the build-time record
+    for code in stock_list:
+        if code in zero_codes:
+            raise ValueError(f"Parquet {code} contains zero values")
+
+
+def _get_market_data_partitioned(stock_list, target_date, base_path, columns=None, stats=None):
+    """
+    Same result as the per_stock layout, reading only the target year's partition
+    (and the stock buckets of stock_list) with ts_code / trade_date filters pushed down.
+    Stocks with no bar in the target year up to target_date fall back to earlier years.
+    """
+    import pyarrow.dataset as ds
+
+    if not stock_list:
+        return {}
+    fields = list(columns) if columns is not None else MARKET_FIELDS
+    dataset, n_buckets, zero_codes = _open_partitioned(base_path, stats)
+    _check_no_zero_codes(stock_list, zero_codes)
+    read_cols = ['ts_code', 'trade_date'] + fields
+    codes = list(stock_list)
+    year = int(target_date[:4])
+
+    def _read(year_filter, codes):
+        filt = year_filter & ds.field('ts_code').isin(codes) & (ds.field('trade_date') <= target_date)
+        if n_buckets:
+            filt = filt & ds.field('bucket').isin(sorted({_bucket_of(c, n_buckets) for c in codes}))
+        table = dataset.to_table(columns=read_cols, filter=filt)
+        if stats is not None:
+            _count(stats, 'scans')
+            _count(stats, 'rows_read', table.num_rows)
+            _count(stats, 'bytes_read', table.nbytes)
+        return table.to_pandas()
+
+    df = _read(ds.field('year') == year, codes)
+    missing = sorted(set(codes) - set(df['ts_code']))
+    if missing:
+        df = pd.concat([df, _read(ds.field('year') < year, missing)], ignore_index=True)
+    if df.empty:
+        return {}
 
+    last = df.sort_values('trade_date').groupby('ts_code', sort=False).tail(1)
+    results = {}
+    for row in last.itertuples(index=False):
+        if row.trade_date != target_date:
+            if stats is not None:
+                _count(stats, 'fallback_days')
+            logger.info("Stock %s has no data for date %s. Using last available close from %s, price: %s",
+                        row.ts_code, target_date, row.trade_date, row.close if 'close' in fields else '?')
+        results[row.ts_code] = {f: getattr(row, f) for f in fields}
     return results
 
 
+def build_partitioned_daily(base_path, out_dir, n_buckets=0, chunk_size=500):
+    """
+    Convert the per_stock layout ({base_path}/{code}.parquet) into a hive-partitioned
+    dataset under out_dir: year=YYYY[/bucket=N]/part-*.parquet with columns
+    ts_code, trade_date ('YYYYMMDD'), open, close, high, low, volume, amount.
+    n_buckets > 0 adds a crc32(ts_code) % n_buckets partition level.
+    Stocks are converted chunk_size at a time to bound memory. The layout file
+    records n_buckets and the stocks whose file contains a zero value (zero_codes),
+    so the partitioned readers keep the per_stock whole-file zero check.
+    """
+    import shutil
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    files = sorted(f for f in os.listdir(base_path) if f.endswith('.parquet'))
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+
+    partition_cols = ['year'] + (['bucket'] if n_buckets else [])
+    zero_codes = []
+    for i in range(0, len(files), chunk_size):
+        frames = []
+        for f in files[i:i + chunk_size]:
+            code = f[:-len('.parquet')]
+            df = pd.read_parquet(os.path.join(base_path, f))
+            if (df == 0).any().any():  # whole-file zero check of the per_stock reader, recorded for the readers
+                zero_codes.append(code)
+            df = df[MARKET_FIELDS].copy()
+            df.insert(0, 'trade_date', pd.to_datetime(df.index).strftime('%Y%m%d'))
+            df.insert(0, 'ts_code', code)
+            df['year'] = df['trade_date'].str[:4].astype('int32')
+            if n_buckets:
+                df['bucket'] = _bucket_of(code, n_buckets)
+            frames.append(df.reset_index(drop=True))
+        if not frames:
+            continue
+        chunk = pd.concat(frames, ignore_index=True).sort_values(['trade_date', 'ts_code'])
+        ds.write_dataset(
+            pa.Table.from_pandas(chunk, preserve_index=False),
+            out_dir,
+            format='parquet',
+            partitioning=ds.partitioning(
+                pa.schema([(c, pa.int32()) for c in partition_cols]), flavor='hive'),
+            basename_template=f'part-{i // chunk_size}-{{i}}.parquet',
+            existing_data_behavior='overwrite_or_ignore',
+        )
+
+    with open(os.path.join(out_dir, _LAYOUT_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'n_buckets': n_buckets, 'zero_codes': zero_codes}, f)
+    _DATASETS.pop(out_dir, None)
+    print(f"Partitioned {len(files)} stocks into {out_dir}")
+
+
+def market_data_version(base_path, layout='per_stock', stock_list=None):
+    """
+    Manifest hash of the daily bar files: (relative path, size, mtime) of every parquet
+    under base_path, or for per_stock with stock_list only those stocks' files
+    (a missing file counts too). One stat per file, no reads; any rewrite of a
+    relevant file (daily_data_collection.py, QMT_st_fill.py) changes it.
+    """
+    import hashlib
+
+    if layout == 'per_stock' and stock_list is not None:
+        files = [f"{code}.parquet" for code in sorted(set(stock_list))]
+    else:
+        files = sorted(
+            os.path.relpath(os.path.join(d, f), base_path).replace(os.sep, '/')
+            for d, _, names in os.walk(base_path) for f in names
+            if f.endswith('.parquet') or f == _LAYOUT_FILE
+        )
+    h = hashlib.blake2b(digest_size=16)
+    for rel in files:
+        try:
+            st = os.stat(os.path.join(base_path, rel))
+            h.update(f"{rel}|{st.st_size}|{st.st_mtime_ns}\n".encode('utf-8'))
+        except FileNotFoundError:
+            h.update(f"{rel}|missing\n".encode('utf-8'))
+    return h.hexdigest()
+
+
+class MarketPanel:
+    """
+    Dense daily fields for a fixed calendar and symbol set: one (dates x symbols)
+    float64 array per field, forward-filled from the last bar on or before each
+    date (the same last-close fallback as get_market_data). NaN where a stock has
+    no bar yet.
+    """
+
+    def __init__(self, dates, symbols, fields, last_bar_dates):
+        self.dates = list(dates)
+        self.symbols = list(symbols)
+        self.fields = fields
+        self.last_bar_dates = last_bar_dates  # (dates x symbols) 'YYYYMMDD' of the bar used, '' if none
+        self.date_index = {d: i for i, d in enumerate(self.dates)}
+        self.symbol_index = {s: j for j, s in enumerate(self.symbols)}
+
+    def __getitem__(self, field):
+        return self.fields[field]
+
+    def extend(self, other):
+        """Add other's symbols (same dates and fields, e.g. load_market_panel of new stocks) in place."""
+        if other.dates != self.dates or set(other.fields) != set(self.fields):
+            raise ValueError("MarketPanel.extend needs the same dates and fields")
+        new = [j for j, code in enumerate(other.symbols) if code not in self.symbol_index]
+        for f in self.fields:
+            self.fields[f] = np.hstack([self.fields[f], other.fields[f][:, new]])
+        self.last_bar_dates = np.hstack([self.last_bar_dates, other.last_bar_dates[:, new]])
+        for j in new:
+            self.symbol_index[other.symbols[j]] = len(self.symbols)
+            self.symbols.append(other.symbols[j])
+
+    def market_data(self, stock_list, target_date):
+        """Same dict as get_market_data for a panel date; stocks outside the panel or without a bar are omitted."""
+        i = self.date_index[target_date]
+        results = {}
+        for code in stock_list:
+            j = self.symbol_index.get(code)
+            if j is None or not self.last_bar_dates[i, j]:
+                continue
+            if self.last_bar_dates[i, j] != target_date:
+                logger.info("Stock %s has no data for date %s. Using last available close from %s, price: %s",
+                            code, target_date, self.last_bar_dates[i, j],
+                            self.fields['close'][i, j] if 'close' in self.fields else '?')
+            results[code] = {f: arr[i, j] for f, arr in self.fields.items()}
+        return results
+
+
+def load_market_panel(stock_list, dates, base_path, layout='per_stock', columns=None):
+    """
+    Load a MarketPanel for stock_list on the calendar dates ('YYYYMMDD', sorted).
+    Reads each stock's history once (per_stock) or one filtered scan (partitioned).
+    Raises ValueError on zero values anywhere in a stock's data, like get_market_data.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown market data layout: {layout}, expected one of {LAYOUTS}")
+    fields = list(columns) if columns is not None else MARKET_FIELDS
+    dates = sorted(dates)
+    symbols = list(dict.fromkeys(stock_list))
+    calendar = pd.Index(dates)
+    arrays = {f: np.full((len(dates), len(symbols)), np.nan) for f in fields}
+    last_bar = np.full((len(dates), len(symbols)), '', dtype='U8')
+
+    def _fill(j, code, df):
+        bar_dates = pd.Series(df.index, index=df.index)
+        full = df.index.union(calendar)
+        aligned = df[fields].reindex(full).ffill().reindex(calendar)
+        for f in fields:
+            arrays[f][:, j] = aligned[f].to_numpy(dtype=np.float64)
+        last_bar[:, j] = bar_dates.reindex(full).ffill().reindex(calendar).fillna('').to_numpy(dtype='U8')
+
+    if layout == 'per_stock':
+        for j, code in enumerate(symbols):
+            df = pd.read_parquet(os.path.join(base_path, f"{code}.parquet"))  # all columns for the zero check
+            _check_no_zeros(code, df)
+            df.index = pd.to_datetime(df.index).strftime("%Y%m%d")
+            _fill(j, code, df.loc[df.index <= dates[-1]].sort_index())
+    else:
+        import pyarrow.dataset as ds
+
+        dataset, _, zero_codes = _open_partitioned(base_path)
+        _check_no_zero_codes(symbols, zero_codes)
+        filt = ds.field('ts_code').isin(symbols) & (ds.field('trade_date') <= dates[-1])
+        df = dataset.to_table(columns=['ts_code', 'trade_date'] + fields, filter=filt).to_pandas()
+        col = {code: j for j, code in enumerate(symbols)}
+        for code, g in df.groupby('ts_code', sort=False):
+            _fill(col[code], code, g.set_index('trade_date').sort_index())
+
+    return MarketPanel(dates, symbols, arrays, last_bar)
+
+
 def get_benchmark_series(dates: list, index_code: str, base_path: str) -> dict:
     """
     Get benchmark (index) close prices for given dates.